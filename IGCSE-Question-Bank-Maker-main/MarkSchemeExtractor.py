@@ -1,6 +1,21 @@
 import pymupdf
 import re
 import os
+import geometry
+import catalog
+from instrumentation import DISABLED, Instrumentation
+from memory_budget import UNLIMITED, MemoryBudget
+from page_classifier import PageClassifier
+
+
+# Pages carrying any of these phrases are marking guidance, not question mark schemes
+BOILERPLATE_CLASSIFIER = PageClassifier([
+    "Generic Marking Principles",
+    "GENERIC MARKING PRINCIPLE 5:",
+    "Science-Specific Marking Principles",
+    "Calculation specific guidance",
+    "Examples of how to apply the list rule",
+    ])
 
 
 #Initiate some boxes :)
@@ -56,27 +71,38 @@ def find_x1(page_object, safe_rect):
     max_x1 = 50
     # Extract words within the safe rectangle
     words_in_rect = page_object.get_text("words", clip=safe_rect)
-    
-    for word in words_in_rect:
-        word_rect = pymupdf.Rect(word[:4])
-        if safe_rect.intersects(word_rect):
-            if word_rect.x1 > max_x1:
-                max_x1 = word_rect.x1
+
+    # Keep the words that really intersect the rectangle and take their largest x1
+    word_boxes = geometry.as_boxes(words_in_rect, lambda word: word[:4])
+    word_boxes = word_boxes[geometry.intersects(word_boxes, safe_rect)]
+    if len(word_boxes):
+        max_x1 = max(max_x1, float(word_boxes[:, 2].max()))
     return max_x1
 
 
-def process_mark_scheme(input_path, base_name):
+def process_mark_scheme(input_path, base_name, output_folder=None, instrumentation=DISABLED, memory_budget=UNLIMITED,
+                        debug=False):
     """
     This function contains all the core processing logic for a single mark scheme PDF.
+    Snippets go to `output_folder`, by default 'extracted_mark_schemes' next to this script.
+    Stage timings are recorded on `instrumentation` when it is enabled, and
+    `memory_budget` is checked once the document is closed. With `debug`, the
+    question numbers and increments it found are printed at the end.
+    Returns True if the file was processed without errors.
     """
     # Define the output folder specifically for mark schemes
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    output_folder = os.path.join(script_dir, "extracted_mark_schemes")
+    if output_folder is None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        output_folder = os.path.join(script_dir, "extracted_mark_schemes")
     os.makedirs(output_folder, exist_ok=True)
     print(f"\n--- Processing MARK SCHEME: {os.path.basename(input_path)} ---")
     doc = None
+    error = None
+    # The stages below run as one long block, so each is timed as a lap up to the next
+    timer = instrumentation.start(base_name, "mark_scheme")
     try:
         #global all_text_location, extracted_numbers
+        timer.lap("open")
         doc = pymupdf.open(input_path)
 
     # Delete first page
@@ -84,62 +110,58 @@ def process_mark_scheme(input_path, base_name):
             if page_index == 0:
                 doc.delete_page(page_index)
 
-        # Marking any unncessary pages
+        timer.lap("filter_pages")
+        # Marking any unncessary pages (one pass over each page's text for all phrases)
         pages_to_delete = []
-        forbidden_text = [
-            "Generic Marking Principles",
-            "GENERIC MARKING PRINCIPLE 5:", 
-            "Science-Specific Marking Principles",
-            "Calculation specific guidance",
-            "Examples of how to apply the list rule",
-            ]
         for page_num, page in enumerate(doc):
-            for text in forbidden_text:
-                if page.search_for(text):
-                    pages_to_delete.append(page_num)
-                    page_flag = True
-                    break
-                else:
-                    page_flag = False
+            rule = BOILERPLATE_CLASSIFIER.classify(page.get_text())
+            if rule:
+                pages_to_delete.append(page_num)
+                # +2: pages are counted from 1 and the cover page was already removed
+                print(f"   -> Skipping page {page_num + 2} ({rule})")
 
         # Delete unncessary pages
         for page_num in sorted(pages_to_delete, reverse=True):
             doc.delete_page(page_num)
 
         # Extract the length of the mark scheme for each question
+        timer.lap("find_numbers")
         extracted_numbers = []
         for page in doc:
             # 1. Find question number within this area of the page
             rectangle = pymupdf.Rect(50,720,540,780)
             # Extract the question's order from the box
             text_blocks = page.get_text("blocks", clip = rectangle)
+            # Test every block against the box in one array operation
+            block_boxes = geometry.as_boxes(text_blocks, lambda block: block[:4])
+            in_box = geometry.intersects(block_boxes, rectangle)
             #-----------------------------------
-            # Find the number of the question's and its boxing coordinate
-            for block in text_blocks:
+            # Find the number of the question's and its boxing coordinate (Rects only for the blocks in the box)
+            for row in in_box.nonzero()[0].tolist():
                 #------------------------------------
-                block_text = block[4]
-                block_rect = pymupdf.Rect(block[:4])
+                block_text = text_blocks[row][4]
+                block_rect = pymupdf.Rect(block_boxes[row].tolist())
                 #------------------------------------
-                if rectangle.intersects(block_rect):
-                    #print(f"Found text block inside the search area: '{block_text.strip()}'")
-                    #print(f"   -> Its precise location is: {block_rect}")
-                    Qnumbers = re.findall(r'\d+', block_text)
-
-                    for num in Qnumbers:
-                        extracted_numbers.append({
-                            "number": int(num),
-                            "rect": block_rect,
-                            "page_num": page.number
-                        })
-
-                    #page.draw_rect(
-                    #    block_rect, 
-                    #    color=(1, 0, 0),    # Red border
-                    #    fill=(1, 0, 0),     # Red fill
-                    #    fill_opacity=0.2,   # 20% transparent
-                    #    width=1.5
-                    #)
-
+                #print(f"Found text block inside the search area: '{block_text.strip()}'")
+                #print(f"   -> Its precise location is: {block_rect}")
+                Qnumbers = re.findall(r'\d+', block_text)
+
+                for num in Qnumbers:
+                    extracted_numbers.append({
+                        "number": int(num),
+                        "rect": block_rect,
+                        "page_num": page.number
+                    })
+
+                #page.draw_rect(
+                #    block_rect, 
+                #    color=(1, 0, 0),    # Red border
+                #    fill=(1, 0, 0),     # Red fill
+                #    fill_opacity=0.2,   # 20% transparent
+                #    width=1.5
+                #)
+
+        timer.lap("find_increments")
         increment_full = []
 
         if len(extracted_numbers) > 1:
@@ -181,6 +203,7 @@ def process_mark_scheme(input_path, base_name):
                 print(f"  -> On Page: {number_data['page_num'] + 1}")
 
         #cutting out mark schemes
+        timer.lap("cut_snippets")
         for question in range(0,len(increment_full)):
             Current_question = increment_full[question-1]['data']['rect']
             x0_coord = Current_question.x0
@@ -248,21 +271,24 @@ def process_mark_scheme(input_path, base_name):
                         part2_doc.close()
 
         
-        print(f"Successfully created: {os.path.basename(output_path)}")
+        print(f"Successfully created snippets in: {output_folder}")
     except Exception as e:
+        error = e
         print(f"!!! An error occurred while processing {os.path.basename(input_path)}: {e}")
     finally:
         # Make sure the document is always closed
         if doc:
-            doc.close
+            doc.close()
+        timer.finish(error)
+        memory_budget.check(base_name)
 
-    debugip = input("Do you want to open Debugger? (Press Enter to continue...)")
-    if debugip == "":
+    if debug and error is None:
         print("Length of question:", len(extracted_numbers))
         print("Increment Value:", len(increment_full))
-        print("Last increment data:", increment_full[-1])
+        if increment_full:
+            print("Last increment data:", increment_full[-1])
         #print(Last_x1)
-        input("Press Enter to continue...")
+    return error is None
 
 
 
@@ -278,22 +304,23 @@ if __name__ == "__main__":
     if not os.path.isdir(papers_folder):
         print(f"Error: The 'papers' folder was not found. Please create it in the same directory as the script.")
     else:
-        # 4. Get a list of all PDF files in the papers folder
-        pdf_files = [f for f in os.listdir(papers_folder) if f.lower().endswith('.pdf')]
+        # 4. Get a list of all mark schemes in the papers folder
+        mark_schemes = catalog.discover(papers_folder, kind="ms")
         
-        if not pdf_files:
-            print("No PDF files found in the 'papers' folder.")
+        if not mark_schemes:
+            print("No mark schemes found in the 'papers' folder.")
         else:
-            print(f"Found {len(pdf_files)} PDF(s) to process.")
+            print(f"Found {len(mark_schemes)} mark scheme(s) to process.")
+            # Set QBANK_TIMINGS / QBANK_PROFILE to collect stage timings or profiles
+            instrumentation = Instrumentation.from_environment()
+            memory_budget = MemoryBudget.from_environment()
             
             # 5. Loop through each PDF file and process it
-            for pdf_file in pdf_files:
-                input_file_path = os.path.join(papers_folder, pdf_file)
-                base_name, _ = os.path.splitext(pdf_file)
-                
-                process_pdf(input_file_path,base_name)
+            for paper in mark_schemes:
+                process_mark_scheme(paper.path, paper.name, output_folder, instrumentation, memory_budget)
                 
                 
             
             print("\n--- All files processed. ---")
+            instrumentation.save()
 
@@ -1,8 +1,10 @@
 import fitz  # PyMuPDF
 import os
+from question_store import DATABASE_PATH, QuestionStore
 
 # --- CONFIGURATION ---
-SORTED_ROOT_DIR = "sorted_questions_by_topic"
+QUESTION_DATABASE = DATABASE_PATH
+SEARCH_RESULTS = 30  # most search matches offered at once
 
 # --- HELPER FUNCTION for USER INTERACTION ---
 
@@ -61,10 +63,9 @@ def assemble_pdf(question_paths, output_filename):
 
         # Loop through each chosen question's file path
         for path in question_paths:
-            snippet_doc = fitz.open(path)
-            # Insert all pages from the snippet into the final document
-            final_doc.insert_pdf(snippet_doc)
-            snippet_doc.close()
+            with fitz.open(path) as snippet_doc:
+                # Insert all pages from the snippet into the final document
+                final_doc.insert_pdf(snippet_doc)
 
         # Save the final, assembled document
         final_doc.save(output_filename, garbage=4, deflate=True)
@@ -84,51 +85,70 @@ def main():
     """
     print("--- Mock Paper Assembler ---")
     
-    # Check if the main sorted directory exists
-    if not os.path.isdir(SORTED_ROOT_DIR):
-        print(f"Error: The directory '{SORTED_ROOT_DIR}' was not found.")
+    # The sorter records each question's topics in the question database
+    if not os.path.exists(QUESTION_DATABASE):
+        print(f"Error: The question database '{QUESTION_DATABASE}' was not found.")
         print("Please run the splitter and AI sorter scripts first.")
         return
 
-    # --- Step 1: Select a Subject ---
-    subjects = sorted([d for d in os.listdir(SORTED_ROOT_DIR) if os.path.isdir(os.path.join(SORTED_ROOT_DIR, d))])
-    chosen_subject = select_from_list(subjects, "Please choose the subject you want to create a mock paper for:")
-    if not chosen_subject:
-        return # Exit if no subject is chosen
-
-    subject_path = os.path.join(SORTED_ROOT_DIR, chosen_subject)
-
-    # --- Step 2: Select a Topic ---
-    topics = sorted([d for d in os.listdir(subject_path) if os.path.isdir(os.path.join(subject_path, d))])
-    chosen_topic = select_from_list(topics, "Please choose the topic you want to select questions from:")
-    if not chosen_topic:
-        return # Exit if no topic is chosen
-
-    topic_path = os.path.join(subject_path, chosen_topic)
+    with QuestionStore(QUESTION_DATABASE) as store:
+        # --- Step 1: Select a Subject ---
+        subjects = store.subjects()
+        chosen_subject = select_from_list(subjects, "Please choose the subject you want to create a mock paper for:")
+        if not chosen_subject:
+            return # Exit if no subject is chosen
+
+        # --- Step 2: Select a Topic, or Search the Question Text ---
+        modes = ["Browse a topic", "Search the question text"] if store.searchable else ["Browse a topic"]
+        chosen_mode = select_from_list(modes, "How do you want to find questions?")
+        if not chosen_mode:
+            return
+
+        if chosen_mode == "Browse a topic":
+            topics = store.topics(chosen_subject)
+            chosen_topic = select_from_list(topics, "Please choose the topic you want to select questions from:")
+            if not chosen_topic:
+                return # Exit if no topic is chosen
+            source = f"the topic '{chosen_topic}'"
+
+            # Questions of the topic, labelled like their files in the sorted folder
+            available_questions = {f"{question['paper_name']}_Q{question['question']}": question["file_path"]
+                                   for question in store.questions(topic=chosen_topic, subject_code=chosen_subject)}
+        else:
+            query = input('\nSearch for (words, "exact phrases", prefix*): ')
+            source = f"the search '{query}'"
+            try:
+                results = store.search(query, limit=SEARCH_RESULTS, subject_code=chosen_subject)
+            except ValueError as e:
+                print(f"!!! {e}")
+                return
+
+            # Matching questions, labelled with the text around the match
+            available_questions = {f"{result['paper_name']}_Q{result['question']}: {result['snippet']}": result["file_path"]
+                                   for result in results}
     
     # --- Step 3: Select Questions in a Loop ---
     chosen_question_paths = []
     
     while True:
-        # Get a list of available question PDFs in the chosen topic folder
-        question_files = sorted([f for f in os.listdir(topic_path) if f.lower().endswith('.pdf')])
+        # Get a list of the available questions
+        question_labels = list(available_questions)
         
-        if not question_files:
-            print(f"No questions found in the topic '{chosen_topic}'.")
+        if not question_labels:
+            print(f"No questions found for {source}.")
             break
 
         # Let the user select a question from the list
-        chosen_question_file = select_from_list(question_files, "Please select a question to add:")
+        chosen_question = select_from_list(question_labels, "Please select a question to add:")
         
-        if chosen_question_file:
-            # Construct the full path and add it to our list
-            full_path = os.path.join(topic_path, chosen_question_file)
-            chosen_question_paths.append(full_path)
-            print(f"'{chosen_question_file}' added to your mock paper.")
+        if chosen_question:
+            # Look up the question's file and add it to our list
+            chosen_question_paths.append(available_questions[chosen_question])
+            print(f"'{chosen_question}' added to your mock paper.")
 
         # Ask the user if they want to add another question
         while True:
-            another = input("\nAdd another question from this topic? (y/n): ").lower()
+            another = input(f"\nAdd another question from {source}? (y/n): ").lower()
             if another in ['y', 'n']:
                 break
             print("!!! Invalid input. Please enter 'y' or 'n'.")
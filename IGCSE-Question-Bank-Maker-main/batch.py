@@ -0,0 +1,242 @@
+"""
+Runs the toolkit without any prompts, for cron jobs and batch machines.
+
+    python batch.py job.json
+    python batch.py --papers papers --stages split mark_schemes --workers 4 --summary summary.json
+
+A job spec is a JSON (or, with PyYAML installed, YAML) file with any of the
+keys below; command-line flags override it. Relative paths in a job spec are
+relative to the spec's folder.
+
+    stages        split, mark_schemes and/or sort (default: all three)
+    papers        folder, or list of folders, searched for papers (default: papers)
+    syllabi       folder of <subject code>/*_syllabus.txt files (default: syllabi)
+    output        folder that extracted_questions/ and sorted_questions_by_topic/
+                  are written to (default: the current folder)
+    mark_schemes  folder for mark scheme snippets (default: <output>/extracted_mark_schemes)
+    workers       worker processes for PDF work (default: one per CPU)
+    queue_size    papers the sorter may fall behind before splitting waits (default: 4)
+    incremental   skip papers that are unchanged since the last run (default: true)
+    retry_failed  try papers that could not be split before again, even if they
+                  are unchanged (default: false, or QBANK_RETRY_FAILED)
+    timings       write per-stage timings to this JSON file
+    memory_budget flush MuPDF's store when a process grows past this many MB
+    summary       where the JSON run summary goes (default: - for standard output)
+
+Progress messages go to standard error, so standard output carries nothing
+but the summary. Nothing is ever read from standard input. The exit status is 0 when every
+stage succeeded, 1 when some papers failed or some questions could not be sorted
+(classification requests that failed or were refused, or questions left unfiled), 2 when the job could not start
+and 130 when the run was interrupted.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from classifier_backends import configuration_error
+
+STAGES = ("split", "mark_schemes", "sort")
+DEFAULT_JOB = {
+    "stages": list(STAGES),
+    "papers": "papers",
+    "syllabi": "syllabi",
+    "output": ".",
+    "mark_schemes": None,
+    "workers": None,
+    "queue_size": None,
+    "incremental": True,
+    "retry_failed": None,
+    "timings": None,
+    "memory_budget": None,
+    "summary": "-",
+}
+# Job keys holding paths, resolved against the job spec's folder
+PATH_KEYS = ("papers", "syllabi", "output", "mark_schemes", "timings", "summary")
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_INVALID_JOB = 2
+EXIT_INTERRUPTED = 130
+
+
+class JobError(Exception):
+    """The job spec is unreadable or asks for something that cannot be run."""
+
+
+def load_job_spec(path):
+    """Reads a job spec file; .yaml/.yml files need PyYAML, anything else is read as JSON."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.lower().endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise JobError("YAML job specs need PyYAML (pip install pyyaml); use a JSON spec instead.")
+                spec = yaml.safe_load(f)
+            else:
+                spec = json.load(f)
+    except (OSError, ValueError) as e:
+        raise JobError(f"Could not read job spec '{path}': {e}")
+    if not isinstance(spec, dict):
+        raise JobError(f"The job spec '{path}' must be a mapping of settings.")
+    return spec
+
+
+def resolve_job(spec, overrides, base_dir):
+    """Combines the defaults, a job spec and command-line overrides, and checks the result."""
+    unknown = set(spec) - set(DEFAULT_JOB)
+    if unknown:
+        raise JobError(f"Unknown job setting(s): {', '.join(sorted(unknown))}")
+    job = dict(DEFAULT_JOB)
+    for key, value in spec.items():
+        if key in PATH_KEYS and value is not None and value != "-":
+            value = [os.path.join(base_dir, v) for v in value] if isinstance(value, list) else os.path.join(base_dir, value)
+        job[key] = value
+    # Flags are relative to the current folder, like any command-line path
+    job.update({key: value for key, value in overrides.items() if value is not None})
+
+    if isinstance(job["stages"], str):
+        job["stages"] = [job["stages"]]
+    bad_stages = set(job["stages"]) - set(STAGES)
+    if bad_stages or not job["stages"]:
+        raise JobError(f"Stages must be some of {', '.join(STAGES)}; got {', '.join(job['stages']) or 'none'}.")
+    for key in ("workers", "queue_size"):
+        if job[key] is not None and (not isinstance(job[key], int) or job[key] < 1):
+            raise JobError(f"'{key}' must be a positive whole number.")
+
+    # Every path is made absolute, because the run itself happens in the output folder
+    for key in PATH_KEYS:
+        if job[key] is not None and job[key] != "-":
+            job[key] = [os.path.abspath(p) for p in job[key]] if isinstance(job[key], list) else os.path.abspath(job[key])
+    if job["mark_schemes"] is None:
+        job["mark_schemes"] = os.path.join(job["output"], "extracted_mark_schemes")
+
+    papers = job["papers"] if isinstance(job["papers"], list) else [job["papers"]]
+    if {"split", "mark_schemes"} & set(job["stages"]):
+        missing = [folder for folder in papers if not os.path.exists(folder)]
+        if missing:
+            raise JobError(f"Papers folder(s) not found: {', '.join(missing)}")
+    if "sort" in job["stages"]:
+        # An API key, or the stand-in or a cassette (see classifier_backends.py)
+        backend_error = configuration_error()
+        if backend_error:
+            raise JobError(f"Sorting cannot start: {backend_error}")
+        if not os.path.isdir(job["syllabi"]):
+            raise JobError(f"Syllabus folder not found: {job['syllabi']}")
+    return job
+
+
+def run_job(job):
+    """Runs a resolved job in its output folder and returns the run summary."""
+    # Imported here so that anything printed while loading PyMuPDF goes where progress messages go
+    from instrumentation import Instrumentation
+    from memory_budget import MemoryBudget
+    from pipeline import DEFAULT_QUEUE_SIZE, Pipeline
+
+    stages = set(job["stages"])
+    if job["timings"]:
+        instrumentation = Instrumentation(report_path=job["timings"])
+    else:
+        instrumentation = Instrumentation.from_environment()
+    if job["memory_budget"] is not None:
+        memory_budget = MemoryBudget(limit_mb=float(job["memory_budget"]))
+    else:
+        memory_budget = MemoryBudget.from_environment()
+
+    os.makedirs(job["output"], exist_ok=True)
+    os.chdir(job["output"])
+    if "sort" in stages:
+        import sorting
+        sorting.SYLLABUS_ROOT_DIR = job["syllabi"]
+
+    pipeline = Pipeline(job["papers"], split="split" in stages, extract_mark_schemes="mark_schemes" in stages,
+                        sort="sort" in stages, workers=job["workers"], queue_size=job["queue_size"] or DEFAULT_QUEUE_SIZE,
+                        incremental=job["incremental"], mark_scheme_folder=job["mark_schemes"],
+                        instrumentation=instrumentation, memory_budget=memory_budget, retry_failed=job["retry_failed"])
+    summary = pipeline.run()
+    instrumentation.save()
+    return summary
+
+
+def exit_code(summary):
+    if summary.get("interrupted"):
+        return EXIT_INTERRUPTED
+    if summary.get("error") or summary["stage_errors"] or summary["question_papers"]["errors"] \
+            or summary["mark_schemes"]["errors"]:
+        return EXIT_FAILURES
+    if sorting_failed(summary["sorting"]):
+        return EXIT_FAILURES
+    return EXIT_OK
+
+
+def sorting_failed(stats):
+    """True if classification requests failed or were refused (a bad key, an open circuit...) or questions went unfiled."""
+    api = stats.get("api") or {}
+    return bool(api.get("failed") or api.get("rejected")) or stats["sorted"] < stats["questions"]
+
+
+def write_summary(summary, path, stdout):
+    text = json.dumps(summary, indent=2, default=str)
+    if path == "-":
+        stdout.write(text + "\n")
+        stdout.flush()
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("job", nargs="?", help="JSON or YAML job spec")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="stages to run (default: all)")
+    parser.add_argument("--papers", nargs="+", help="folder(s) searched for papers")
+    parser.add_argument("--syllabi", help="syllabus folder")
+    parser.add_argument("--output", help="folder the results are written to")
+    parser.add_argument("--mark-schemes", dest="mark_schemes", help="folder for mark scheme snippets")
+    parser.add_argument("--workers", type=int, help="worker processes for PDF work")
+    parser.add_argument("--queue-size", dest="queue_size", type=int, help="papers the sorter may fall behind")
+    parser.add_argument("--full", dest="incremental", action="store_const", const=False,
+                        help="re-split papers even if they are unchanged")
+    parser.add_argument("--retry-failed", dest="retry_failed", action="store_const", const=True,
+                        help="try papers that could not be split before again")
+    parser.add_argument("--timings", help="write per-stage timings to this JSON file")
+    parser.add_argument("--memory-budget", dest="memory_budget", type=float, help="MB per process")
+    parser.add_argument("--summary", help="where the JSON summary goes (default: - for standard output)")
+    args = vars(parser.parse_args(argv))
+
+    # Nothing may wait for an answer: anything that still asks gets end-of-file instead
+    sys.stdin = open(os.devnull, "r")
+    stdout = sys.stdout
+    started = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    job_path = args.pop("job")
+    try:
+        spec = load_job_spec(job_path) if job_path else {}
+        base_dir = os.path.dirname(os.path.abspath(job_path)) if job_path else os.getcwd()
+        job = resolve_job(spec, args, base_dir)
+    except JobError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        write_summary({"started": started, "job": job_path, "error": str(e), "exit_code": EXIT_INVALID_JOB},
+                      args["summary"] or "-", stdout)
+        return EXIT_INVALID_JOB
+
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            summary = run_job(job)
+        except KeyboardInterrupt:
+            summary = {"error": "Interrupted before the pipeline started.", "interrupted": True}
+        except Exception as e:
+            print(f"Error: {e}")
+            summary = {"error": str(e)}
+    code = exit_code(summary)
+    write_summary({"started": started, "job": job, **summary, "exit_code": code}, job["summary"], stdout)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark: the per-element fitz.Rect filtering the splitter used to do in
+locate_questions / trim_page, against the NumPy box arrays in geometry.py.
+
+Both versions answer the same queries on every page of the given papers (a set
+of horizontal bands per page for blocks and drawings, plus the left-margin
+rectangle for spans) and their answers are checked against each other.
+
+Usage:
+    python benchmarks/bench_geometry.py [PDF or folder ...]   (default: papers)
+"""
+import os
+import sys
+import time
+
+import fitz
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import geometry
+
+BANDS_PER_PAGE = 12
+REPEATS = 20
+
+
+def find_pdfs(paths):
+    pdfs = []
+    for path in paths:
+        if os.path.isfile(path):
+            pdfs.append(path)
+        for subdir, _, files in os.walk(path):
+            pdfs += [os.path.join(subdir, f) for f in files if f.lower().endswith(".pdf")]
+    return pdfs
+
+
+def load_pages(pdfs):
+    pages = []
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            for page in doc:
+                blocks = page.get_text("dict")["blocks"]
+                pages.append({
+                    "rect": page.rect,
+                    "blocks": blocks,
+                    "spans": [span for block in blocks if block["type"] == 0
+                                for line in block["lines"] for span in line["spans"]],
+                    "drawings": page.get_drawings()
+                })
+    return pages
+
+
+def bands(page_rect):
+    step = page_rect.height / BANDS_PER_PAGE
+    return [fitz.Rect(0, i * step, page_rect.x1, (i + 2) * step) for i in range(BANDS_PER_PAGE)]
+
+
+def per_element(page):
+    """The original list-comprehension code, one fitz.Rect per element."""
+    answers = []
+    margin = fitz.Rect(0, 50, 60, page["rect"].y1)
+    answers.append(len([span for span in page["spans"] if fitz.Rect(span["bbox"]).intersects(margin)]))
+    for rect in bands(page["rect"]):
+        regiontext = [block for block in page["blocks"] if fitz.Rect(block["bbox"]).intersects(rect)]
+        regiondrawing = [box["rect"] for box in page["drawings"]
+                            if box["stroke_opacity"] is not None and (fitz.Rect(box["rect"]) in rect)]
+        try:
+            answers.append((min([x["bbox"][1] for x in regiontext] + [x.y1 for x in regiondrawing]),
+                            max([x["bbox"][3] for x in regiontext] + [x.y1 for x in regiondrawing])))
+        except ValueError:
+            answers.append(None)
+    return answers
+
+
+def vectorized(page):
+    """The same queries over (N, 4) arrays built once per page."""
+    answers = []
+    spans = geometry.as_boxes(page["spans"], lambda span: span["bbox"])
+    blocks = geometry.as_boxes(page["blocks"], lambda block: block["bbox"])
+    drawings = geometry.as_boxes([box["rect"] for box in page["drawings"] if box["stroke_opacity"] is not None])
+    margin = fitz.Rect(0, 50, 60, page["rect"].y1)
+    answers.append(int(geometry.intersects(spans, margin).sum()))
+    for rect in bands(page["rect"]):
+        regiontext = blocks[geometry.intersects(blocks, rect)]
+        regiondrawing = drawings[geometry.contained(drawings, rect)]
+        tops = np.concatenate((regiontext[:, 1], regiondrawing[:, 3]))
+        bottoms = np.concatenate((regiontext[:, 3], regiondrawing[:, 3]))
+        answers.append((float(tops.min()), float(bottoms.max())) if len(tops) else None)
+    return answers
+
+
+def timed(function, pages):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        results = [function(page) for page in pages]
+    return (time.perf_counter() - start) / REPEATS, results
+
+
+def main(paths):
+    pdfs = find_pdfs(paths)
+    if not pdfs:
+        print(f"No PDF files found in {paths}.")
+        return
+    pages = load_pages(pdfs)
+    elements = sum(len(p["blocks"]) + len(p["spans"]) + len(p["drawings"]) for p in pages)
+    print(f"{len(pdfs)} papers, {len(pages)} pages, {elements} blocks/spans/drawings")
+
+    old_time, old_results = timed(per_element, pages)
+    new_time, new_results = timed(vectorized, pages)
+    assert old_results == new_results, "vectorized results differ from the per-element code"
+
+    print(f"per-element: {old_time * 1000:8.2f} ms per pass")
+    print(f"vectorized:  {new_time * 1000:8.2f} ms per pass  ({old_time / new_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["papers"])
@@ -0,0 +1,72 @@
+"""
+Speed of the sorter's offline first pass (local_classifier.py) on one core.
+
+Questions are made up from a syllabus: each takes a few words from one
+major topic's subtopics, buried in filler, so its true topic is known. The
+benchmark reports questions scored per second, and how many the classifier
+would assign locally at each threshold and how many of those are right.
+
+Usage:
+    python benchmarks/bench_local_classifier.py [--questions 10000] [--syllabus syllabi/9618/_syllabus.txt]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from local_classifier import THRESHOLDS, TopicModel, MIN_SCORE
+from syllabus_compiler import WORD, compile_syllabus
+from synthetic_corpus import WORDS
+
+FILLER = ("state the give explain answer marks table figure shows data value below complete each "
+          "following your working calculate suggest reason").split() + WORDS
+
+
+def make_questions(compiled, count, seed=0):
+    """(text, topic index) pairs: 4-8 words of a topic's text among 60-120 words of filler."""
+    rng = random.Random(seed)
+    vocabularies = [WORD.findall(" ".join([topic["name"], topic["text"]] + [
+        f"{subtopic['name']} {subtopic['text']}" for subtopic in topic["subtopics"]]).lower())
+        for topic in compiled["topics"]]
+    questions = []
+    for _ in range(count):
+        topic = rng.randrange(len(vocabularies))
+        words = [rng.choice(FILLER) for _ in range(rng.randint(60, 120))]
+        words += [rng.choice(vocabularies[topic]) for _ in range(rng.randint(4, 8))]
+        rng.shuffle(words)
+        questions.append((" ".join(words), topic))
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=10_000)
+    parser.add_argument("--syllabus", default=os.path.join(BENCH_DIR, "..", "syllabi", "9618", "_syllabus.txt"))
+    args = parser.parse_args()
+
+    with open(args.syllabus, "r", encoding="utf-8") as f:
+        compiled = compile_syllabus("bench", f.read())
+    model = TopicModel(compiled)
+    questions = make_questions(compiled, args.questions)
+    texts = [text for text, _ in questions]
+
+    start = time.perf_counter()
+    best, scores, margins = model.predict(texts)
+    seconds = time.perf_counter() - start
+    print(f"{len(texts)} questions against {len(compiled['topics'])} major topics "
+          f"({len(model.vocabulary)} terms): {seconds:.2f}s, {len(texts) / seconds:,.0f} questions/s")
+
+    right = best == [topic for _, topic in questions]
+    print(f"{'threshold':>9} | {'assigned':>8} | correct")
+    for threshold in THRESHOLDS[::2]:
+        assigned = (scores >= MIN_SCORE) & (margins >= threshold)
+        correct = (right & assigned).sum() / assigned.sum() if assigned.any() else float("nan")
+        print(f"{threshold:>9.2f} | {assigned.mean():>8.1%} | {correct:.1%}")
+
+
+if __name__ == "__main__":
+    main()
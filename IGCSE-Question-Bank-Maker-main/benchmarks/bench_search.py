@@ -0,0 +1,92 @@
+"""
+Query latency of the question database's full-text search (question_store.py)
+over a synthetic bank of questions.
+
+Fills a scratch database with N questions spread over subjects, years and
+papers the way the splitter records them, then times word, phrase, prefix and
+filtered queries. Question text is drawn from a 20,000-word vocabulary with
+Zipf-distributed word frequencies, as in real text; the subject words that
+the queries use sit at ranks from 20 (in about a fifth of all questions) to
+2,000 (rare).
+
+Usage:
+    python benchmarks/bench_search.py [--questions 100000] [--repeats 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from question_store import QuestionStore
+from synthetic_corpus import WORDS, paper_names
+
+VOCABULARY_SIZE = 20000
+
+QUERIES = [
+    ("word", "electrolysis", {}),
+    ("two words", "enzyme catalyst", {}),
+    ("phrase", '"moles reaction"', {}),
+    ("prefix", "equilib*", {}),
+    ("phrase prefix", '"moles reac"*', {}),
+    ("filtered", "voltage", {"subject_code": "0625", "year": 2015, "paper": "4"}),
+]
+
+
+def vocabulary():
+    """Returns the vocabulary, most frequent word first, and its cumulative Zipf weights."""
+    words = [f"w{index}" for index in range(VOCABULARY_SIZE)]
+    # Spread the real subject words from rank 20 to rank 2000
+    for index, word in enumerate(WORDS):
+        words[int(20 * 100 ** (index / (len(WORDS) - 1)))] = word
+    weights, total = [], 0.0
+    for rank in range(1, VOCABULARY_SIZE + 1):
+        total += 1 / rank
+        weights.append(total)
+    return words, weights
+
+
+def fill(store, questions, seed=0):
+    rng = random.Random(seed)
+    words, weights = vocabulary()
+    written = 0
+    for subject, session, component in paper_names(questions):
+        info = {"name": f"{subject}_{session}_qp_{component}", "subject_code": subject,
+                "year": 2000 + int(session[1:]), "season": session[0], "paper": component[0], "variant": component[1]}
+        rows = [{"question": number, "file_path": f"{info['name']}/Q{number}.pdf",
+                 "text": " ".join(rng.choices(words, cum_weights=weights, k=rng.randint(30, 120)))}
+                for number in range(1, 11)]
+        store.upsert_paper(info, rows)
+        written += len(rows)
+        if written >= questions:
+            return written
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        with QuestionStore(os.path.join(scratch, "questions.db")) as store:
+            start = time.perf_counter()
+            written = fill(store, args.questions)
+            print(f"Indexed {written} questions in {time.perf_counter() - start:.1f}s")
+
+            for label, query, filters in QUERIES:
+                results = store.search(query, limit=20, **filters)
+                start = time.perf_counter()
+                for _ in range(args.repeats):
+                    store.search(query, limit=20, **filters)
+                elapsed = (time.perf_counter() - start) / args.repeats
+                print(f"{label:>14} {query!r:>22}: {elapsed * 1000:7.2f} ms ({len(results)} results)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Throughput benchmark for splitter.Split and MarkSchemeExtractor.process_mark_scheme
+on synthetic corpora (see synthetic_corpus.py) of increasing size.
+
+Every size runs in a fresh subprocess so that its peak RSS is measured on its
+own. Reports papers/sec, pages/sec and peak RSS for both stages.
+
+Usage:
+    python benchmarks/bench_splitter.py [--sizes 10 100 1000] [--workers N] [--corpus-dir DIR]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def count_pages(paths):
+    import fitz
+    pages = 0
+    for path in paths:
+        with fitz.open(path) as doc:
+            pages += len(doc)
+    return pages
+
+
+def run_one(corpus_dir, workers, result_path):
+    """Runs both stages over one corpus; called in a subprocess whose cwd is a scratch folder."""
+    import MarkSchemeExtractor
+    import splitter
+
+    files = sorted(os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir) if f.endswith(".pdf"))
+    question_papers = [f for f in files if "_qp_" in os.path.basename(f)]
+    mark_schemes = [f for f in files if "_ms_" in os.path.basename(f)]
+    result = {"question_papers": len(question_papers), "mark_schemes": len(mark_schemes),
+              "qp_pages": count_pages(question_papers), "ms_pages": count_pages(mark_schemes)}
+
+    start = time.perf_counter()
+    split = splitter.Split(corpus_dir, crawl=True, workers=workers, incremental=False)
+    result["split_seconds"] = time.perf_counter() - start
+    result["split_errors"] = len(split.errors)
+
+    start = time.perf_counter()
+    for path in mark_schemes:
+        base_name, _ = os.path.splitext(os.path.basename(path))
+        MarkSchemeExtractor.process_mark_scheme(path, base_name, output_folder="extracted_mark_schemes")
+    result["ms_seconds"] = time.perf_counter() - start
+
+    if resource is not None:
+        result["peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_SELF)
+        result["peak_worker_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def benchmark(size, corpus_root, workers):
+    import synthetic_corpus
+
+    corpus_dir = os.path.join(corpus_root, f"corpus_{size}")
+    if not os.path.isdir(corpus_dir):
+        start = time.perf_counter()
+        synthetic_corpus.generate(corpus_dir, size)
+        print(f"  generated {size} papers + mark schemes in {time.perf_counter() - start:.1f}s")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        result_path = os.path.join(scratch, "result.json")
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--run-one", os.path.abspath(corpus_dir),
+                        "--workers", str(workers), "--result", result_path],
+                       cwd=scratch, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+        with open(result_path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def report(size, result):
+    split_s, ms_s = result["split_seconds"], result["ms_seconds"]
+    print(f"{size:>6} | split: {result['question_papers'] / split_s:8.1f} papers/s {result['qp_pages'] / split_s:9.1f} pages/s"
+          f" ({result['split_errors']} errors)"
+          f" | mark schemes: {result['mark_schemes'] / ms_s:8.1f} papers/s {result['ms_pages'] / ms_s:9.1f} pages/s"
+          f" | peak RSS: {result.get('peak_rss_mb')} MB (workers {result.get('peak_worker_rss_mb')} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--corpus-dir", help="where corpora are generated and reused (default: a temporary folder)")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args.run_one, args.workers, args.result)
+        return
+
+    with tempfile.TemporaryDirectory() as temporary:
+        corpus_root = args.corpus_dir or temporary
+        print(f"Benchmarking splitter with {args.workers} worker(s)")
+        for size in args.sizes:
+            report(size, benchmark(size, corpus_root, args.workers))
+
+
+if __name__ == "__main__":
+    main()
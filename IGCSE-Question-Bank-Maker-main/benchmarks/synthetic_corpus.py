@@ -0,0 +1,178 @@
+"""
+Generates synthetic Cambridge-style question papers and mark schemes with
+reportlab, laid out the way splitter.py and MarkSchemeExtractor.py expect:
+
+- Question papers: a cover page, question numbers in the left margin (x < 60),
+  answer lines and diagram boxes as vector drawings, "BLANK PAGE" pages and a
+  Periodic Table data sheet at the back. Every other paper uses the new format,
+  with "DO NOT WRITE IN THIS MARGIN" printed down the right-hand margin.
+- Mark schemes: a cover page, the generic marking-principle pages, then
+  rotated answer tables whose "Question" column (1(a), 1(b), ...) runs along
+  the bottom of the page, inside the footer box the extractor reads.
+
+Files are named like the real ones (0620_s23_qp_41.pdf, 0620_s23_ms_41.pdf).
+
+Usage:
+    python benchmarks/synthetic_corpus.py OUTPUT_DIR [NUMBER_OF_PAPERS]
+"""
+import os
+import random
+import sys
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+WIDTH, HEIGHT = A4
+SUBJECTS = ["0620", "0625", "0610", "9701", "9702", "9618"]
+SEASONS = ["s", "w", "m"]
+WORDS = ("electrolysis moles reaction enthalpy particle energy equilibrium acid base salt "
+         "voltage current resistance force momentum cell enzyme algorithm array database "
+         "network protocol compound element isotope catalyst temperature pressure volume").split()
+GUIDANCE_PAGES = ["Generic Marking Principles", "GENERIC MARKING PRINCIPLE 5:",
+                  "Science-Specific Marking Principles", "Calculation specific guidance"]
+
+
+def paper_names(count):
+    """Yields `count` distinct (subject, season+year, paper+variant) name parts."""
+    produced = 0
+    for year in range(10, 100):
+        for season in SEASONS:
+            for component in ("11", "21", "41", "42", "43", "61"):
+                for subject in SUBJECTS:
+                    if produced == count:
+                        return
+                    yield subject, f"{season}{year}", component
+                    produced += 1
+
+
+def _sentence(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def _top(y):
+    """Converts a fitz (top-down) y coordinate into reportlab's bottom-up one."""
+    return HEIGHT - y
+
+
+def _cover(c, title, code):
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(57, _top(120), "Cambridge IGCSE")
+    c.setFont("Helvetica", 12)
+    c.drawString(57, _top(150), title)
+    c.drawString(57, _top(170), code)
+    c.drawString(57, _top(770), "This document has been generated for benchmarking.")
+    c.showPage()
+
+
+def _margin_phrase(c):
+    for y in (250, 500, 750):
+        c.saveState()
+        c.setFont("Helvetica", 7)
+        c.translate(585, _top(y))
+        c.rotate(90)
+        c.drawString(0, 0, "DO NOT WRITE IN THIS MARGIN")
+        c.restoreState()
+
+
+def write_question_paper(path, rng, questions=8, new_format=False):
+    c = canvas.Canvas(path, pagesize=A4)
+    _cover(c, "CHEMISTRY", os.path.basename(path))
+
+    question, y = 1, 80
+    while question <= questions:
+        if new_format:
+            _margin_phrase(c)
+        # Two or three questions per page, each with text, answer lines and a diagram box
+        while question <= questions and y < 600:
+            c.setFont("Helvetica-Bold", 11)
+            c.drawString(25, _top(y), str(question))
+            c.setFont("Helvetica", 10)
+            for line in range(rng.randint(2, 5)):
+                c.drawString(60, _top(y + line * 14), _sentence(rng, rng.randint(6, 12)))
+            y += 80
+            if rng.random() < 0.6:
+                c.rect(90, _top(y + 90), 300, 80)
+                for _ in range(rng.randint(5, 25)):
+                    c.line(90 + rng.random() * 300, _top(y + 10 + rng.random() * 70),
+                           90 + rng.random() * 300, _top(y + 10 + rng.random() * 70))
+                y += 100
+            for _ in range(rng.randint(1, 3)):
+                c.line(60, _top(y), 520, _top(y))
+                y += 20
+            c.drawString(500, _top(y), f"[{rng.randint(1, 6)}]")
+            y += 40
+            question += 1
+        c.showPage()
+        y = 80
+        if rng.random() < 0.2:
+            c.setFont("Helvetica", 12)
+            c.drawString(250, _top(420), "BLANK PAGE")
+            c.showPage()
+
+    # Vector-heavy data sheet at the back
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(180, _top(60), "The Periodic Table of Elements")
+    c.setFont("Helvetica", 6)
+    for row in range(7):
+        for column in range(18):
+            x, top = 30 + column * 30, 90 + row * 40
+            c.rect(x, _top(top + 36), 28, 36)
+            c.drawString(x + 3, _top(top + 14), str(row * 18 + column + 1))
+    c.showPage()
+    c.save()
+
+
+def write_mark_scheme(path, rng, questions=8):
+    c = canvas.Canvas(path, pagesize=A4)
+    _cover(c, "MARK SCHEME", os.path.basename(path))
+    for heading in GUIDANCE_PAGES:
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(57, _top(80), heading)
+        c.setFont("Helvetica", 10)
+        for line in range(30):
+            c.drawString(57, _top(110 + line * 18), _sentence(rng, 10))
+        c.showPage()
+
+    # Answer tables are printed landscape: every row is a vertical strip and the
+    # "Question" column runs along the bottom of the portrait page
+    x = 81
+    for question in range(1, questions + 1):
+        for part in "abcd"[:rng.randint(2, 4)]:
+            if x > 530:
+                c.showPage()
+                x = 81
+            for y, text in ((765, f"{question}({part})"), (700, _sentence(rng, 5)), (70, str(rng.randint(1, 3)))):
+                c.saveState()
+                c.setFont("Helvetica", 10)
+                c.translate(x, _top(y))
+                c.rotate(90)
+                c.drawString(0, 0, text)
+                c.restoreState()
+            x += 25
+    c.showPage()
+    c.save()
+
+
+def generate(output_dir, count, seed=0):
+    """Writes `count` question papers and their mark schemes; returns (qp_paths, ms_paths)."""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    question_papers, mark_schemes = [], []
+    for index, (subject, session, component) in enumerate(paper_names(count)):
+        questions = rng.randint(5, 10)
+        qp_path = os.path.join(output_dir, f"{subject}_{session}_qp_{component}.pdf")
+        ms_path = os.path.join(output_dir, f"{subject}_{session}_ms_{component}.pdf")
+        write_question_paper(qp_path, rng, questions, new_format=index % 2 == 1)
+        write_mark_scheme(ms_path, rng, questions)
+        question_papers.append(qp_path)
+        mark_schemes.append(ms_path)
+    return question_papers, mark_schemes
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    qps, mss = generate(sys.argv[1], number)
+    print(f"Wrote {len(qps)} question papers and {len(mss)} mark schemes to '{sys.argv[1]}'.")
@@ -0,0 +1,208 @@
+"""
+One copy of every sorted question PDF, however many topics it is filed
+under. PDFs are stored by the SHA-256 of their bytes in
+extracted_questions/blobs/<2 hex digits>/<hash>.pdf, and the topic folders
+of sorted_questions_by_topic/ only hold links to them: hardlinks, or
+symlinks where the filesystem has no hardlinks (copies as a last resort).
+
+sorted_questions_by_topic/ is a view of the question database's topics
+(materialise_view()): it is rebuilt beside the old one and swapped in, so
+topic folders can be renamed or regrouped in the database and re-linked
+in moments, without copying a byte. The sorter only writes to the blob
+store and the database, and the view is rebuilt once at the end (not at
+all if the filings are the same as last time).
+
+    python blob_store.py    # rebuild the view from the database
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from manifest import file_hash
+
+EXTRACTION_ROOT_DIR = "extracted_questions"
+BLOB_DIR = os.path.join(EXTRACTION_ROOT_DIR, "blobs")
+VIEW_DIR = "sorted_questions_by_topic"
+BLOB_SUFFIX = ".pdf"
+# A view being built, and the view it replaces while the two are swapped
+NEW_VIEW_SUFFIX = ".new"
+OLD_VIEW_SUFFIX = ".old"
+# Kept in the view: a hash of the filings it was built from, so an unchanged view is not rebuilt
+VIEW_STATE_NAME = ".view_state.json"
+
+
+class BlobStore:
+    """
+    Content-addressed PDFs: put() stores a file under the hash of its bytes
+    (once; storing the same bytes again costs nothing) and returns the hash,
+    link() makes a path in the view point at a stored file. Blobs are copies,
+    not links to the splitter's files, since the splitter rewrites those in
+    place. stats() reports blobs stored and reused and links by kind.
+    """
+
+    def __init__(self, root=BLOB_DIR):
+        self.root = root
+        self.stored = 0
+        self.reused = 0
+        self.links = {"hardlink": 0, "symlink": 0, "copy": 0}
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + BLOB_SUFFIX)
+
+    def put(self, source):
+        """Stores the file at `source` unless its bytes are already stored; returns their key."""
+        key = file_hash(source)
+        path = self.path(key)
+        if os.path.exists(path):
+            self.reused += 1
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, path)
+        self.stored += 1
+        return key
+
+    def link(self, key, destination):
+        """
+        Makes `destination` the stored file `key`, replacing whatever was
+        there. Returns False if it already was.
+        """
+        path = self.path(key)
+        if os.path.exists(destination) and os.path.samefile(destination, path):
+            return False
+        tmp_path = destination + ".tmp"
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(path, tmp_path)
+            kind = "hardlink"
+        except OSError:
+            # E.g. the blobs are on another drive, or the filesystem has no hardlinks
+            try:
+                # Relative, so the links survive moving the whole folder
+                os.symlink(os.path.relpath(path, os.path.dirname(destination)), tmp_path)
+                kind = "symlink"
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+                kind = "copy"
+        os.replace(tmp_path, destination)
+        self.links[kind] += 1
+        return True
+
+    def prune(self, keys):
+        """Removes the stored files whose keys are not in `keys`; returns how many were removed."""
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for folder in os.listdir(self.root):
+            folder_path = os.path.join(self.root, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for name in os.listdir(folder_path):
+                if name.endswith(BLOB_SUFFIX) and name[:-len(BLOB_SUFFIX)] not in keys:
+                    os.remove(os.path.join(folder_path, name))
+                    removed += 1
+        return removed
+
+    def stats(self):
+        return {"stored": self.stored, "reused": self.reused, **self.links}
+
+
+def recover_view(root=VIEW_DIR):
+    """Puts the previous view back if a run stopped halfway through swapping in a new one."""
+    old_root = root + OLD_VIEW_SUFFIX
+    if not os.path.exists(root) and os.path.isdir(old_root):
+        os.replace(old_root, root)
+    shutil.rmtree(old_root, ignore_errors=True)
+
+
+def view_path(subject_code, topic, sorted_path, root=VIEW_DIR):
+    """Where a question filed under a topic appears in the view."""
+    return os.path.join(root, subject_code, topic, os.path.basename(sorted_path))
+
+
+def read_view_state(root):
+    try:
+        with open(os.path.join(root, VIEW_STATE_NAME), "r", encoding="utf-8") as f:
+            return json.load(f).get("filings")
+    except (ValueError, OSError):
+        return None
+
+
+def materialise_view(store, blobs, root=VIEW_DIR):
+    """
+    Rebuilds the view at `root` from the topics in the question database
+    (a QuestionStore): <subject>/<topic>/<sorted file name> for every filed
+    question. Filings from before the blob store are stored first. The new
+    view is built beside the old one and swapped in; blobs no longer filed
+    anywhere are removed. If the filings are the ones the current view was
+    built from and its files are all there, nothing is done. Returns the numbers of files in the view,
+    of blobs they link to and of blobs removed, and whether it was rebuilt.
+    """
+    recover_view(root)
+    links = []
+    for filing in store.filed_questions():
+        if not filing["sorted_path"]:
+            continue
+        key = filing["blob"]
+        if key is None or not os.path.exists(blobs.path(key)):
+            # Sorted by a version that copied the PDF into each topic folder (or the blob has gone)
+            source = next((path for path in (filing["sorted_path"], filing["file_path"]) if os.path.isfile(path)), None)
+            if source is None:
+                continue
+            key = blobs.put(source)
+            store.set_blob(filing["id"], key)
+        links.append((os.path.relpath(view_path(filing["subject_code"], filing["topic"], filing["sorted_path"], root),
+                                      root), key))
+    keys = {key for _, key in links}
+    filings = hashlib.sha256(json.dumps(sorted(links)).encode("utf-8")).hexdigest()
+    # Files deleted from the view by hand are put back, though
+    if read_view_state(root) == filings and all(os.path.exists(os.path.join(root, path)) for path, _ in links):
+        return {"files": len(links), "blobs": len(keys), "pruned": 0, "rebuilt": False}
+
+    new_root, old_root = root + NEW_VIEW_SUFFIX, root + OLD_VIEW_SUFFIX
+    shutil.rmtree(new_root, ignore_errors=True)
+    os.makedirs(new_root)
+    for relative_path, key in links:
+        destination = os.path.join(new_root, relative_path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        blobs.link(key, destination)
+    with open(os.path.join(new_root, VIEW_STATE_NAME), "w", encoding="utf-8") as f:
+        json.dump({"filings": filings}, f)
+
+    if os.path.exists(root):
+        os.replace(root, old_root)
+    os.replace(new_root, root)
+    shutil.rmtree(old_root, ignore_errors=True)
+    return {"files": len(links), "blobs": len(keys), "pruned": blobs.prune(keys), "rebuilt": True}
+
+
+def main():
+    from question_store import DATABASE_PATH, QuestionStore
+
+    if not os.path.exists(DATABASE_PATH):
+        print(f"Error: The question database '{DATABASE_PATH}' was not found. Please run the splitter first.")
+        return
+    start = time.perf_counter()
+    blobs = BlobStore()
+    with QuestionStore(DATABASE_PATH) as store:
+        view = materialise_view(store, blobs)
+    print_view_stats(view, blobs.stats())
+    print(f"Done in {time.perf_counter() - start:.2f}s.")
+
+
+def print_view_stats(view, stats):
+    if not view["rebuilt"]:
+        print(f"Sorted questions: {view['files']} files linking to {view['blobs']} stored PDFs; "
+              f"unchanged, so '{VIEW_DIR}' was left as it is.")
+        return
+    print(f"Sorted questions: {view['files']} files linking to {view['blobs']} stored PDFs "
+          f"({stats['stored']} newly stored, {view['pruned']} no longer used removed); "
+          f"{stats['hardlink']} hardlinks, {stats['symlink']} symlinks, {stats['copy']} copies made.")
+
+
+if __name__ == "__main__":
+    main()
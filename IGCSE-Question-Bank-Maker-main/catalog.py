@@ -0,0 +1,128 @@
+import json
+import os
+import re
+import time
+from typing import NamedTuple, Optional
+
+# The discovery cache lives alongside the manifest in the splitter's output folder
+EXTRACTION_ROOT_DIR = "extracted_questions"
+CATALOG_NAME = "catalog.json"
+
+# Output folders of the pipeline itself; never searched for source papers
+EXCLUDED_DIRS = {"extracted_questions", "extracted_mark_schemes", "sorted_questions_by_topic"}
+
+# Cambridge file names: <syllabus>_<season><yy>_<kind>_<paper><variant>, e.g. 0620_s23_qp_41
+PAPER_NAME = re.compile(r"^(\d{4})_([smw])(\d{2})_([a-z]{2})_(\d)(\d*)$", re.IGNORECASE)
+# A folder modified this close to its scan may have changed again within the same timestamp tick
+MTIME_GRANULARITY_NS = 2 * 10**9
+
+
+class PaperInfo(NamedTuple):
+    """What a paper's file name says about it; fields a non-standard name lacks are None."""
+    path: str
+    name: str
+    subject_code: str
+    year: Optional[int]
+    season: Optional[str]
+    kind: Optional[str]
+    paper: Optional[str]
+    variant: Optional[str]
+
+    def info(self):
+        """The paper's metadata without its path, as stored with split questions."""
+        info = self._asdict()
+        del info["path"]
+        return info
+
+
+def parse_name(path):
+    """
+    Parses a file name like '0620_s23_qp_41.pdf' into a PaperInfo. Names that
+    do not follow the pattern keep the first 4-digit number as the subject code
+    and a 'qp' or 'ms' not part of a longer word (e.g. 'chem qp2') as the kind.
+    """
+    name, _ = os.path.splitext(os.path.basename(path))
+    match = PAPER_NAME.match(name)
+    if match:
+        subject_code, season, year, kind, paper, variant = match.groups()
+        return PaperInfo(path, name, subject_code, 2000 + int(year), season.lower(), kind.lower(), paper, variant or None)
+
+    code = re.search(r"\d{4}", name)
+    kind = re.search(r"(?<![a-z])(qp|ms)(?![a-z])", name.lower())
+    return PaperInfo(path, name, code.group(0) if code else "unknown_subject",
+                     None, None, kind.group(1) if kind else None, None, None)
+
+
+class Catalog:
+    """
+    Finds the PDFs below a folder with os.scandir and parses their names.
+
+    The listing of every folder is cached with the folder's modification time,
+    which changes whenever an entry is added, removed or renamed, so a re-scan
+    only lists folders that have changed since the last run.
+    """
+
+    def __init__(self, cache_path=os.path.join(EXTRACTION_ROOT_DIR, CATALOG_NAME)):
+        self.path = cache_path
+        self.folders = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    self.folders = json.load(f).get("folders", {})
+            except (ValueError, OSError) as e:
+                print(f"Warning: Could not read catalog '{cache_path}', starting a new one. Reason: {e}")
+
+    def _list(self, folder):
+        """Returns (pdf file names, sub-folder names) of one folder, from the cache when it is unchanged."""
+        key = os.path.normpath(folder)
+        mtime_ns = os.stat(folder).st_mtime_ns
+        cached = self.folders.get(key)
+        if (cached is not None and cached["mtime_ns"] == mtime_ns
+                and cached["scanned_ns"] - mtime_ns > MTIME_GRANULARITY_NS):
+            return cached["files"], cached["folders"]
+
+        scanned_ns = time.time_ns()
+        files, folders = [], []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if entry.name not in EXCLUDED_DIRS:
+                        folders.append(entry.name)
+                elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                    files.append(entry.name)
+        files.sort()
+        folders.sort()
+        self.folders[key] = {"mtime_ns": mtime_ns, "scanned_ns": scanned_ns, "files": files, "folders": folders}
+        return files, folders
+
+    def scan(self, root, kind=None):
+        """Returns a PaperInfo for every PDF below `root` (or `root` itself if it is a file), in path order."""
+        if os.path.isfile(root):
+            papers = [parse_name(root)]
+        else:
+            papers = []
+            pending = [root]
+            while pending:
+                folder = pending.pop()
+                files, folders = self._list(folder)
+                papers.extend(parse_name(os.path.join(folder, name)) for name in files)
+                pending.extend(os.path.join(folder, name) for name in reversed(folders))
+            papers.sort(key=lambda paper: paper.path)
+        return [paper for paper in papers if kind is None or paper.kind == kind]
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"folders": self.folders}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def discover(root, kind=None, cache=True):
+    """Lists the papers below `root`, optionally only one kind ('qp' or 'ms'), and updates the cache."""
+    catalog = Catalog() if cache else Catalog(cache_path=None)
+    papers = catalog.scan(root, kind)
+    catalog.save()
+    return papers
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import time
+import unicodedata
+
+# The cache lives alongside the question database in the splitter's output folder
+EXTRACTION_ROOT_DIR = "extracted_questions"
+CACHE_NAME = "classifications.db"
+CACHE_PATH = os.path.join(EXTRACTION_ROOT_DIR, CACHE_NAME)
+
+# Environment variables that bound the cache for script.py and batch.py runs
+MAX_ENTRIES_ENV = "QBANK_CACHE_MAX_ENTRIES"    # classifications kept; the least recently used go first
+MAX_AGE_ENV = "QBANK_CACHE_MAX_AGE_DAYS"       # classifications older than this are asked for again
+DEFAULT_MAX_ENTRIES = 100_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    key TEXT PRIMARY KEY,
+    subject_code TEXT NOT NULL,
+    syllabus_hash TEXT NOT NULL,
+    topics TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS classifications_by_use ON classifications (used_at);
+CREATE INDEX IF NOT EXISTS classifications_by_subject ON classifications (subject_code, syllabus_hash);
+"""
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalise(question_text):
+    """Question text as it is hashed: Unicode-normalised, with runs of whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", question_text).split())
+
+
+class ClassificationCache:
+    """
+    Persistent cache of the sorter's classifications (SQLite). A question is
+    looked up by a hash of its normalised text, its subject, the syllabus
+    text, the model and the prompt version, so a changed syllabus, model or
+    prompt is never answered from the cache.
+
+    When a subject's syllabus changes, check_syllabus() removes the
+    subject's classifications against the old one. prune() (run on close)
+    removes classifications older than `max_age_days` and then the least
+    recently used beyond `max_entries`; None means no limit. stats() reports
+    hits, misses and the hit rate of this run.
+    """
+
+    def __init__(self, model, prompt_version, path=CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_age_days=None):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.invalidated = 0
+        self.evicted = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    @classmethod
+    def from_environment(cls, model, prompt_version, path=CACHE_PATH):
+        max_entries = os.environ.get(MAX_ENTRIES_ENV)
+        max_age_days = os.environ.get(MAX_AGE_ENV)
+        return cls(model, prompt_version, path,
+                   max_entries=int(max_entries) if max_entries else DEFAULT_MAX_ENTRIES,
+                   max_age_days=float(max_age_days) if max_age_days else None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.prune()
+        self.connection.close()
+
+    def key(self, subject_code, syllabus_text, question_text):
+        return text_hash("\0".join([normalise(question_text), subject_code, text_hash(syllabus_text),
+                                    self.model, str(self.prompt_version)]))
+
+    def get(self, subject_code, syllabus_text, question_text):
+        """Returns the cached topics string for a question, or None if it has not been classified."""
+        key = self.key(subject_code, syllabus_text, question_text)
+        row = self.connection.execute("SELECT topics, created_at FROM classifications WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.max_age_days is not None and now - row[1] > self.max_age_days * 86400):
+            self.misses += 1
+            return None
+        with self.connection:
+            self.connection.execute("UPDATE classifications SET used_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0]
+
+    def put(self, subject_code, syllabus_text, question_text, topics):
+        now = time.time()
+        with self.connection:
+            self.connection.execute("""
+                INSERT OR REPLACE INTO classifications (key, subject_code, syllabus_hash, topics, created_at, used_at)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (self.key(subject_code, syllabus_text, question_text), subject_code, text_hash(syllabus_text),
+                 topics, now, now))
+        self.stored += 1
+
+    def check_syllabus(self, subject_code, syllabus_text):
+        """Drops a subject's classifications made against any other version of its syllabus."""
+        with self.connection:
+            removed = self.connection.execute(
+                "DELETE FROM classifications WHERE subject_code = ? AND syllabus_hash != ?",
+                (subject_code, text_hash(syllabus_text))).rowcount
+        if removed:
+            print(f"  - The syllabus for {subject_code} has changed: {removed} cached classifications discarded.")
+        self.invalidated += removed
+        return removed
+
+    def prune(self):
+        """Evicts classifications past the age limit, then the least recently used past the size limit."""
+        with self.connection:
+            if self.max_age_days is not None:
+                self.evicted += self.connection.execute(
+                    "DELETE FROM classifications WHERE created_at < ?",
+                    (time.time() - self.max_age_days * 86400,)).rowcount
+            if self.max_entries is not None:
+                self.evicted += self.connection.execute("""
+                    DELETE FROM classifications WHERE key IN (
+                        SELECT key FROM classifications ORDER BY used_at DESC LIMIT -1 OFFSET ?)""",
+                    (self.max_entries,)).rowcount
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stored": self.stored, "invalidated": self.invalidated, "evicted": self.evicted}
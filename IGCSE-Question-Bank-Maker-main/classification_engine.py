@@ -0,0 +1,268 @@
+import os
+import random
+import threading
+import time
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+# Environment variables that set the engine's limits for script.py and batch.py runs
+RPM_ENV = "QBANK_REQUESTS_PER_MINUTE"
+TPM_ENV = "QBANK_TOKENS_PER_MINUTE"
+CONCURRENCY_ENV = "QBANK_CONCURRENCY"
+
+# Gemini 2.5 Flash free-tier quota; paid tiers allow far more
+DEFAULT_REQUESTS_PER_MINUTE = 10
+DEFAULT_TOKENS_PER_MINUTE = 250_000
+DEFAULT_CONCURRENCY = 4
+# Allowance for the model's answer on top of the prompt, in tokens
+RESPONSE_TOKENS = 64
+
+
+def estimate_tokens(text):
+    """Rough token count of a prompt (about four characters per token for English text)."""
+    return len(text) // 4 + RESPONSE_TOKENS
+
+
+def status_of(error):
+    """HTTP status of a failed API call (Gemini and urllib errors both carry it as .code), or None."""
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    """Quota errors (429), server errors (5xx) and dropped connections are worth retrying."""
+    status = status_of(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError, urllib.error.URLError))
+
+
+def retry_after(error):
+    """The server's Retry-After hint in seconds, if it sent one."""
+    headers = getattr(error, "headers", None)
+    try:
+        return float(headers.get("Retry-After")) if headers is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """
+    Allows at most `per_minute` units (requests or tokens) in any 60 seconds.
+    Up to `burst` units can be taken at once; the rest of the budget refills
+    continuously. acquire() blocks until the units are available. A request
+    bigger than the burst waits for a full bucket and then takes all it
+    needs, leaving the bucket in debt: later callers wait until it has
+    refilled, so big requests are charged in full.
+    """
+
+    def __init__(self, per_minute, burst=None):
+        self.per_minute = per_minute
+        self.capacity = burst or max(1.0, per_minute / 10)
+        # The burst plus a minute's refill never exceeds the limit
+        self.rate = max(per_minute - self.capacity, per_minute / 10) / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Takes `amount` units, waiting as long as necessary; returns the seconds waited."""
+        # A request bigger than the whole bucket waits for a full bucket rather than forever
+        needed = min(amount, self.capacity)
+        waited = 0.0
+        # Waiting while holding the lock makes later callers queue up behind this one
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    # May go below zero (see above)
+                    self.tokens -= amount
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+                time.sleep(delay)
+                waited += delay
+
+
+class CircuitBreaker:
+    """
+    Stops calling an API that keeps failing. After `failure_threshold`
+    consecutive retryable failures the circuit opens and calls fail at once
+    with CircuitOpenError; after `reset_seconds` one trial call is let
+    through, and its success closes the circuit again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_running:
+                raise CircuitOpenError(f"The API failed {self.failures} times in a row; not calling it for now.")
+            # Half-open: this call is the trial
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            # A failed trial re-opens the circuit for another reset_seconds
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.trips += 1
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class ClassificationEngine:
+    """
+    Sends prompts to a classification API through `function(prompt) -> text`,
+    with up to `concurrency` requests in flight.
+
+    Every request first takes one unit from a requests-per-minute bucket and
+    its estimated size from a tokens-per-minute bucket (None switches a limit
+    off). Quota and server errors are retried up to `max_retries` times after
+    an exponential backoff with full jitter (or the server's Retry-After, if
+    longer); a CircuitBreaker stops requests while the API keeps failing.
+    """
+
+    def __init__(self, function, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, concurrency=DEFAULT_CONCURRENCY, max_retries=5,
+                 backoff_base=2.0, backoff_cap=60.0, breaker=None):
+        self.function = function
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="classify")
+        self.counts = {"requests": 0, "succeeded": 0, "retries": 0, "failed": 0, "rejected": 0,
+                       "throttled_seconds": 0.0, "backoff_seconds": 0.0,
+                       "batches": 0, "batched_questions": 0, "batch_fallbacks": 0,
+                       "prompt_tokens": 0, "prompt_tokens_full_syllabus": 0}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, function):
+        requests_per_minute = os.environ.get(RPM_ENV)
+        tokens_per_minute = os.environ.get(TPM_ENV)
+        concurrency = os.environ.get(CONCURRENCY_ENV)
+        return cls(function,
+                   requests_per_minute=float(requests_per_minute) if requests_per_minute else DEFAULT_REQUESTS_PER_MINUTE,
+                   tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else DEFAULT_TOKENS_PER_MINUTE,
+                   concurrency=int(concurrency) if concurrency else DEFAULT_CONCURRENCY)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after(error) or 0.0)
+
+    def call(self, prompt):
+        """Sends one prompt, retrying quota and server errors; raises once retries run out."""
+        tokens = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("rejected")
+                raise
+            throttled = self.requests.acquire() if self.requests else 0.0
+            throttled += self.tokens.acquire(tokens) if self.tokens else 0.0
+            self._count("throttled_seconds", throttled)
+            self._count("requests")
+            try:
+                text = self.function(prompt)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The API answered (e.g. a bad request), so it is not down
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                self._count("retries")
+                self._count("backoff_seconds", delay)
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._count("succeeded")
+            return text
+
+    def classify(self, prompt):
+        """Like call(), but reports a failure and returns None instead of raising."""
+        try:
+            return self.call(prompt)
+        except Exception as e:
+            self._count("failed")
+            print(f"  -> Classification API Error: {e}")
+            return None
+
+    def submit(self, prompt):
+        """Starts classifying a prompt in the background; returns a Future of classify()'s result."""
+        return self.executor.submit(self.classify, prompt)
+
+    def record_batch(self, size, missing):
+        """Counts a prompt that classified `size` questions at once, `missing` of which it left unanswered."""
+        self._count("batches")
+        self._count("batched_questions", size)
+        self._count("batch_fallbacks", missing)
+
+    def record_prompt(self, tokens, full_syllabus_tokens):
+        """Counts a prompt's estimated tokens, and what it would have taken with the whole syllabus in it."""
+        self._count("prompt_tokens", tokens)
+        self._count("prompt_tokens_full_syllabus", full_syllabus_tokens)
+
+    def map(self, prompts):
+        """
+        Classifies the prompts concurrently; yields the answers (None for
+        failures) in order. Requests start when the first answer is asked for.
+        """
+        futures = [self.submit(prompt) for prompt in prompts]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Stopped early (e.g. Ctrl+C): requests not yet started are dropped
+            for future in futures:
+                future.cancel()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+        stats["backoff_seconds"] = round(stats["backoff_seconds"], 3)
+        stats["breaker_trips"] = self.breaker.trips
+        return stats
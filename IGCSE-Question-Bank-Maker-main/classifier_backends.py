@@ -0,0 +1,170 @@
+"""
+Where the sorter's prompts are answered. A backend is called with a prompt
+and returns the model's answer as text, raising on failure (the
+ClassificationEngine retries what is worth retrying); its `model` names
+the model behind it, which keys the classification cache.
+
+- GeminiBackend: the Gemini API, through one client for every request.
+- StandInBackend: the local stand-in API (stand_in_server.py), or anything
+  that answers POST {"prompt"} with {"text"}.
+- CassetteBackend: records another backend's answers to a file, or replays
+  them from it, so a sort can be repeated without network access or an API
+  key.
+
+open_backend() picks one from the environment:
+
+    QBANK_CLASSIFIER_URL=http://127.0.0.1:8765/classify    the stand-in instead of Gemini
+    QBANK_CASSETTE=run.cassette QBANK_CASSETTE_MODE=record  record whichever of those is used
+    QBANK_CASSETTE=run.cassette                             replay it (QBANK_CASSETTE_MODE=replay)
+    QBANK_CASSETTE_LATENCY=0.5                              seconds each replayed answer takes
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+
+API_KEY_ENV = "GOOGLE_API_KEY"
+CLASSIFIER_URL_ENV = "QBANK_CLASSIFIER_URL"
+CASSETTE_ENV = "QBANK_CASSETTE"
+CASSETTE_MODE_ENV = "QBANK_CASSETTE_MODE"
+CASSETTE_LATENCY_ENV = "QBANK_CASSETTE_LATENCY"
+CASSETTE_MODES = ("record", "replay")
+
+
+class BackendUnavailable(Exception):
+    """The configured backend cannot be used, e.g. because GOOGLE_API_KEY is not set."""
+
+
+class CassetteMiss(Exception):
+    """A replayed cassette has no answer for the prompt."""
+
+
+class GeminiBackend:
+    def __init__(self, model_name, api_key=None, temperature=0.2):
+        api_key = api_key or os.environ.get(API_KEY_ENV)
+        if not api_key:
+            raise BackendUnavailable(f"{API_KEY_ENV} environment variable not set.")
+        # Only needed when the real API is used
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = model_name
+        self.client = genai.GenerativeModel(model_name)
+        # Increased temperature for better creative classification, but keep it low for accuracy
+        self.generation_config = {"temperature": temperature}
+
+    def __call__(self, prompt):
+        response = self.client.generate_content(prompt, generation_config=self.generation_config)
+        return response.text.strip()
+
+    def close(self):
+        pass
+
+
+class StandInBackend:
+    model = "stand-in"
+
+    def __init__(self, url, timeout=60):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, prompt):
+        request = urllib.request.Request(self.url, data=json.dumps({"prompt": prompt}).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)["text"].strip()
+
+    def close(self):
+        pass
+
+
+def prompt_key(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class CassetteBackend:
+    """
+    With a `backend`, passes every prompt on to it and appends the answer to
+    the cassette at `path` (one JSON object per line). Without one, answers
+    from the cassette, after `latency` seconds, and raises CassetteMiss for
+    prompts it does not hold. Failed calls are not recorded.
+    """
+
+    def __init__(self, path, backend=None, latency=0.0):
+        self.path = path
+        self.backend = backend
+        self.latency = latency
+        self.answers = {}
+        self.recorded_model = None
+        self.replayed = 0
+        self.missed = 0
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.answers[entry["key"]] = entry["text"]
+                        self.recorded_model = entry.get("model", self.recorded_model)
+        elif backend is None:
+            raise BackendUnavailable(f"Cassette '{path}' not found; record one first ({CASSETTE_MODE_ENV}=record).")
+        self.file = open(path, "a", encoding="utf-8") if backend is not None else None
+
+    @property
+    def model(self):
+        return self.backend.model if self.backend is not None else (self.recorded_model or "cassette")
+
+    def __call__(self, prompt):
+        key = prompt_key(prompt)
+        if self.backend is not None:
+            text = self.backend(prompt)
+            with self.lock:
+                self.answers[key] = text
+                self.file.write(json.dumps({"key": key, "model": self.backend.model, "text": text}) + "\n")
+                self.file.flush()
+            return text
+
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            text = self.answers.get(key)
+            if text is None:
+                self.missed += 1
+                raise CassetteMiss(f"No recorded answer for this prompt ({key[:12]}) in '{self.path}'.")
+            self.replayed += 1
+        return text
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        if self.backend is not None:
+            self.backend.close()
+
+
+def configuration_error():
+    """Why open_backend() would fail with the current environment, or None (without loading any client)."""
+    mode = os.environ.get(CASSETTE_MODE_ENV, "replay")
+    cassette = os.environ.get(CASSETTE_ENV)
+    if cassette and mode not in CASSETTE_MODES:
+        return f"{CASSETTE_MODE_ENV} must be one of {', '.join(CASSETTE_MODES)}, not '{mode}'."
+    if cassette and mode == "replay":
+        return None if os.path.exists(cassette) else f"Cassette '{cassette}' not found."
+    if not os.environ.get(CLASSIFIER_URL_ENV) and not os.environ.get(API_KEY_ENV):
+        return f"{API_KEY_ENV} environment variable not set."
+    return None
+
+
+def open_backend(model_name):
+    """The backend the environment asks for (see the top of this file); raises BackendUnavailable if it cannot be used."""
+    error = configuration_error()
+    if error:
+        raise BackendUnavailable(error)
+    cassette = os.environ.get(CASSETTE_ENV)
+    if cassette and os.environ.get(CASSETTE_MODE_ENV, "replay") == "replay":
+        latency = os.environ.get(CASSETTE_LATENCY_ENV)
+        return CassetteBackend(cassette, latency=float(latency) if latency else 0.0)
+
+    url = os.environ.get(CLASSIFIER_URL_ENV)
+    backend = StandInBackend(url) if url else GeminiBackend(model_name)
+    return CassetteBackend(cassette, backend) if cassette else backend
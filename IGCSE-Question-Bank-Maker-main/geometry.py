@@ -0,0 +1,38 @@
+import fitz
+import numpy as np
+
+# MuPDF's "infinite" rectangle, which fitz never treats as intersecting anything
+INFINITE = (fitz.FZ_MIN_INF_RECT, fitz.FZ_MAX_INF_RECT)
+
+
+def as_boxes(items, bbox=lambda item: item):
+    """Packs the bboxes of `items` into an (N, 4) float array of x0, y0, x1, y1."""
+    boxes = np.array([tuple(bbox(item)) for item in items], dtype=float)
+    return boxes.reshape(-1, 4)
+
+
+def _is_empty(boxes):
+    return (boxes[:, 0] >= boxes[:, 2]) | (boxes[:, 1] >= boxes[:, 3])
+
+
+def _is_infinite(boxes):
+    low, high = INFINITE
+    return ((boxes[:, 0] == low) & (boxes[:, 1] == low)
+            & (boxes[:, 2] == high) & (boxes[:, 3] == high))
+
+
+def intersects(boxes, rect):
+    """Row mask of the boxes that fitz.Rect(box).intersects(rect) would accept."""
+    rect = fitz.Rect(rect)
+    if rect.is_empty or rect.is_infinite:
+        return np.zeros(len(boxes), dtype=bool)
+    return (~_is_empty(boxes) & ~_is_infinite(boxes)
+            & (boxes[:, 0] < rect.x1) & (rect.x0 < boxes[:, 2])
+            & (boxes[:, 1] < rect.y1) & (rect.y0 < boxes[:, 3]))
+
+
+def contained(boxes, rect):
+    """Row mask of the boxes for which `fitz.Rect(box) in rect` holds."""
+    rect = fitz.Rect(rect)
+    return ((rect.x0 <= boxes[:, 0]) & (boxes[:, 0] <= boxes[:, 2]) & (boxes[:, 2] <= rect.x1)
+            & (rect.y0 <= boxes[:, 1]) & (boxes[:, 1] <= boxes[:, 3]) & (boxes[:, 3] <= rect.y1))
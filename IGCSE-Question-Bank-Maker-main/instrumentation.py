@@ -0,0 +1,187 @@
+import cProfile
+import json
+import os
+import time
+from contextlib import nullcontext
+
+# Environment variables that switch instrumentation on for script.py runs
+REPORT_ENV = "QBANK_TIMINGS"      # path of the JSON report to write
+PROFILE_ENV = "QBANK_PROFILE"     # comma-separated paper names to profile, or "*"
+PROFILER_ENV = "QBANK_PROFILER"   # "cprofile" (default) or "pyinstrument"
+
+
+class PaperTimer:
+    """Wall and CPU time of each pipeline stage for one paper or mark scheme."""
+
+    def __init__(self, name, kind, profiler=None):
+        self.record = {"name": name, "kind": kind, "stages": {}}
+        self._profiler = profiler
+        self._lap = None
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def stage(self, name):
+        """Context manager timing one stage; repeated stages accumulate."""
+        return _Stage(self, name)
+
+    def lap(self, name):
+        """Ends the running lap (if any) and starts timing `name`; for code without natural blocks."""
+        self._end_lap()
+        self._lap = (name, time.perf_counter(), time.process_time())
+
+    def _end_lap(self):
+        if self._lap is not None:
+            name, wall, cpu = self._lap
+            self._add(name, time.perf_counter() - wall, time.process_time() - cpu)
+            self._lap = None
+
+    def _add(self, name, wall, cpu):
+        stage = self.record["stages"].setdefault(name, {"wall": 0.0, "cpu": 0.0})
+        stage["wall"] += wall
+        stage["cpu"] += cpu
+
+    def finish(self, error=None):
+        self._end_lap()
+        self.record["wall"] = time.perf_counter() - self._wall
+        self.record["cpu"] = time.process_time() - self._cpu
+        if error is not None:
+            self.record["error"] = str(error)
+        if self._profiler is not None:
+            self.record["profile"] = self._profiler.stop(self.record["name"])
+        return self.record
+
+
+class _Stage:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def __exit__(self, *exc):
+        self.timer._add(self.name, time.perf_counter() - self.wall, time.process_time() - self.cpu)
+        return False
+
+
+class _NullTimer:
+    """Stands in for PaperTimer when instrumentation is off; every call is a no-op."""
+
+    record = None
+    _stage = nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def lap(self, name):
+        pass
+
+    def finish(self, error=None):
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _Profiler:
+    """Runs cProfile (or pyinstrument, if installed and asked for) around one paper."""
+
+    def __init__(self, kind, output_dir):
+        self.output_dir = output_dir
+        self.kind = kind
+        if kind == "pyinstrument":
+            try:
+                import pyinstrument
+                self._profiler = pyinstrument.Profiler()
+            except ImportError:
+                print("Warning: pyinstrument is not installed, profiling with cProfile instead.")
+                self.kind = "cprofile"
+        if self.kind == "cprofile":
+            self._profiler = cProfile.Profile()
+        if self.kind == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self, name):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+            path = os.path.join(self.output_dir, f"{name}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            path = os.path.join(self.output_dir, f"{name}.prof")
+            self._profiler.dump_stats(path)
+        return path
+
+
+class Instrumentation:
+    """
+    Collects per-stage timings for every paper the pipeline processes and
+    writes them as a JSON report. Papers named in `profile` (or all, with
+    "*") are also run under a profiler, one output file per paper.
+
+    A disabled Instrumentation hands out a shared no-op timer, so leaving the
+    calls in place costs nothing measurable.
+    """
+
+    def __init__(self, enabled=True, report_path=None, profile=(), profiler="cprofile", profile_dir="profiles"):
+        self.enabled = enabled
+        self.report_path = report_path
+        self.profile = set(profile)
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.papers = []
+
+    @classmethod
+    def from_environment(cls):
+        report_path = os.environ.get(REPORT_ENV)
+        profile = [name.strip() for name in os.environ.get(PROFILE_ENV, "").split(",") if name.strip()]
+        if not (report_path or profile):
+            return DISABLED
+        return cls(report_path=report_path, profile=profile, profiler=os.environ.get(PROFILER_ENV, "cprofile"))
+
+    def settings(self):
+        """Constructor arguments, so that pool workers can build an equivalent instance."""
+        return {"enabled": self.enabled, "report_path": None, "profile": sorted(self.profile),
+                "profiler": self.profiler, "profile_dir": self.profile_dir}
+
+    def start(self, name, kind):
+        if not self.enabled:
+            return NULL_TIMER
+        profiler = None
+        if "*" in self.profile or name in self.profile:
+            profiler = _Profiler(self.profiler, self.profile_dir)
+        timer = PaperTimer(name, kind, profiler)
+        self.papers.append(timer.record)
+        return timer
+
+    def add(self, record):
+        """Adds a record timed in another process."""
+        if self.enabled and record is not None:
+            self.papers.append(record)
+
+    def summary(self):
+        totals = {}
+        for paper in self.papers:
+            for name, stage in paper["stages"].items():
+                total = totals.setdefault(f"{paper['kind']}.{name}", {"wall": 0.0, "cpu": 0.0, "count": 0})
+                total["wall"] += stage["wall"]
+                total["cpu"] += stage["cpu"]
+                total["count"] += 1
+        slowest = sorted((p for p in self.papers if "wall" in p), key=lambda p: p["wall"], reverse=True)[:10]
+        return {"stages": totals, "slowest": [{"name": p["name"], "wall": p["wall"]} for p in slowest]}
+
+    def save(self):
+        if not (self.enabled and self.report_path):
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "papers": self.papers}, f, indent=2)
+        print(f"\nTiming report written to '{self.report_path}'.")
+
+
+DISABLED = Instrumentation(enabled=False)
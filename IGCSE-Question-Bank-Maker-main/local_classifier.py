@@ -0,0 +1,248 @@
+"""
+An offline first pass for the sorter. Each major topic of a compiled
+syllabus (syllabus_compiler.py) becomes a TF-IDF vector of its name,
+subtopics and detail; questions are scored against them by cosine
+similarity with NumPy, a batch at a time. A question is assigned its best
+topic locally when that topic clearly beats the runner-up (its relative
+margin, (best - second) / best, is at least QBANK_LOCAL_CONFIDENCE); the
+rest are left for the API.
+
+    python local_classifier.py [--target 0.95]
+
+compares the local classifier with the API's classifications in the
+classification cache: thresholds are chosen on one half of the questions
+and their agreement and coverage reported on the other, held-out half.
+"""
+import argparse
+import os
+import re
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from syllabus_compiler import STOPWORDS, WORD, load_compiled_syllabus, text_hash
+
+# Relative margin the best topic needs over the runner-up to be assigned locally; "off" disables
+CONFIDENCE_ENV = "QBANK_LOCAL_CONFIDENCE"
+DEFAULT_MIN_CONFIDENCE = 0.5
+# Below this cosine similarity a question shares too few words with any topic to judge
+MIN_SCORE = 0.05
+# Questions vectorised at once; bounds the dense matrix to CHUNK_SIZE x vocabulary
+CHUNK_SIZE = 1024
+SUFFIXES = ("ing", "ed", "es", "s")
+
+
+# Exam questions repeat a small vocabulary, so stems are worth remembering
+@lru_cache(maxsize=1 << 16)
+def stem(word):
+    """A light stem, so that e.g. 'electrodes' and 'electrode' count as the same word."""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4 and not word.endswith("ss"):
+            return word[:-len(suffix)]
+    return word
+
+
+def terms(text):
+    return [stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def topic_label(topic):
+    """A major topic in the format the API answers with, e.g. 'Topic_6_Security privacy and data integrity'."""
+    name = " ".join(re.sub(r"[^A-Za-z0-9 ]+", " ", topic["name"]).split())
+    return f"Topic_{topic['number']}_{name}"
+
+
+def topic_numbers(topics_string):
+    """The major topic numbers in an API answer ('Topic_1_X, Topic_3_Y' -> {'1', '3'})."""
+    return set(re.findall(r"Topic_(\d+)", topics_string or ""))
+
+
+class TopicModel:
+    """TF-IDF vectors of a compiled syllabus's major topics."""
+
+    def __init__(self, compiled):
+        self.topics = compiled["topics"]
+        self.labels = [topic_label(topic) for topic in self.topics]
+        documents = [terms(f"{topic['name']}\n{topic['text']}" + "".join(
+            f"{subtopic['name']}\n{subtopic['text']}" for subtopic in topic["subtopics"])) for topic in self.topics]
+
+        self.vocabulary = {}
+        for document in documents:
+            for term in document:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+        document_frequency = np.zeros(len(self.vocabulary))
+        for document in documents:
+            document_frequency[[self.vocabulary[term] for term in set(document)]] += 1
+        # Smoothed IDF: a word found in every topic still counts a little
+        self.idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        self.matrix = self._vectorise(documents)
+
+    def _vectorise(self, documents):
+        """Rows of L2-normalised TF-IDF (with sublinear term frequency) for lists of terms."""
+        rows, columns, counts = [], [], []
+        for row, document in enumerate(documents):
+            frequencies = {}
+            for term in document:
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    frequencies[column] = frequencies.get(column, 0) + 1
+            rows.extend([row] * len(frequencies))
+            columns.extend(frequencies)
+            counts.extend(frequencies.values())
+        vectors = np.zeros((len(documents), len(self.vocabulary)))
+        if counts:
+            vectors[rows, columns] = 1 + np.log(counts)
+        vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def scores(self, question_texts):
+        """Cosine similarity of every question (rows) with every major topic (columns)."""
+        if not self.topics or not self.vocabulary:
+            return np.zeros((len(question_texts), len(self.topics)))
+        return np.vstack([self._vectorise([terms(text) for text in question_texts[start:start + CHUNK_SIZE]])
+                          @ self.matrix.T for start in range(0, len(question_texts), CHUNK_SIZE)]
+                         or [np.zeros((0, len(self.topics)))])
+
+    def predict(self, question_texts):
+        """Returns each question's best topic (an index), its score and its relative margin over the runner-up."""
+        scores = self.scores(question_texts)
+        if scores.shape[1] == 0:
+            empty = np.zeros(len(question_texts))
+            return empty.astype(int), empty, empty
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(scores)), best]
+        second_scores = np.sort(scores, axis=1)[:, -2] if scores.shape[1] > 1 else np.zeros(len(scores))
+        margins = np.divide(best_scores - second_scores, best_scores, out=np.zeros(len(scores)),
+                            where=best_scores > 0)
+        return best, best_scores, margins
+
+
+class LocalClassifier:
+    """
+    Classifies questions locally where it can (see TopicModel). classify()
+    returns a topics string for the questions it is confident about and None
+    for the rest, which are meant for the API; `min_confidence` None switches
+    it off. stats() reports how many questions were assigned and escalated.
+    """
+
+    def __init__(self, min_confidence=DEFAULT_MIN_CONFIDENCE, min_score=MIN_SCORE):
+        self.min_confidence = min_confidence
+        self.min_score = min_score
+        self.models = {}
+        self.assigned = 0
+        self.escalated = 0
+
+    @classmethod
+    def from_environment(cls):
+        min_confidence = os.environ.get(CONFIDENCE_ENV)
+        if min_confidence and min_confidence.lower() == "off":
+            return cls(min_confidence=None)
+        return cls(min_confidence=float(min_confidence) if min_confidence else DEFAULT_MIN_CONFIDENCE)
+
+    def model(self, subject_code, syllabus_text):
+        """The subject's TopicModel, rebuilt when its syllabus changes."""
+        syllabus_hash = text_hash(syllabus_text)
+        if subject_code not in self.models or self.models[subject_code][0] != syllabus_hash:
+            self.models[subject_code] = (syllabus_hash,
+                                         TopicModel(load_compiled_syllabus(subject_code, syllabus_text)))
+        return self.models[subject_code][1]
+
+    def classify(self, subject_code, syllabus_text, question_texts):
+        if self.min_confidence is None or not question_texts:
+            return [None] * len(question_texts)
+        model = self.model(subject_code, syllabus_text)
+        best, scores, margins = model.predict(question_texts)
+        confident = (scores >= self.min_score) & (margins >= self.min_confidence)
+        self.assigned += int(confident.sum())
+        self.escalated += len(question_texts) - int(confident.sum())
+        return [model.labels[topic] if sure else None for topic, sure in zip(best.tolist(), confident.tolist())]
+
+    def stats(self):
+        total = self.assigned + self.escalated
+        return {"assigned": self.assigned, "escalated": self.escalated,
+                "assigned_share": round(self.assigned / total, 3) if total else None}
+
+
+# --- EVALUATION AGAINST THE API ---
+
+THRESHOLDS = [round(0.05 * step, 2) for step in range(20)]
+
+
+def agreement(rows, threshold):
+    """(coverage, agreement) of local assignments at a threshold over (margin, score, agrees) rows."""
+    if not rows:
+        return None, None
+    assigned = [agrees for margin, score, agrees in rows if score >= MIN_SCORE and margin >= threshold]
+    return len(assigned) / len(rows), (sum(assigned) / len(assigned) if assigned else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", type=float, default=0.95,
+                        help="agreement with the API the chosen threshold must reach on the tuning half")
+    args = parser.parse_args(argv)
+
+    # Needs the model name and prompt version the cached classifications were made with
+    import sorting
+    from question_store import QuestionStore
+
+    store = QuestionStore(sorting.QUESTION_DATABASE)
+    cache = sorting.open_classification_cache()
+    classifier = LocalClassifier()
+    tuning, held_out = [], []
+    texts, seconds = 0, 0.0
+    for subject_code in store.subjects():
+        syllabus_text = sorting.load_syllabus(subject_code)
+        if syllabus_text is None:
+            continue
+        labelled = []
+        for question in store.questions(subject_code=subject_code):
+            topics_string = question["text"] and cache.get(subject_code, syllabus_text, question["text"])
+            if topics_string:
+                labelled.append((question, topic_numbers(topics_string)))
+        if not labelled:
+            continue
+        model = classifier.model(subject_code, syllabus_text)
+        question_texts = [question["text"] for question, _ in labelled]
+        start = time.perf_counter()
+        best, scores, margins = model.predict(question_texts)
+        seconds += time.perf_counter() - start
+        texts += len(question_texts)
+        for (question, numbers), topic, score, margin in zip(labelled, best.tolist(), scores.tolist(), margins.tolist()):
+            row = (margin, score, model.topics[topic]["number"] in numbers)
+            # A stable split: a question stays on the same side from run to run
+            (held_out if zlib.crc32(question["file_path"].encode("utf-8")) % 2 else tuning).append(row)
+    store.close()
+    cache.close()
+
+    if not texts:
+        print("No classified questions to compare with: run the sorter first.")
+        return
+    print(f"\n{texts} questions classified by the API; {len(tuning)} for tuning, {len(held_out)} held out. "
+          f"Local scoring: {texts / seconds:,.0f} questions/s.")
+    print(f"{'threshold':>9} | {'tuning: assigned':>16} | {'agreement':>9} | {'held out: assigned':>18} | agreement")
+    chosen = None
+    for threshold in THRESHOLDS:
+        tuning_coverage, tuning_agreement = agreement(tuning, threshold)
+        coverage, agreed = agreement(held_out, threshold)
+        if chosen is None and tuning_agreement is not None and tuning_agreement >= args.target:
+            chosen = threshold
+        print(f"{threshold:>9.2f} | {format_share(tuning_coverage):>16} | {format_share(tuning_agreement):>9} | "
+              f"{format_share(coverage):>18} | {format_share(agreed)}")
+    if chosen is None:
+        print(f"\nNo threshold reaches {args.target:.0%} agreement on the tuning half.")
+    else:
+        coverage, agreed = agreement(held_out, chosen)
+        print(f"\nQBANK_LOCAL_CONFIDENCE={chosen} reaches {args.target:.0%} on the tuning half; on the held-out half "
+              f"it assigns {format_share(coverage)} of questions locally, agreeing with the API on {format_share(agreed)}.")
+
+
+def format_share(share):
+    return "-" if share is None else f"{share:.1%}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+
+# The manifest lives alongside the questions it describes
+EXTRACTION_ROOT_DIR = "extracted_questions"
+MANIFEST_NAME = "manifest.json"
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Returns the SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Records, for every source PDF that has been split, its content hash, the
+    splitter settings used and the files that were produced, so that re-runs
+    only process new or modified papers. Papers that could not be split are
+    recorded with their error (and no outputs), so an unchanged broken file
+    is not tried again on every run.
+
+    Unchanged files are recognised from their size and modification time
+    first; the content is only hashed when those differ from the last run.
+    """
+
+    def __init__(self, root=EXTRACTION_ROOT_DIR):
+        self.path = os.path.join(root, MANIFEST_NAME)
+        self.entries = {}
+        self._hashes = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("papers", {})
+            except (ValueError, OSError) as e:
+                print(f"Warning: Could not read manifest '{self.path}', starting a new one. Reason: {e}")
+
+    def _hash(self, source):
+        if source not in self._hashes:
+            self._hashes[source] = file_hash(source)
+        return self._hashes[source]
+
+    def is_current(self, source, settings):
+        """True if `source` was already split with these settings and its outputs still exist."""
+        entry = self.entries.get(os.path.normpath(source))
+        if entry is None or entry["settings"] != settings:
+            return False
+        if not all(os.path.exists(output) for output in entry["outputs"]):
+            return False
+
+        stat = os.stat(source)
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        if self._hash(source) != entry["sha256"]:
+            return False
+
+        # Same bytes under a new timestamp (e.g. the file was copied again)
+        entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+        return True
+
+    def record(self, source, settings, outputs, error=None):
+        stat = os.stat(source)
+        entry = {
+            "sha256": self._hash(source),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "settings": settings,
+            "outputs": list(outputs)
+        }
+        if error is not None:
+            entry["error"] = error
+        self.entries[os.path.normpath(source)] = entry
+
+    def error(self, source):
+        """Why `source` could not be split last time, or None if it was split (or never tried)."""
+        entry = self.entries.get(os.path.normpath(source))
+        return entry.get("error") if entry is not None else None
+
+    def save(self):
+        # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"papers": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,88 @@
+import gc
+import os
+import sys
+import tracemalloc
+
+import fitz
+
+# Environment variables that switch the memory budget on for script.py runs
+BUDGET_ENV = "QBANK_MEMORY_BUDGET"   # resident set size in MB above which MuPDF's store is flushed
+TRACE_ENV = "QBANK_TRACEMALLOC"      # set to 1 to report Python allocations (tracemalloc) too
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def rss_mb():
+    """Current resident set size of this process in MB, or the peak where that is all the OS offers."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+class MemoryBudget:
+    """
+    Keeps long crawls at a flat memory footprint. After every paper, check()
+    measures the process; if it is above `limit_mb` MuPDF's resource store
+    (fonts, images and parsed objects shared between documents) is emptied
+    and Python's garbage collector run.
+
+    check() returns a small record (RSS before/after, tracemalloc current and
+    peak when `trace` is on, and whether the store was flushed) that is kept
+    with the paper's result. A budget of None only takes measurements.
+    """
+
+    def __init__(self, limit_mb=None, trace=False, enabled=True):
+        self.enabled = enabled
+        self.limit_mb = limit_mb
+        self.trace = trace
+        self.flushes = 0
+        if enabled and trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @classmethod
+    def from_environment(cls):
+        limit = os.environ.get(BUDGET_ENV)
+        trace = os.environ.get(TRACE_ENV, "") not in ("", "0")
+        if not (limit or trace):
+            return UNLIMITED
+        return cls(limit_mb=float(limit) if limit else None, trace=trace)
+
+    def settings(self):
+        """Constructor arguments, so that pool workers can build an equivalent instance."""
+        return {"limit_mb": self.limit_mb, "trace": self.trace, "enabled": self.enabled}
+
+    def check(self, name):
+        if not self.enabled:
+            return None
+        record = {"rss_mb": rss_mb()}
+        # Some PyMuPDF builds cannot report the store size and return None
+        store_size = fitz.TOOLS.store_size()
+        if store_size is not None:
+            record["store_mb"] = round(store_size / 2**20, 1)
+        if self.trace and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            record["traced_mb"] = round(current / 2**20, 1)
+            record["traced_peak_mb"] = round(peak / 2**20, 1)
+            tracemalloc.reset_peak()
+        if self.limit_mb is not None and record["rss_mb"] is not None and record["rss_mb"] > self.limit_mb:
+            fitz.TOOLS.store_shrink(100)
+            gc.collect()
+            self.flushes += 1
+            record["flushed"] = True
+            record["rss_after_mb"] = rss_mb()
+            print(f"\n'{name}' left the process at {record['rss_mb']} MB (budget {self.limit_mb:g} MB): "
+                  f"flushed MuPDF's store, now {record['rss_after_mb']} MB.")
+        return record
+
+
+UNLIMITED = MemoryBudget(enabled=False)
@@ -1,6 +1,10 @@
 import copy
 import fitz
 
+def page_count(path):
+    with fitz.open(path) as doc:
+        return len(doc)
+
 # Class to merge multiple source pdfs into one pdf
 class Merge:
     def __init__(self, sources, outputPath):
@@ -15,12 +19,11 @@ class Merge:
 
     # Loads all pages from the sources into the pages array
     def loadPages(self):
-        self.sources.sort(key=lambda x: len(fitz.open(x)))
+        self.sources.sort(key=page_count)
         for paper in self.sources:
-            reader = fitz.open(paper)
-            self.tmpPdf.insert_pdf(reader)
-            for page in reader:
-                self.name_tracker.append(paper)
+            with fitz.open(paper) as reader:
+                self.tmpPdf.insert_pdf(reader)
+                self.name_tracker.extend([paper] * len(reader))
 
     # Merges all pages into one pdf, allowing for multiple smaller pages to be merged into one A4 page
     def mergePages(self):
@@ -58,3 +61,5 @@ class Merge:
 
         # Write the merged pdf to the output file
         writer.save(self.output, garbage=4, deflate=True, clean=True)
+        writer.close()
+        self.tmpPdf.close()
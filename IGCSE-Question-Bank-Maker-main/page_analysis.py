@@ -0,0 +1,173 @@
+from collections import OrderedDict
+import fitz
+import geometry
+from spatial_index import IntervalIndex, X_AXIS, Y_AXIS
+
+# Phrase printed down the right-hand margin of the new-format papers
+NEW_FORMAT_PHRASE = "DO NOT WRITE IN THIS MARGIN"
+
+# Fields large enough that only a bounded number of them are kept in memory at once.
+# Search results and the format flag are small and stay for the life of the document.
+HEAVY_FIELDS = ("textpage", "text", "text_dict", "words", "drawings", "spans",
+                "block_boxes", "drawing_boxes", "span_boxes", "word_boxes",
+                "block_index", "drawing_index", "span_index")
+
+# Default number of pages whose heavy fields a PageCache keeps resident; enough
+# for a whole typical paper, so the second pass (trimming, cropping) reuses the first
+DEFAULT_MAX_RESIDENT = 24
+
+
+class PageAnalysis:
+    """
+    Everything the splitter reads from one page. Each field is parsed from
+    MuPDF the first time it is asked for and served from memory afterwards,
+    until the owning PageCache evicts it to stay within its budget. The
+    page's text is extracted once, into a TextPage that the plain text, the
+    dict, the words and searches are all read from.
+    """
+
+    def __init__(self, page, cache):
+        self._page = page
+        self.number = page.number
+        self.rect = page.rect
+        self._cache = cache
+        self._fields = {}
+
+    @property
+    def page(self):
+        """The MuPDF page, loaded again if it was dropped when the page was evicted."""
+        if self._page is None:
+            self._page = self._cache.doc[self.number]
+        return self._page
+
+    def _get(self, key, compute):
+        stats = self._cache.stats
+        if key in self._fields:
+            stats["hits"] += 1
+        else:
+            stats["misses"] += 1
+            self._fields[key] = compute()
+        value = self._fields[key]
+        if key in HEAVY_FIELDS:
+            self._cache._touch(self.number)
+        return value
+
+    def _evict(self):
+        for key in HEAVY_FIELDS:
+            self._fields.pop(key, None)
+        # The Page holds MuPDF's parsed page (and keeps the TextPage alive), so it goes too
+        self._page = None
+
+    @property
+    def textpage(self):
+        # The dict's flags (with images, which the plain text and words leave out) serve every format
+        return self._get("textpage", lambda: self.page.get_textpage(flags=fitz.TEXTFLAGS_DICT))
+
+    @property
+    def text(self):
+        return self._get("text", lambda: self.page.get_text(textpage=self.textpage))
+
+    @property
+    def text_dict(self):
+        return self._get("text_dict", lambda: self.page.get_text("dict", textpage=self.textpage))
+
+    @property
+    def words(self):
+        return self._get("words", lambda: self.page.get_text("words", textpage=self.textpage))
+
+    @property
+    def drawings(self):
+        return self._get("drawings", lambda: self.page.get_drawings())
+
+    @property
+    def spans(self):
+        """Text spans in reading order."""
+        return self._get("spans", lambda: [span for block in self.text_dict["blocks"] if block["type"] == 0
+                                                for line in block["lines"]
+                                                for span in line["spans"]])
+
+    # Page geometry as (N, 4) arrays of x0, y0, x1, y1, one row per element
+
+    @property
+    def block_boxes(self):
+        """Text and image block bboxes."""
+        return self._get("block_boxes", lambda: geometry.as_boxes(
+            self.text_dict["blocks"], lambda block: block["bbox"]))
+
+    @property
+    def drawing_boxes(self):
+        """Rects of the stroked drawings, the only ones trimming looks at."""
+        return self._get("drawing_boxes", lambda: geometry.as_boxes(
+            [box["rect"] for box in self.drawings if box["stroke_opacity"] is not None]))
+
+    @property
+    def span_boxes(self):
+        """Span bboxes, in the same order as `spans`."""
+        return self._get("span_boxes", lambda: geometry.as_boxes(
+            self.spans, lambda span: span["bbox"]))
+
+    @property
+    def word_boxes(self):
+        """Word bboxes, in the same order as `words`."""
+        return self._get("word_boxes", lambda: geometry.as_boxes(self.words, lambda word: word[:4]))
+
+    # Band indexes whose row positions point into the arrays above
+
+    @property
+    def block_index(self):
+        return self._get("block_index", lambda: IntervalIndex(self.block_boxes, tuple, axis=Y_AXIS))
+
+    @property
+    def drawing_index(self):
+        return self._get("drawing_index", lambda: IntervalIndex(self.drawing_boxes, tuple, axis=Y_AXIS))
+
+    @property
+    def span_index(self):
+        return self._get("span_index", lambda: IntervalIndex(self.span_boxes, tuple, axis=X_AXIS))
+
+    @property
+    def is_new_format(self):
+        return len(self.search_for(NEW_FORMAT_PHRASE)) >= 1
+
+    def search_for(self, phrase):
+        return self._get(("search_for", phrase), lambda: self.page.search_for(phrase, textpage=self.textpage))
+
+
+class PageCache:
+    """
+    Hands out one PageAnalysis per page of an open document and counts how
+    often a field was served from memory (hits) or parsed by MuPDF (misses).
+
+    Heavy fields, and the MuPDF Page they were read from, are held for at
+    most `max_resident` pages at once; the least recently used page's are
+    dropped first, so memory does not grow with paper length.
+    """
+
+    def __init__(self, doc, max_resident=DEFAULT_MAX_RESIDENT):
+        self.doc = doc
+        self.max_resident = max_resident
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._pages = {}
+        self._resident = OrderedDict()
+
+    def __getitem__(self, page_number):
+        if page_number not in self._pages:
+            self._pages[page_number] = PageAnalysis(self.doc[page_number], self)
+            # Its Page is now loaded, so it counts against the budget like any other resident page
+            self._touch(page_number)
+        return self._pages[page_number]
+
+    def __len__(self):
+        return len(self.doc)
+
+    def __iter__(self):
+        for page_number in range(len(self.doc)):
+            yield self[page_number]
+
+    def _touch(self, page_number):
+        self._resident[page_number] = None
+        self._resident.move_to_end(page_number)
+        while len(self._resident) > self.max_resident:
+            old_page, _ = self._resident.popitem(last=False)
+            self._pages[old_page]._evict()
+            self.stats["evictions"] += 1
@@ -0,0 +1,100 @@
+import re
+import unicodedata
+from collections import deque
+
+
+def normalise(text):
+    """
+    Folds text the way page.search_for() compares it: ligatures expanded,
+    case ignored and any run of whitespace (including line breaks) treated
+    as a single space.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return re.sub(r"\s+", " ", text)
+
+
+def by_key(phrases):
+    """Phrases by their normalised form; of phrases with the same form, the first is kept."""
+    keyed = {}
+    for phrase in phrases:
+        keyed.setdefault(normalise(phrase), phrase)
+    return keyed
+
+
+class AhoCorasick:
+    """Matches every phrase of a fixed set against a text in a single left-to-right pass."""
+
+    def __init__(self, phrases):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+        for phrase in phrases:
+            self._add(phrase)
+        self._link()
+
+    def _add(self, phrase):
+        node = 0
+        for char in phrase:
+            if char not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(set())
+                self.goto[node][char] = len(self.goto) - 1
+            node = self.goto[node][char]
+        self.output[node].add(phrase)
+
+    def _link(self):
+        # Breadth-first, so every node's failure target is finished before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                target = self.fail[node]
+                while target and char not in self.goto[target]:
+                    target = self.fail[target]
+                self.fail[child] = self.goto[target].get(char, 0)
+                self.output[child] |= self.output[self.fail[child]]
+
+    def find(self, text):
+        """Returns the set of phrases that occur anywhere in `text`."""
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            if self.output[node]:
+                found |= self.output[node]
+        return found
+
+
+class PageClassifier:
+    """
+    Flags pages that contain any of a list of phrases, reading the page text
+    once no matter how many phrases there are.
+
+    `title_phrases` only flag a page when they appear as a title, i.e. never
+    followed by a full stop: "Qualitative analysis notes" heads the notes
+    page, while "Qualitative analysis notes." is a sentence on a question page.
+
+    classify() returns the rule that fired, so misclassified pages can be
+    traced back to the phrase responsible, or None for a normal page.
+    """
+
+    def __init__(self, phrases, title_phrases=()):
+        self.phrases = by_key(phrases)
+        self.titles = by_key(title_phrases)
+        patterns = set(self.phrases) | set(self.titles) | {title + "." for title in self.titles}
+        self.automaton = AhoCorasick(patterns)
+
+    def classify(self, text):
+        found = self.automaton.find(normalise(text))
+        # Report the first phrase in list order, as the old one-search-per-phrase loop did
+        for key, phrase in self.phrases.items():
+            if key in found:
+                return f"phrase: {phrase}"
+        for key, phrase in self.titles.items():
+            if key in found and key + "." not in found:
+                return f"title: {phrase}"
+        return None
@@ -0,0 +1,296 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import blob_store
+import catalog
+import MarkSchemeExtractor
+import splitter
+from instrumentation import DISABLED, Instrumentation
+from memory_budget import UNLIMITED
+from question_store import QuestionStore
+
+# Papers waiting to be sorted; when the sorter falls this far behind, the splitter waits for it
+DEFAULT_QUEUE_SIZE = 4
+# Marks the end of the splitter's output on the sort queue
+DONE = None
+# How often blocked stages check whether the pipeline is shutting down
+POLL_SECONDS = 0.5
+
+
+class Pipeline:
+    """
+    Runs the extraction and sorting steps of script.py as concurrent stages:
+
+    - splitter: splits the question papers in a process pool, records each in
+      the question database and passes its name on to the sorter;
+    - mark schemes: cuts up the mark schemes in the same pool meanwhile;
+    - sorter: classifies the questions of each paper as soon as it arrives,
+      while later papers are still being split. Papers that were split on an
+      earlier run, and anything else in the database, are sorted too, as
+      sorting.main() would.
+
+    PDF work only happens in the pool's processes (PyMuPDF is not thread-safe);
+    the stages themselves are threads. The splitter and sorter are joined by a
+    bounded queue: when the sorter falls `queue_size` papers behind, the
+    splitter stops collecting and submitting papers until it catches up.
+    Ctrl+C (or an unexpected error in any stage) stops every stage after its
+    current paper or question, and queued pool work is cancelled.
+    """
+
+    def __init__(self, papers_directory, sort=True, extract_mark_schemes=True, split=True, workers=None,
+                 queue_size=DEFAULT_QUEUE_SIZE, incremental=True, mark_scheme_folder=None,
+                 instrumentation=DISABLED, memory_budget=UNLIMITED, retry_failed=None):
+        # One folder or a list of them
+        self.papers_directories = [papers_directory] if isinstance(papers_directory, str) else list(papers_directory)
+        self.split = split
+        self.sort = sort
+        self.extract_mark_schemes = extract_mark_schemes
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.incremental = incremental
+        # None leaves it to QBANK_RETRY_FAILED (see splitter.py)
+        self.retry_failed = retry_failed
+        self.mark_scheme_folder = mark_scheme_folder
+        self.instrumentation = instrumentation
+        self.memory_budget = memory_budget
+        self.stop = threading.Event()
+        self.sort_queue = queue.Queue(maxsize=queue_size)
+        self.summary = {
+            "question_papers": {"split": 0, "skipped": 0, "errors": []},
+            "mark_schemes": {"processed": 0, "errors": []},
+            "sorting": {"papers": 0, "questions": 0, "sorted": 0},
+            "queue": {"size": queue_size, "max_depth": 0, "splitter_blocked_seconds": 0.0},
+            "stage_errors": [],
+            "interrupted": False,
+        }
+
+    def run(self):
+        """
+        Runs every stage to completion (or until interrupted) and returns the
+        summary. Raises classifier_backends.BackendUnavailable, before any work
+        is done, if sorting has no classification API to use.
+        """
+        start = time.perf_counter()
+        papers = []
+        if self.split or self.extract_mark_schemes:
+            for directory in self.papers_directories:
+                papers.extend(catalog.discover(directory))
+        mark_schemes = [paper for paper in papers if paper.kind == "ms"] if self.extract_mark_schemes else []
+        print(f"Pipeline: {sum(paper.kind == 'qp' for paper in papers) if self.split else 0} question papers, "
+              f"{len(mark_schemes)} mark schemes, {self.workers} workers, sort queue of {self.queue_size}.")
+        if self.sort:
+            import sorting
+            # Without an API key (or another backend) the run stops here, before any work is done
+            backend = sorting.open_classifier_backend()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            stages = []
+            if self.split:
+                stages.append(threading.Thread(target=self._run_stage, args=("splitter", self._split_stage, pool),
+                                               name="splitter"))
+            elif self.sort:
+                # Nothing new to wait for: the sorter goes straight to the papers in the database
+                self.sort_queue.put(DONE)
+            if mark_schemes:
+                stages.append(threading.Thread(target=self._run_stage, name="mark schemes",
+                                               args=("mark schemes", self._mark_scheme_stage, pool, mark_schemes)))
+            if self.sort:
+                stages.append(threading.Thread(target=self._run_stage, name="sorter",
+                                               args=("sorter", self._sort_stage, sorting, backend)))
+            for stage in stages:
+                stage.start()
+            try:
+                # Poll rather than join: a Ctrl+C that interrupts join() can leave the thread marked as
+                # finished, and the process would then exit without waiting for the stage to clean up
+                while any(stage.is_alive() for stage in stages):
+                    time.sleep(POLL_SECONDS)
+            except KeyboardInterrupt:
+                print("\nInterrupted: stopping after the current papers...")
+                self.summary["interrupted"] = True
+                self.stop.set()
+                pool.shutdown(wait=False, cancel_futures=True)
+                for stage in stages:
+                    stage.join()
+
+        self.summary["wall_seconds"] = round(time.perf_counter() - start, 3)
+        print("\nPipeline finished." if not self.stop.is_set() else "\nPipeline stopped.")
+        return self.summary
+
+    def _run_stage(self, name, stage, *args):
+        try:
+            stage(*args)
+        except Exception as e:
+            # Any other stage would wait forever on this one, so everything stops
+            print(f"\n!!! The {name} stage failed: {e}. Stopping the pipeline.")
+            self.summary["stage_errors"].append({"stage": name, "error": str(e)})
+            self.stop.set()
+
+    # --- QUEUE ---
+
+    def _put(self, item):
+        """Hands a paper to the sorter, waiting while the queue is full (backpressure)."""
+        if not self.sort:
+            return
+        start = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                self.sort_queue.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        queue_stats = self.summary["queue"]
+        queue_stats["splitter_blocked_seconds"] = round(queue_stats["splitter_blocked_seconds"] + time.perf_counter() - start, 3)
+        queue_stats["max_depth"] = max(queue_stats["max_depth"], self.sort_queue.qsize())
+
+    def _get(self):
+        while not self.stop.is_set():
+            try:
+                return self.sort_queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return DONE
+
+    # --- STAGES ---
+
+    def _split_stage(self, pool):
+        stats = self.summary["question_papers"]
+        # SQLite connections belong to the thread that opened them
+        store = QuestionStore()
+        split = splitter.Split(instrumentation=self.instrumentation, memory_budget=self.memory_budget, store=store,
+                               retry_failed=self.retry_failed)
+        try:
+            split.find_papers(self.papers_directories, crawl=True, incremental=self.incremental)
+            stats["skipped"] = len(split.skipped)
+            # Papers split on an earlier run are not queued: they would fill the queue before any new paper
+            # is split. The sorter takes them from the database once the new ones are done.
+
+            pending = {}
+            paths = list(split.paths)
+            while (paths or pending) and not self.stop.is_set():
+                # Keep each worker busy, but no more: results only leave here as fast as the sorter takes them
+                while paths and len(pending) < self.workers:
+                    path = paths.pop(0)
+                    pending[pool.submit(splitter._split_worker, path, split.border, split.padding,
+                                        self.instrumentation.settings(), self.memory_budget.settings(),
+                                        split.layout)] = path
+                done, _ = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        split.record_error(path, e)
+                        continue
+                    self.instrumentation.add(result.get("timings"))
+                    split.record_result(result)
+                    stats["split"] += 1
+                    print(f"\n-> Split '{result['name']}' ({len(result['outputs'])} questions)")
+                    self._put(result["name"])
+            stats["errors"] = split.errors
+        finally:
+            if split.manifest is not None:
+                split.manifest.save()
+            store.close()
+            self._put(DONE)
+
+    def _mark_scheme_stage(self, pool, mark_schemes):
+        stats = self.summary["mark_schemes"]
+        pending = {}
+        mark_schemes = list(mark_schemes)
+        while (mark_schemes or pending) and not self.stop.is_set():
+            while mark_schemes and len(pending) < self.workers:
+                paper = mark_schemes.pop(0)
+                pending[pool.submit(_mark_scheme_worker, paper.path, paper.name, self.mark_scheme_folder,
+                                    self.instrumentation.settings(), self.memory_budget.settings())] = paper
+            done, _ = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                paper = pending.pop(future)
+                try:
+                    processed, timings = future.result()
+                except Exception as e:
+                    stats["errors"].append({"path": paper.path, "error": str(e)})
+                    print(f"\nError in '{paper.path}': {e}. Skipping file.")
+                    continue
+                self.instrumentation.add(timings)
+                if processed:
+                    stats["processed"] += 1
+                else:
+                    # The extractor has already reported what went wrong
+                    stats["errors"].append({"path": paper.path, "error": "extraction failed"})
+
+    def _sort_stage(self, sorting, backend):
+        stats = self.summary["sorting"]
+        store = QuestionStore()
+        cache = sorting.open_classification_cache(backend.model)
+        engine = sorting.open_classification_engine(backend)
+        local_classifier = sorting.open_local_classifier()
+        journal = sorting.open_sort_journal(backend.model)
+        blobs = blob_store.BlobStore()
+        subjects = {}
+        sorted_papers = set()
+
+        def sort_paper(paper_name):
+            sorted_papers.add(paper_name)
+            questions = store.questions(paper_name=paper_name)
+            if not questions:
+                return
+            subject_code = questions[0]["subject_code"]
+            if subject_code not in subjects:
+                print(f"\nProcessing Subject: {subject_code}")
+                # Syllabus text and the canonical topic names, shared by all papers of the subject
+                subjects[subject_code] = (sorting.load_syllabus(subject_code), journal.topic_map(subject_code))
+                if subjects[subject_code][0] is not None:
+                    cache.check_syllabus(subject_code, subjects[subject_code][0])
+            syllabus_text, canonical_topic_map = subjects[subject_code]
+            if syllabus_text is None:
+                return
+            stats["papers"] += 1
+            results = sorting.sort_questions(store, questions, syllabus_text, canonical_topic_map, engine, cache,
+                                             stop=self.stop, local_classifier=local_classifier, journal=journal,
+                                             blobs=blobs)
+            stats["questions"] += len(results)
+            stats["sorted"] += sum(1 for _, topics in results if topics)
+
+        try:
+            blob_store.recover_view(sorting.SORTED_OUTPUT_DIR)
+            os.makedirs(sorting.SORTED_OUTPUT_DIR, exist_ok=True)
+            while True:
+                paper_name = self._get()
+                if paper_name is DONE:
+                    break
+                sort_paper(paper_name)
+            # Then whatever else is in the database, as sorting.main() would
+            for paper_name in store.papers():
+                if self.stop.is_set():
+                    break
+                if paper_name not in sorted_papers:
+                    sort_paper(paper_name)
+            # The topic folders as the database now has them, swapped in at once
+            stats["view"] = blob_store.materialise_view(store, blobs, sorting.SORTED_OUTPUT_DIR)
+            blob_store.print_view_stats(stats["view"], blobs.stats())
+        finally:
+            store.close()
+            cache.close()
+            journal.close()
+            engine.close()
+            backend.close()
+            stats["cache"] = cache.stats()
+            stats["local"] = local_classifier.stats()
+            stats["journal"] = journal.stats()
+            stats["api"] = engine.stats()
+            sorting.print_cache_stats(stats["cache"])
+            sorting.print_local_stats(stats["local"])
+            sorting.print_journal_stats(stats["journal"])
+            sorting.print_engine_stats(stats["api"])
+
+
+def _mark_scheme_worker(path, name, output_folder, instrumentation_settings, memory_settings):
+    """Process-pool entry point: extracts one mark scheme; returns whether it succeeded and its timings, if any."""
+    instrumentation = Instrumentation(**instrumentation_settings) if instrumentation_settings["enabled"] else DISABLED
+    # Shares the worker's budget with the papers it splits
+    memory_budget = splitter._worker_memory_budget(memory_settings) if memory_settings["enabled"] else UNLIMITED
+    processed = MarkSchemeExtractor.process_mark_scheme(path, name, output_folder, instrumentation, memory_budget)
+    return processed, instrumentation.papers[-1] if instrumentation.papers else None
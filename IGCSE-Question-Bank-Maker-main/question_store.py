@@ -0,0 +1,304 @@
+import os
+import re
+import sqlite3
+
+# The database lives alongside the manifest in the splitter's output folder
+EXTRACTION_ROOT_DIR = "extracted_questions"
+DATABASE_NAME = "questions.db"
+DATABASE_PATH = os.path.join(EXTRACTION_ROOT_DIR, DATABASE_NAME)
+
+# The splitter writes each question's reading-order text, and optionally its layout, next to its PDF
+TEXT_SIDECAR_SUFFIX = ".txt"
+LAYOUT_SIDECAR_SUFFIX = ".layout.json"
+
+SCHEMA_VERSION = 3
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    paper_name TEXT NOT NULL,
+    question INTEGER NOT NULL,
+    subject_code TEXT NOT NULL,
+    year INTEGER,
+    season TEXT,
+    paper TEXT,
+    variant TEXT,
+    file_path TEXT NOT NULL,
+    source TEXT,
+    text TEXT NOT NULL DEFAULT '',
+    UNIQUE (paper_name, question)
+);
+CREATE INDEX IF NOT EXISTS questions_by_session ON questions (subject_code, year, season, paper, variant);
+CREATE INDEX IF NOT EXISTS questions_by_number ON questions (question);
+CREATE INDEX IF NOT EXISTS questions_by_file ON questions (file_path);
+
+CREATE TABLE IF NOT EXISTS question_topics (
+    question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    topic TEXT NOT NULL,
+    sorted_path TEXT,
+    blob TEXT,
+    PRIMARY KEY (question_id, topic)
+);
+CREATE INDEX IF NOT EXISTS question_topics_by_topic ON question_topics (topic);
+"""
+
+# Full-text index over the question text, kept in step with the questions table by triggers.
+# Subject, year and paper are indexed as tag words (subject0620 year2023 paper4), so filtered
+# searches intersect posting lists instead of checking every match against the table.
+# The prefix indexes make 'enzym*'-style queries as fast as whole-word ones.
+TAGS = "'subject' || {row}.subject_code || ' year' || ifnull({row}.year, '') || ' paper' || ifnull({row}.paper, '')"
+SEARCH_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5 (
+    text, tags, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5'
+);
+CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts (rowid, text, tags) VALUES (new.id, new.text, {TAGS.format(row="new")});
+END;
+CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+    DELETE FROM questions_fts WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE ON questions BEGIN
+    DELETE FROM questions_fts WHERE rowid = old.id;
+    INSERT INTO questions_fts (rowid, text, tags) VALUES (new.id, new.text, {TAGS.format(row="new")});
+END;
+"""
+SEARCH_TAGS = ("subject_code", "year", "paper")
+
+# Columns a questions() or search() query can filter on
+FILTERS = ("subject_code", "year", "season", "paper", "variant", "question", "paper_name", "file_path")
+
+# A search term: a "quoted phrase" or a single word, either optionally ending in * for a prefix match
+SEARCH_TERM = re.compile(r'"([^"]*)"(\*?)|([^\s"]+)')
+
+
+def sidecar_path(file_path, suffix=TEXT_SIDECAR_SUFFIX):
+    """Where the splitter keeps a question's text (or, with LAYOUT_SIDECAR_SUFFIX, its span layout)."""
+    return os.path.splitext(file_path)[0] + suffix
+
+
+def read_text_sidecar(file_path):
+    """A question's text from the splitter's sidecar, or None if it has none."""
+    try:
+        with open(sidecar_path(file_path), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def match_expression(query):
+    """
+    Turns a search box query into an FTS5 MATCH expression. Every term must
+    match: "quoted phrases" match as a whole, a trailing * matches any word
+    starting with that prefix (enzym*, "rate of reac"*). Terms are quoted, so
+    punctuation in a query is never read as FTS5 syntax.
+    """
+    terms = []
+    for phrase, phrase_prefix, word in SEARCH_TERM.findall(query):
+        text, prefix = (phrase, phrase_prefix) if not word else (word.rstrip("*"), "*" if word.endswith("*") else "")
+        if text.strip():
+            terms.append('"' + text.replace('"', '""') + '"' + prefix)
+    if not terms:
+        raise ValueError("The search query is empty.")
+    return " ".join(terms)
+
+
+class QuestionStore:
+    """
+    SQLite database of every split question: its paper's subject, year,
+    season, paper and variant, the question number, the extracted PDF and its
+    text, plus the topics the sorter assigned to it.
+
+    Writes go through upserts keyed on (paper_name, question), so re-splitting
+    or re-sorting a paper updates its rows in place. Each paper is written in
+    a single transaction. The database runs in WAL mode, so readers (e.g.
+    MockBuilder) are not blocked while the splitter or sorter write.
+
+    Question text is also indexed for full-text search (SQLite FTS5); if the
+    SQLite library lacks FTS5, everything but search() still works.
+    """
+
+    def __init__(self, path=DATABASE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            # Databases written before the blob store have no blob column
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(question_topics)")]
+            if "blob" not in columns:
+                self.connection.execute("ALTER TABLE question_topics ADD COLUMN blob TEXT")
+        self.searchable = self._create_search_index()
+        # Only a database with every part of the schema is marked current, so one opened
+        # without FTS5 gets its search index the next time FTS5 is available
+        if self.searchable and version != SCHEMA_VERSION:
+            with self.connection:
+                self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def _create_search_index(self):
+        indexed = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'").fetchone() is not None
+        try:
+            with self.connection:
+                self.connection.executescript(SEARCH_SCHEMA)
+                # Questions written before the index existed (or while FTS5 was unavailable) are indexed once
+                if not indexed:
+                    self.connection.execute(
+                        f"INSERT INTO questions_fts (rowid, text, tags) SELECT id, text, {TAGS.format(row='q')} FROM questions q")
+        except sqlite3.OperationalError as e:
+            print(f"Warning: Full-text search is unavailable ({e}).")
+            return False
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    # --- WRITING ---
+
+    def upsert_paper(self, info, questions, source=None):
+        """
+        Stores the questions of one paper in one transaction. `info` is the
+        paper's metadata (see catalog.PaperInfo.info()); `questions` holds
+        dicts with 'question', 'file_path' and 'text'. Questions of the paper
+        that are no longer present are removed.
+        """
+        year = info.get("year")
+        rows = [(info["name"], int(question["question"]), info["subject_code"],
+                 int(year) if year else None, info.get("season"), info.get("paper"), info.get("variant"),
+                 question["file_path"], source, question.get("text") or "")
+                for question in questions]
+        with self.connection:
+            self.connection.executemany("""
+                INSERT INTO questions (paper_name, question, subject_code, year, season, paper, variant,
+                                       file_path, source, text)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (paper_name, question) DO UPDATE SET
+                    subject_code = excluded.subject_code, year = excluded.year, season = excluded.season,
+                    paper = excluded.paper, variant = excluded.variant, file_path = excluded.file_path,
+                    source = excluded.source, text = excluded.text""", rows)
+            numbers = [row[1] for row in rows]
+            self.connection.execute(
+                f"DELETE FROM questions WHERE paper_name = ? AND question NOT IN ({','.join('?' * len(numbers))})"
+                if numbers else "DELETE FROM questions WHERE paper_name = ?",
+                [info["name"], *numbers])
+
+    def set_topics(self, question_id, topics, blob=None):
+        """
+        Replaces a question's topics with `topics`, a list of (topic,
+        sorted_path) pairs; `blob` is the key of the PDF filed under them in
+        the blob store (see blob_store.py).
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM question_topics WHERE question_id = ?", (question_id,))
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO question_topics (question_id, topic, sorted_path, blob) VALUES (?, ?, ?, ?)",
+                [(question_id, topic, sorted_path, blob) for topic, sorted_path in topics])
+
+    def set_blob(self, question_id, blob):
+        with self.connection:
+            self.connection.execute("UPDATE question_topics SET blob = ? WHERE question_id = ?", (blob, question_id))
+
+    # --- READING ---
+
+    def has_paper(self, name):
+        return self.connection.execute(
+            "SELECT 1 FROM questions WHERE paper_name = ? LIMIT 1", (name,)).fetchone() is not None
+
+    def papers(self):
+        return [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT paper_name FROM questions ORDER BY subject_code, paper_name")]
+
+    def subjects(self):
+        return [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT subject_code FROM questions ORDER BY subject_code")]
+
+    def topics(self, subject_code):
+        return [row[0] for row in self.connection.execute("""
+            SELECT DISTINCT t.topic FROM question_topics t JOIN questions q ON q.id = t.question_id
+            WHERE q.subject_code = ? ORDER BY t.topic""", (subject_code,))]
+
+    def filed_questions(self):
+        """Every (question, topic) filing: its question's id, subject and file, the topic, sorted_path and blob."""
+        return [dict(row) for row in self.connection.execute("""
+            SELECT q.id, q.subject_code, q.file_path, t.topic, t.sorted_path, t.blob
+            FROM question_topics t JOIN questions q ON q.id = t.question_id
+            ORDER BY q.subject_code, t.topic, q.paper_name, q.question""")]
+
+    def filings(self, question_id):
+        """A question's (topic, sorted_path, blob) filings, by topic."""
+        return [tuple(row) for row in self.connection.execute(
+            "SELECT topic, sorted_path, blob FROM question_topics WHERE question_id = ? ORDER BY topic",
+            (question_id,))]
+
+    def questions(self, topic=None, **filters):
+        """
+        Returns the questions matching every given filter (see FILTERS) as
+        dicts, ordered by paper and question number. With `topic`, only the
+        questions sorted into that topic are returned, with their 'sorted_path'.
+        """
+        clauses, params = self._where(filters)
+        if topic is None:
+            query = "SELECT q.* FROM questions q"
+        else:
+            query = "SELECT q.*, t.topic, t.sorted_path FROM questions q JOIN question_topics t ON t.question_id = q.id"
+            clauses.append("t.topic = ?")
+            params.append(topic)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY q.subject_code, q.paper_name, q.question"
+        return [dict(row) for row in self.connection.execute(query, params)]
+
+    def search(self, query, limit=20, **filters):
+        """
+        Full-text search over question text (see match_expression() for the
+        query syntax), narrowed by any of FILTERS, e.g. subject_code='0620',
+        year=2023, paper='4'. Returns up to `limit` questions, best match
+        first, each with a 'snippet' of its text around the matches.
+        """
+        if not self.searchable:
+            raise RuntimeError("Full-text search needs an SQLite library with FTS5.")
+        match = "text : (" + match_expression(query) + ")"
+        tags = [f'"{column.split("_")[0]}{filters.pop(column)}"' for column in SEARCH_TAGS
+                if filters.get(column) is not None]
+        if tags:
+            match += " AND tags : (" + " ".join(tags) + ")"
+        clauses, params = self._where(filters)
+
+        # Rank first, then read rows and snippets for the best matches only: for a common word,
+        # building a snippet for every match costs as much again as ranking them.
+        # Only the question text counts towards the rank; the tags are filters.
+        ranked = "SELECT questions_fts.rowid FROM questions_fts"
+        if clauses:
+            ranked += " JOIN questions q ON q.id = questions_fts.rowid"
+        ranked += " WHERE questions_fts MATCH ?" + "".join(f" AND {clause}" for clause in clauses)
+        ranked += " ORDER BY bm25(questions_fts, 1.0, 0.0) LIMIT ?"
+        results = []
+        for (question_id,) in self.connection.execute(ranked, [match, *params, limit]).fetchall():
+            row = dict(self.connection.execute("""
+                SELECT q.*, snippet(questions_fts, 0, '[', ']', '...', 12) AS snippet
+                FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid
+                WHERE questions_fts MATCH ? AND questions_fts.rowid = ?""", (match, question_id)).fetchone())
+            # Snippets are shown on one line
+            row["snippet"] = " ".join(row["snippet"].split())
+            results.append(row)
+        return results
+
+    @staticmethod
+    def _where(filters):
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown question filter(s): {', '.join(sorted(unknown))}")
+        # Filters left as None are not applied, so callers can pass optional arguments straight through
+        filters = {column: value for column, value in filters.items() if value is not None}
+        return [f"q.{column} = ?" for column in filters], list(filters.values())
@@ -1,9 +1,11 @@
 import os
 # We import the other scripts as modules to access their functions/classes
-import splitter
+import pipeline
 import sorting
 import MockBuilder
-import MarkSchemeExtractor
+from classifier_backends import configuration_error
+from instrumentation import Instrumentation
+from memory_budget import MemoryBudget
 
 def get_user_choice(prompt):
     """A helper function to get a clean 'y' or 'n' from the user."""
@@ -18,45 +20,47 @@ def main_workflow():
     
     print("--- Cambridge Question Bank Toolkit ---")
 
-    # --- Step 1: Run the PDF Splitter ---
-    if get_user_choice("\nDo you want to extract questions from new PDFs in the 'papers' folder? (y/n): ") == 'y':
+    # Ask everything up front, so that extraction and sorting can run side by side
+    extract = get_user_choice("\nDo you want to extract questions from new PDFs in the 'papers' folder? (y/n): ") == 'y'
+    sort = get_user_choice("Do you want to sort the extracted questions into topics using AI? (y/n): ") == 'y'
+    build = get_user_choice("Do you want to build a mock paper from the sorted questions? (y/n): ") == 'y'
+
+    # Sorting needs an API key (or the local stand-in, or recorded answers)
+    if sort and configuration_error():
+        sorting.print_backend_error(configuration_error())
+        print("!!! Skipping the AI sorting step.")
+        sort = False
+
+    # --- Steps 1 and 2: Run the PDF Splitter, MarkSchemeExtractor and AI Sorter as one pipeline ---
+    if extract:
         papers_directory = "papers"
         # Check if the source folder exists before trying to run
         if os.path.isdir(papers_directory):
             print("\n>>> Scanning 'papers' folder and dispatching to extractors...")
-            
-            # Get a list of all PDFs to process
-            pdf_files_to_process = [f for f in os.listdir(papers_directory) if f.lower().endswith('.pdf')]
-            
-            if not pdf_files_to_process:
-                print("No PDF files found in the 'papers' folder.")
-            else:
-                for pdf_file in pdf_files_to_process:
-                    input_file_path = os.path.join(papers_directory, pdf_file)
-                    base_name, _ = os.path.splitext(pdf_file)
-                    
-                    # --- THIS IS THE NEW DISPATCHER LOGIC ---
-                    filename_lower = pdf_file.lower()
-                    
-                    if "qp" in filename_lower:
-                        print(f"\n-> Found Question Paper: {pdf_file}. Running Splitter...")
-                        # We call the Split class from the splitter module
-                        splitter.Split(input_file_path, crawl=False) # crawl=False processes one file
-                        
-                    elif "ms" in filename_lower:
-                        print(f"\n-> Found Mark Scheme: {pdf_file}. Running MarkSchemeExtractor...")
-                        # We call the main function from the MarkSchemeExtractor module
-                        MarkSchemeExtractor.process_mark_scheme(input_file_path, base_name)
-                        
-                    else:
-                        print(f"\n-> Skipping file (not a 'qp' or 'ms'): {pdf_file}")
+            if sort:
+                print(">>> Questions are sorted as soon as their paper is split (this may take a while)...")
+            # Off unless QBANK_TIMINGS (report path) or QBANK_PROFILE (paper names) is set
+            instrumentation = Instrumentation.from_environment()
+            # Off unless QBANK_MEMORY_BUDGET (MB) or QBANK_TRACEMALLOC=1 is set
+            memory_budget = MemoryBudget.from_environment()
+
+            # Question papers are split and mark schemes extracted in parallel; every split question
+            # is recorded in the question database and handed straight to the sorter
+            summary = pipeline.Pipeline(papers_directory, sort=sort, instrumentation=instrumentation,
+                                        memory_budget=memory_budget).run()
+            papers = summary["question_papers"]
+            print(f"\n>>> PDF Extraction Complete: {papers['split']} question papers split "
+                  f"({papers['skipped']} unchanged), {summary['mark_schemes']['processed']} mark schemes.")
+            if sort:
+                print(f">>> AI Sorting Complete: {summary['sorting']['sorted']} of "
+                      f"{summary['sorting']['questions']} questions sorted.\n")
 
-            print("\n>>> PDF Extraction Complete.\n")
+            instrumentation.save()
         else:
             print(f"!!! ERROR: The '{papers_directory}' folder was not found.")
 
-    # --- Step 2: Run the AI Sorter ---
-    if get_user_choice("Do you want to sort the extracted questions into topics using AI? (y/n): ") == 'y':
+    # --- Step 2 on its own: Run the AI Sorter ---
+    elif sort:
         extraction_directory = "extracted_questions"
         # Check if the splitter has been run and its output folder exists
         if os.path.isdir(extraction_directory):
@@ -68,7 +72,7 @@ def main_workflow():
             print(f"!!! ERROR: The '{extraction_directory}' folder was not found. Please run the splitter first.")
 
     # --- Step 3: Run the Mock Paper Builder ---
-    if get_user_choice("Do you want to build a mock paper from the sorted questions? (y/n): ") == 'y':
+    if build:
         sorted_directory = "sorted_questions_by_topic"
         # Check if the sorter has been run and its output folder exists
         if os.path.isdir(sorted_directory):
@@ -0,0 +1,50 @@
+"""
+Searches the text of every extracted question in the question database.
+
+    python search.py '"rate of reaction"' 'enzym*' --subject 0620 --year 2023 --paper 4
+
+Every term must match; "quoted phrases" match as a whole and a trailing *
+matches any word starting with the prefix (quote both from the shell, as
+above). No PDFs are opened.
+"""
+import argparse
+import os
+import sys
+
+from question_store import DATABASE_PATH, QuestionStore
+
+
+def print_results(results):
+    for result in results:
+        print(f"{result['paper_name']} Q{result['question']}: {result['snippet']}")
+        print(f"    {result['file_path']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", nargs="+", help='words, "phrases" and prefix* terms')
+    parser.add_argument("--subject", help="subject code, e.g. 0620")
+    parser.add_argument("--year", type=int, help="e.g. 2023")
+    parser.add_argument("--paper", help="paper number, e.g. 4")
+    parser.add_argument("--limit", type=int, default=20, help="most results to show (default 20)")
+    parser.add_argument("--database", default=DATABASE_PATH, help=f"question database (default {DATABASE_PATH})")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"Error: The question database '{args.database}' was not found. Please run the splitter first.")
+        return 1
+    with QuestionStore(args.database) as store:
+        try:
+            results = store.search(" ".join(args.query), limit=args.limit,
+                                   subject_code=args.subject, year=args.year, paper=args.paper)
+        except (ValueError, RuntimeError) as e:
+            print(f"Error: {e}")
+            return 1
+    if not results:
+        print("No matching questions.")
+    print_results(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
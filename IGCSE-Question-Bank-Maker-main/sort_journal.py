@@ -0,0 +1,137 @@
+import json
+import os
+
+from classification_cache import normalise, text_hash
+
+# The journal lives alongside the question database and classification cache
+EXTRACTION_ROOT_DIR = "extracted_questions"
+JOURNAL_NAME = "sort_journal.jsonl"
+JOURNAL_PATH = os.path.join(EXTRACTION_ROOT_DIR, JOURNAL_NAME)
+# Superseded entries tolerated before close() rewrites the journal without them
+COMPACT_SLACK = 1000
+
+
+class SortJournal:
+    """
+    Append-only record of the sorter's progress, one JSON object per line,
+    each flushed and fsynced before the sorter moves on:
+
+        {"type": "topic", "subject": "0620", "key": "topic1states...", "folder": "Topic_1_States_of_matter"}
+        {"type": "question", "file_path": ..., "fingerprint": ..., "topics": ..., "sorted": [[topic, path], ...]}
+
+    A question is recorded once its PDF has been stored and its topics
+    recorded in the question database. sorted_topics() returns that record
+    on later runs, while the question's text, its syllabus, the model and the
+    prompt version are unchanged, so an interrupted sort resumes after the
+    last recorded question. (The topic folders are rebuilt from the database,
+    so a missing folder does not mean the question needs sorting again.) Topic records
+    are the subjects' canonical topic maps (see sorting.file_question()),
+    so topic folder names stay the same from run to run.
+
+    A line cut short by a crash is dropped when the journal is opened.
+    close() rewrites the journal without superseded entries once there are
+    more than COMPACT_SLACK of them. stats() reports resumed and recorded
+    questions.
+    """
+
+    def __init__(self, model, prompt_version, path=JOURNAL_PATH):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.path = path
+        self.topic_maps = {}
+        self.questions = {}
+        self.lines = 0
+        self.resumed = 0
+        self.recorded = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._load()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        committed = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                committed += len(line)
+                self.lines += 1
+                if entry["type"] == "topic":
+                    self.topic_maps.setdefault(entry["subject"], {})[entry["key"]] = entry["folder"]
+                else:
+                    self.questions[entry["file_path"]] = entry
+        if committed < os.path.getsize(self.path):
+            # The last write did not finish: forget it, as if it had never started
+            print(f"  - Sort journal: discarding an incomplete entry at the end of '{self.path}'.")
+            with open(self.path, "r+b") as f:
+                f.truncate(committed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.file.close()
+        live = len(self.questions) + sum(len(topic_map) for topic_map in self.topic_maps.values())
+        if self.lines - live > COMPACT_SLACK:
+            self.compact()
+
+    def _append(self, entry):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.lines += 1
+
+    def fingerprint(self, question_text, syllabus_text):
+        return text_hash("\0".join([normalise(question_text), text_hash(syllabus_text),
+                                    self.model, str(self.prompt_version)]))
+
+    def topic_map(self, subject_code):
+        """The subject's canonical topic map: canonical key -> topic folder name. Add to it with record_topic()."""
+        return self.topic_maps.setdefault(subject_code, {})
+
+    def record_topic(self, subject_code, canonical_key, folder):
+        self.topic_map(subject_code)[canonical_key] = folder
+        self._append({"type": "topic", "subject": subject_code, "key": canonical_key, "folder": folder})
+
+    def sorted_topics(self, question, question_text, syllabus_text):
+        """The (topic, sorted file) pairs a question was filed under, or None if it needs sorting (again)."""
+        entry = self.questions.get(question["file_path"])
+        if entry is None or entry["fingerprint"] != self.fingerprint(question_text, syllabus_text):
+            return None
+        self.resumed += 1
+        return [tuple(pair) for pair in entry["sorted"]]
+
+    def record_question(self, question, question_text, syllabus_text, topics_string, sorted_topics):
+        entry = {"type": "question", "file_path": question["file_path"],
+                 "fingerprint": self.fingerprint(question_text, syllabus_text),
+                 "topics": topics_string, "sorted": [list(pair) for pair in sorted_topics]}
+        self._append(entry)
+        self.questions[entry["file_path"]] = entry
+        self.recorded += 1
+
+    def compact(self):
+        """Rewrites the journal with only its current entries (atomically; the journal must be closed)."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for subject_code, topic_map in self.topic_maps.items():
+                for canonical_key, folder in topic_map.items():
+                    f.write(json.dumps({"type": "topic", "subject": subject_code, "key": canonical_key,
+                                        "folder": folder}, ensure_ascii=False) + "\n")
+            for entry in self.questions.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.lines = len(self.questions) + sum(len(topic_map) for topic_map in self.topic_maps.values())
+
+    def stats(self):
+        return {"resumed": self.resumed, "recorded": self.recorded}
@@ -1,28 +1,41 @@
-import fitz  # PyMuPDF
 import os
-import google.generativeai as genai
-import shutil
 import re
-import time
+import json
+from blob_store import BlobStore, materialise_view, print_view_stats, recover_view, view_path
+from classification_cache import ClassificationCache
+from classifier_backends import BackendUnavailable, open_backend
+from classification_engine import ClassificationEngine, estimate_tokens
+from local_classifier import LocalClassifier
+from question_store import DATABASE_PATH, QuestionStore, read_text_sidecar
+from sort_journal import SortJournal
+from syllabus_compiler import load_compiled_syllabus, question_with_snippets
 
 # --- CONFIGURATION ---
 
 # 1. SET UP YOUR API KEY (do this in your terminal, not here)
 #    Windows: set GOOGLE_API_KEY="YOUR_API_KEY"
 #    macOS/Linux: export GOOGLE_API_KEY="YOUR_API_KEY"
-try:
-    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-except KeyError:
-    print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-    print("!!! ERROR: GOOGLE_API_KEY environment variable not set.     !!!")
-    print("!!! Please set your API key before running the script.      !!!")
-    print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-    exit()
+#    To try the sorter against stand_in_server.py instead, set QBANK_CLASSIFIER_URL to its address,
+#    and to record or replay answers, QBANK_CASSETTE (see classifier_backends.py).
 
 # 2. DEFINE YOUR FOLDER NAMES
 EXTRACTION_ROOT_DIR = "extracted_questions"
 SYLLABUS_ROOT_DIR = "syllabi"
 SORTED_OUTPUT_DIR = "sorted_questions_by_topic"
+QUESTION_DATABASE = DATABASE_PATH
+
+# 3. THE MODEL AND PROMPT. Cached classifications are only reused for the same model and
+#    prompt version, so bump PROMPT_VERSION whenever the prompt below changes meaningfully.
+MODEL_NAME = 'gemini-2.5-flash'
+PROMPT_VERSION = 2
+
+# 4. BATCHING. Several questions share one prompt (and one copy of the syllabus): as many as fit
+#    in QBANK_BATCH_TOKENS tokens of prompt, up to QBANK_BATCH_SIZE. QBANK_BATCH_SIZE=1 sends
+#    every question on its own.
+BATCH_SIZE_ENV = "QBANK_BATCH_SIZE"
+BATCH_TOKENS_ENV = "QBANK_BATCH_TOKENS"
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_BATCH_TOKENS = 60_000
 
 # --- HELPER FUNCTIONS ---
 
@@ -37,26 +50,11 @@ def find_syllabus_file(subject_code):
             return os.path.join(subject_syllabus_folder, filename)
     return None # No syllabus file found inside
 
-def extract_text_from_pdf(pdf_path):
-    """Extracts all text content from a PDF file."""
-    try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text.strip()
-    except Exception as e:
-        print(f"  -> Error reading PDF {pdf_path}: {e}")
-        return ""
-
-def get_topics_from_gemini(syllabus_content, question_text, subject_code):
+def build_prompt(syllabus_content, question_text, subject_code):
     """
     Constructs a prompt to classify a question by MAJOR TOPIC ONLY,
     with a strict output format.
     """
-    model = genai.GenerativeModel('gemini-2.5-flash')
-
     # Enforce the strict formatting you want: Topic_X_Name
     output_format_instruction = (
         "Output the topics as a comma-separated list. "
@@ -66,7 +64,7 @@ def get_topics_from_gemini(syllabus_content, question_text, subject_code):
         "If no Major Topics apply, respond with ONLY the word 'None'."
     )
     
-    prompt = f"""
+    return f"""
 You are an expert examiner for Subject Code {subject_code}. Your task is to analyze an exam question and classify it against the provided official syllabus.
 
 --- CONTEXT & TASK ---
@@ -83,107 +81,454 @@ You are an expert examiner for Subject Code {subject_code}. Your task is to anal
 
 {output_format_instruction}
 """
+
+def build_batch_prompt(syllabus_content, question_texts, subject_code):
+    """
+    Constructs a prompt to classify several questions at once. The questions
+    are labelled Q1, Q2, ... and the answer is a JSON object mapping each
+    label to its list of topics (see parse_batch_answer()).
+    """
+    questions = "".join(f"--- QUESTION Q{number} ---\n{question_text}\n"
+                        for number, question_text in enumerate(question_texts, start=1))
+    output_format_instruction = (
+        "Respond with ONLY a JSON object with one entry per question, mapping its ID (e.g. \"Q1\") to a list of topics. "
+        "Each topic MUST be formatted as: 'Topic_<Number>_<Major Topic Name>' (e.g., 'Topic_1_The Particulate Nature of Matter'). "
+        "Remove all special characters (e.g., dashes, slashes, parentheses, commas) from the topic name itself, using only spaces or underscores. "
+        "If no Major Topics apply to a question, map it to an empty list. "
+        "Example: {\"Q1\": [\"Topic_2_Experimental Techniques\"], \"Q2\": []}"
+    )
+
+    return f"""
+You are an expert examiner for Subject Code {subject_code}. Your task is to analyze {len(question_texts)} exam questions and classify each of them against the provided official syllabus.
+
+--- CONTEXT & TASK ---
+1. You must only identify **MAJOR TOPICS** (Level 1 headings) from the syllabus. Ignore all sub-topics, details, and bullet points.
+2. For each relevant Major Topic, you must include its primary number.
+3. Questions may cover multiple Major Topics; identify all that apply. Classify each question on its own.
+--- SYLLABUS CONTEXT ---
+{syllabus_content}
+--- END SYLLABUS ---
+
+--- EXAM QUESTIONS TO ANALYZE ---
+{questions}--- END EXAM QUESTIONS ---
+
+{output_format_instruction}
+"""
+
+def parse_batch_answer(answer, count):
+    """
+    Reads the answer to a batch prompt of `count` questions. Returns
+    {position: topics string} (positions from 0, topics as build_prompt()
+    asks for them, e.g. 'Topic_1_X, Topic_3_Y' or 'None') for the questions it
+    answered properly; questions it left out or garbled are missing.
+    """
+    if not answer:
+        return {}
+    # The object may come wrapped in a Markdown code fence or a sentence
+    start, end = answer.find("{"), answer.rfind("}")
+    try:
+        answers = json.loads(answer[start:end + 1]) if start != -1 else None
+    except ValueError:
+        return {}
+    if not isinstance(answers, dict):
+        return {}
+
+    topics = {}
+    for label, value in answers.items():
+        match = re.fullmatch(r'\s*Q?(\d+)\s*', str(label), re.IGNORECASE)
+        if not match or not 1 <= int(match.group(1)) <= count:
+            continue
+        if isinstance(value, list) and all(isinstance(topic, str) for topic in value):
+            value = ", ".join(topic.strip() for topic in value if topic.strip()) or "None"
+        if isinstance(value, str) and value.strip():
+            topics[int(match.group(1)) - 1] = value.strip()
+    return topics
+
+def batch_limits():
+    """(questions per prompt, tokens per prompt) from QBANK_BATCH_SIZE and QBANK_BATCH_TOKENS."""
+    batch_size = os.environ.get(BATCH_SIZE_ENV)
+    batch_tokens = os.environ.get(BATCH_TOKENS_ENV)
+    return (max(1, int(batch_size)) if batch_size else DEFAULT_BATCH_SIZE,
+            int(batch_tokens) if batch_tokens else DEFAULT_BATCH_TOKENS)
+
+def plan_batches(syllabus_content, question_texts, batch_size, batch_tokens):
+    """
+    Groups questions (by index, in order) for build_batch_prompt(): as many as
+    fit in `batch_tokens` tokens of prompt and answer alongside the syllabus,
+    up to `batch_size`. A question that does not fit with any other is
+    batched on its own.
+    """
+    base_tokens = estimate_tokens(build_batch_prompt(syllabus_content, [], "0000"))
+    batches = []
+    batch = []
+    tokens = base_tokens
+    for index, question_text in enumerate(question_texts):
+        # Each question costs its text, its label and its share of the answer
+        question_tokens = estimate_tokens(f"--- QUESTION Q{len(batch) + 1} ---\n{question_text}\n")
+        if batch and (len(batch) == batch_size or tokens + question_tokens > batch_tokens):
+            batches.append(batch)
+            batch = []
+            tokens = base_tokens
+        batch.append(index)
+        tokens += question_tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def open_classifier_backend():
+    """
+    The API that answers the prompts: Gemini, the stand-in or a cassette,
+    as the environment says (see classifier_backends.py). Raises
+    BackendUnavailable, e.g. without an API key.
+    """
+    return open_backend(MODEL_NAME)
+
+def print_backend_error(error):
+    print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+    print(f"!!! ERROR: {error}")
+    print("!!! Set GOOGLE_API_KEY before running the script, or see classifier_backends.py")
+    print("!!! for the local stand-in and recorded answers.")
+    print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+
+def open_classification_engine(backend):
+    """
+    Rate-limited, concurrent access to the classification API. Limits come from
+    QBANK_REQUESTS_PER_MINUTE, QBANK_TOKENS_PER_MINUTE and QBANK_CONCURRENCY
+    (see classification_engine.py).
+    """
+    return ClassificationEngine.from_environment(backend)
+
+def get_topics_from_gemini(syllabus_content, question_text, subject_code, engine):
+    """Classifies one question through `engine`; returns None if the API call failed."""
+    return engine.classify(build_prompt(syllabus_content, question_text, subject_code))
+
+def classify_questions(syllabus_content, question_texts, subject_code, engine, batch_size=None, batch_tokens=None):
+    """
+    Classifies questions of one subject through `engine`, several to a prompt
+    (see plan_batches(); the limits default to batch_limits()). Prompts carry
+    the syllabus's list of major topics and the sections each question seems
+    to touch rather than the whole syllabus (see syllabus_compiler.py).
+    Yields each question's topics string in order, or None if it could not
+    be classified. Questions a batch's answer leaves out, or all of them if
+    the request failed, are asked about again one at a time.
+    """
+    if batch_size is None or batch_tokens is None:
+        batch_size, batch_tokens = batch_limits()
+    syllabus = load_compiled_syllabus(subject_code, syllabus_content)
+    context = syllabus["context"]
+    question_texts = [question_with_snippets(syllabus, question_text) for question_text in question_texts]
+    # Tokens each prompt saves over one carrying the full syllabus
+    saved_tokens = syllabus["full_tokens"] - syllabus["context_tokens"]
+
+    def single_prompt(index):
+        prompt = build_prompt(context, question_texts[index], subject_code)
+        engine.record_prompt(estimate_tokens(prompt), estimate_tokens(prompt) + saved_tokens)
+        return prompt
+
+    def batch_prompt(batch):
+        prompt = build_batch_prompt(context, [question_texts[index] for index in batch], subject_code)
+        engine.record_prompt(estimate_tokens(prompt), estimate_tokens(prompt) + saved_tokens)
+        return prompt
+
+    batches = plan_batches(context, question_texts, batch_size, batch_tokens)
+    prompts = [single_prompt(batch[0]) if len(batch) == 1 else batch_prompt(batch) for batch in batches]
+
+    answers = engine.map(prompts)
+    fallbacks = []
     try:
-        # Increased temperature for better creative classification, but keep it low for accuracy
-        time.sleep(20)  # To avoid hitting rate limits
-        response = model.generate_content(prompt, generation_config={"temperature": 0.2})
-        return response.text.strip()
-    except Exception as e:
-        print(f"  -> Gemini API Error: {e}")
-        return "None"
+        for batch, answer in zip(batches, answers):
+            if len(batch) == 1:
+                yield answer
+                continue
+            topics = parse_batch_answer(answer, len(batch))
+            engine.record_batch(len(batch), len(batch) - len(topics))
+            # Start the single-question requests for the whole batch before waiting on any of them
+            retries = {position: engine.submit(single_prompt(index))
+                       for position, index in enumerate(batch) if position not in topics}
+            fallbacks.extend(retries.values())
+            for position in range(len(batch)):
+                yield topics[position] if position in topics else retries[position].result()
+    finally:
+        answers.close()
+        for future in fallbacks:
+            future.cancel()
+
+def open_classification_cache(model=MODEL_NAME):
+    """The cache of earlier classifications by this model and prompt (see classification_cache.py)."""
+    return ClassificationCache.from_environment(model, PROMPT_VERSION)
+
+def open_sort_journal(model=MODEL_NAME):
+    """The record of questions already sorted and of topic folder names (see sort_journal.py)."""
+    return SortJournal(model, PROMPT_VERSION)
+
+def open_local_classifier():
+    """The offline first pass; QBANK_LOCAL_CONFIDENCE sets its threshold (see local_classifier.py)."""
+    return LocalClassifier.from_environment()
+
+def print_local_stats(stats):
+    if stats["assigned_share"] is not None:
+        print(f"Local classifier: {stats['assigned']} questions classified locally, "
+              f"{stats['escalated']} sent on to Gemini ({stats['assigned_share']:.0%} local).")
+
+def print_cache_stats(stats):
+    if stats["hit_rate"] is not None:
+        print(f"\nClassification cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['stored']} new classifications stored.")
+
+def print_journal_stats(stats):
+    if stats["resumed"]:
+        print(f"Sort journal: {stats['resumed']} questions already sorted on an earlier run, "
+              f"{stats['recorded']} sorted now.")
+
+def print_engine_stats(stats):
+    if stats["requests"]:
+        print(f"Classification API: {stats['requests']} requests, {stats['retries']} retried, "
+              f"{stats['failed']} failed, {stats['throttled_seconds']:.0f}s waiting for the rate limit.")
+    if stats["prompt_tokens"]:
+        print(f"Prompts: {stats['prompt_tokens']} tokens ({stats['prompt_tokens_full_syllabus']} with the full syllabus).")
+    if stats["batches"]:
+        print(f"Batched prompts: {stats['batches']} covering {stats['batched_questions']} questions, "
+              f"{stats['batch_fallbacks']} questions asked about again on their own.")
+
+def load_syllabus(subject_code):
+    """Returns the text of a subject's syllabus, or None (with a warning) if there is none."""
+    syllabus_file = find_syllabus_file(subject_code)
+    if not syllabus_file:
+        print(f"  - WARNING: Syllabus not found for subject {subject_code}. Skipping.")
+        return None
+    
+    with open(syllabus_file, 'r', encoding='utf-8') as f:
+        syllabus_text = f.read()
+    print(f"  - Loaded syllabus from: {os.path.basename(syllabus_file)}")
+    return syllabus_text
+
+def get_question_text(question):
+    """The text of a question (a row of the question database), or None (with a message) if it has none."""
+    question_filepath = question["file_path"]
+    if not os.path.exists(question_filepath):
+        print(f"    - {question_filepath} no longer exists. Skipping.")
+        return None
+        
+    # The splitter stored the question's text in the database and in a sidecar next to the PDF,
+    # so the PDF itself is never parsed again
+    question_text = question["text"] or read_text_sidecar(question_filepath)
+    if not question_text:
+        print(f"    - Could not extract text from {os.path.basename(question_filepath)}. Skipping.")
+        return None
+    return question_text
+
+def file_question(store, question, topics_string, canonical_topic_map, journal=None, blobs=None):
+    """
+    Files a question's PDF under each topic in the model's answer: the PDF is
+    kept once, in the BlobStore `blobs`, and its topics and their paths in
+    sorted_questions_by_topic/ are recorded in the database. The folders
+    themselves are only linked when the view is rebuilt at the end of the
+    sort (see blob_store.materialise_view()). `canonical_topic_map` keeps
+    topic folder names consistent across a subject; new names are also
+    recorded in the `journal`, if given, so later runs keep them. Returns the
+    (topic, sorted file) pairs, or an empty list if there were no topics.
+    """
+    question_filepath = question["file_path"]
+    question_filename = os.path.basename(question_filepath)
+    if not topics_string or topics_string.lower() == 'none':
+        print(f"    - No topics found for {question_filename}.")
+        return []
+
+    # Parse the response and store the file
+    topics = [topic.strip() for topic in topics_string.split(',')]
+    print(f"    - Found Topics: {topics}")
+    sorted_topics = []
+    blobs = blobs if blobs is not None else BlobStore()
+    blob = blobs.put(question_filepath)
+    
+    for topic in topics:
+        # --- THIS IS THE NEW NORMALIZATION LOGIC ---
+
+        # 1. Create the CANONICAL KEY by removing all non-letters/numbers
+        #    and converting to lowercase.
+        canonical_key = re.sub(r'[^a-z0-9]+', '', topic.lower())
+
+        # 2. Check if we've seen this canonical key before
+        if canonical_key in canonical_topic_map:
+            # If yes, use the folder name we created the first time.
+            final_topic_name = canonical_topic_map[canonical_key]
+        else:
+            # If no, this is the first time we've seen this topic.
+            # Create the human-readable folder name now...
+            human_readable_name = re.sub(r'[\s_-]+', '_', topic) # Your old sanitization
+            # ...and store it in our map for future use (and in the journal, for future runs).
+            canonical_topic_map[canonical_key] = human_readable_name
+            if journal is not None:
+                journal.record_topic(question["subject_code"], canonical_key, human_readable_name)
+            final_topic_name = human_readable_name
+        
+        # --- END OF NEW LOGIC ---
+        
+        new_filename = f"{question['paper_name']}_{question_filename}"
+        destination_path = view_path(question["subject_code"], final_topic_name, new_filename, SORTED_OUTPUT_DIR)
+        sorted_topics.append((final_topic_name, destination_path))
+        print(f"    - Filed under '{final_topic_name}'")
+
+    # Record the topics in the database, for MockBuilder and the next rebuild of the folders
+    store.set_topics(question["id"], sorted_topics, blob)
+    return sorted_topics
+
+def refile_question(store, question, sorted_topics, blobs=None):
+    """
+    Makes the question database hold the filings a resumed question was
+    journalled with (e.g. after the database was deleted or rebuilt), linked
+    to its PDF as it is now: the file is put in the BlobStore `blobs` (a
+    no-op if its bytes are stored already), so a re-split that changed the
+    PDF but not its text is filed too. Returns True if the filings had to be
+    written.
+    """
+    blobs = blobs if blobs is not None else BlobStore()
+    blob = blobs.put(question["file_path"]) if sorted_topics else None
+    filed = store.filings(question["id"])
+    if sorted((topic, sorted_path, blob) for topic, sorted_path in sorted_topics) == sorted(filed):
+        return False
+    store.set_topics(question["id"], sorted_topics, blob)
+    return True
+
+def sort_questions(store, questions, syllabus_text, canonical_topic_map, engine, cache=None, stop=None,
+                   local_classifier=None, journal=None, blobs=None):
+    """
+    Classifies questions of one subject (rows of the question database) and
+    files each into its topic folders (see file_question()). Questions the
+    ClassificationCache knows are not sent again, nor are those the
+    LocalClassifier is confident about; the rest go to the API through
+    `engine`, batched and several requests at a time (see
+    classify_questions()). Questions are filed in the order given, so topic
+    folder names do not depend on which answer came first. Stops early once
+    the `stop` event is set. With a SortJournal, every filed question is
+    recorded in it, and questions it already holds are not sorted again
+    (their filings are brought up to date with the database and their PDFs,
+    see refile_question()).
+    PDFs are filed through the BlobStore `blobs` (see file_question()).
+    Returns (question, sorted topics) pairs for the questions that were
+    filed.
+    """
+    prepared = []
+    resumed = {}
+    for question in questions:
+        question_text = get_question_text(question)
+        if question_text is None:
+            continue
+        # Questions filed by an earlier (perhaps interrupted) run are left as they are
+        sorted_topics = journal.sorted_topics(question, question_text, syllabus_text) if journal is not None else None
+        if sorted_topics is not None:
+            resumed[question["id"]] = sorted_topics
+            prepared.append([question, question_text, None, "journal"])
+            continue
+        # Questions classified against the same syllabus before are answered from the cache
+        topics_string = cache.get(question["subject_code"], syllabus_text, question_text) if cache is not None else None
+        prepared.append([question, question_text, topics_string, "cache" if topics_string is not None else None])
+
+    subject_code = prepared[0][0]["subject_code"] if prepared else None
+    uncached = [entry for entry in prepared if entry[3] is None]
+    if local_classifier is not None:
+        # Questions whose topic is obvious from the syllabus's wording need no API call
+        local_topics = local_classifier.classify(subject_code, syllabus_text, [entry[1] for entry in uncached])
+        for entry, topics_string in zip(uncached, local_topics):
+            if topics_string is not None:
+                entry[2:] = [topics_string, "local"]
+        uncached = [entry for entry in uncached if entry[3] is None]
+
+    answers = classify_questions(syllabus_text, [entry[1] for entry in uncached], subject_code, engine)
+    results = []
+    paper_name = None
+    try:
+        for question, question_text, topics_string, source in prepared:
+            if stop is not None and stop.is_set():
+                break
+            if question["paper_name"] != paper_name:
+                paper_name = question["paper_name"]
+                print(f"  - Processing Paper: {paper_name}")
+            question_filename = os.path.basename(question["file_path"])
+            if source == "journal":
+                if refile_question(store, question, resumed[question["id"]], blobs):
+                    print(f"    - {question_filename} was sorted on an earlier run; its filing has been updated.")
+                else:
+                    print(f"    - {question_filename} was sorted on an earlier run.")
+                results.append((question, resumed[question["id"]]))
+                continue
+            if source == "cache":
+                print(f"    - Using the cached classification of {question_filename}.")
+            elif source == "local":
+                print(f"    - Classified {question_filename} locally.")
+            else:
+                topics_string = next(answers)
+                print(f"    - Analyzed {question_filename} with Gemini.")
+                # Failed calls are not cached, so they are retried next time
+                if topics_string is not None and cache is not None:
+                    cache.put(question["subject_code"], syllabus_text, question_text, topics_string)
+            sorted_topics = file_question(store, question, topics_string, canonical_topic_map, journal, blobs)
+            # Failed calls are not recorded either, so the question is sorted again after a restart
+            if topics_string is not None and journal is not None:
+                journal.record_question(question, question_text, syllabus_text, topics_string, sorted_topics)
+            results.append((question, sorted_topics))
+    finally:
+        answers.close()
+    return results
+
 # --- MAIN SCRIPT LOGIC ---
 
 def main():
     """
-    Main function to walk through extracted questions and sort them using AI.
+    Main function to go through the extracted questions in the database and sort them using AI.
     """
     print("Starting AI question sorting process...")
     
-    # Create the main output directory if it doesn't exist
+    # Create the main output directory if it doesn't exist (or restore it, if a rebuild was cut short)
+    recover_view(SORTED_OUTPUT_DIR)
     os.makedirs(SORTED_OUTPUT_DIR, exist_ok=True)
 
-    # Walk through the directory structure created by your splitter script
-    for subject_code_folder in os.listdir(EXTRACTION_ROOT_DIR):
-        subject_path = os.path.join(EXTRACTION_ROOT_DIR, subject_code_folder)
-        if not os.path.isdir(subject_path):
-            continue
+    # The splitter records every question it extracts in the question database
+    if not os.path.exists(QUESTION_DATABASE):
+        print(f"Error: The question database '{QUESTION_DATABASE}' was not found. Please run the splitter first.")
+        return
+    try:
+        backend = open_classifier_backend()
+    except BackendUnavailable as e:
+        print_backend_error(e)
+        return
+    store = QuestionStore(QUESTION_DATABASE)
+    # Classifications from earlier runs; unchanged questions are not sent to Gemini again
+    cache = open_classification_cache(backend.model)
+    # Keeps several requests in flight without going over the API's rate limits
+    engine = open_classification_engine(backend)
+    # Questions it is sure of are not sent to Gemini at all
+    local_classifier = open_local_classifier()
+    # Where an interrupted run left off, and the topic folder names chosen so far
+    journal = open_sort_journal(backend.model)
+    # Every sorted PDF is stored once; the topic folders link to it
+    blobs = BlobStore()
 
-        print(f"\nProcessing Subject: {subject_code_folder}")
-        canonical_topic_map = {}
+    for subject_code in store.subjects():
+        print(f"\nProcessing Subject: {subject_code}")
+        canonical_topic_map = journal.topic_map(subject_code)
         # 1. Find and load the syllabus for this subject
-        syllabus_file = find_syllabus_file(subject_code_folder)
-        if not syllabus_file:
-            print(f"  - WARNING: Syllabus not found for subject {subject_code_folder}. Skipping.")
+        syllabus_text = load_syllabus(subject_code)
+        if syllabus_text is None:
             continue
-        
-        with open(syllabus_file, 'r', encoding='utf-8') as f:
-            syllabus_text = f.read()
-        print(f"  - Loaded syllabus from: {os.path.basename(syllabus_file)}")
-
-        # 2. Loop through each paper folder within the subject folder
-        for paper_name_folder in os.listdir(subject_path):
-            paper_path = os.path.join(subject_path, paper_name_folder)
-            if not os.path.isdir(paper_path):
-                continue
-            
-            print(f"  - Processing Paper: {paper_name_folder}")
-
-            # 3. Loop through each question PDF in the paper folder
-            for question_filename in os.listdir(paper_path):
-                if question_filename.lower().endswith('.pdf'):
-                    question_filepath = os.path.join(paper_path, question_filename)
-                    
-                    # 4. Extract text from the question PDF
-                    question_text = extract_text_from_pdf(question_filepath)
-                    if not question_text:
-                        print(f"    - Could not extract text from {question_filename}. Skipping.")
-                        continue
-                        
-                    # 5. Call the AI to get topics
-                    print(f"    - Analyzing {question_filename} with Gemini...")
-                    topics_string = get_topics_from_gemini(syllabus_text, question_text, subject_code_folder)
-                    
-                    if not topics_string or topics_string.lower() == 'none':
-                        print(f"    - No topics found for {question_filename}.")
-                        continue
-
-                    # 6. Parse the response and copy the file
-                    topics = [topic.strip() for topic in topics_string.split(',')]
-                    print(f"    - Found Topics: {topics}")
-                    
-                    for topic in topics:
-                        # --- THIS IS THE NEW NORMALIZATION LOGIC ---
-
-                        # 1. Create the CANONICAL KEY by removing all non-letters/numbers
-                        #    and converting to lowercase.
-                        canonical_key = re.sub(r'[^a-z0-9]+', '', topic.lower())
-
-                        # 2. Check if we've seen this canonical key before
-                        if canonical_key in canonical_topic_map:
-                            # If yes, use the folder name we created the first time.
-                            final_topic_name = canonical_topic_map[canonical_key]
-                        else:
-                            # If no, this is the first time we've seen this topic.
-                            # Create the human-readable folder name now...
-                            human_readable_name = re.sub(r'[\s_-]+', '_', topic) # Your old sanitization
-                            # ...and store it in our map for future use.
-                            canonical_topic_map[canonical_key] = human_readable_name
-                            final_topic_name = human_readable_name
-                        
-                        # --- END OF NEW LOGIC ---
-                        
-                        topic_folder_path = os.path.join(SORTED_OUTPUT_DIR, subject_code_folder, final_topic_name)
-                        os.makedirs(topic_folder_path, exist_ok=True)
-                        
-                        new_filename = f"{paper_name_folder}_{question_filename}"
-                        destination_path = os.path.join(topic_folder_path, new_filename)
-                        
-                        if os.path.exists(destination_path):
-                            print(f"    - Skipping copy: File already exists in '{final_topic_name}'")
-                        else:
-                            shutil.copy(question_filepath, destination_path)
-                            print(f"    - Successfully copied to '{final_topic_name}'")
-    
+        cache.check_syllabus(subject_code, syllabus_text)
+
+        # 2. Sort every question of the subject (they come ordered by paper and number)
+        sort_questions(store, store.questions(subject_code=subject_code), syllabus_text, canonical_topic_map,
+                       engine, cache, local_classifier=local_classifier, journal=journal, blobs=blobs)
+
+    # 3. Link the topic folders as the database now has them, in one swap (if anything changed)
+    view = materialise_view(store, blobs, SORTED_OUTPUT_DIR)
+    store.close()
+    cache.close()
+    journal.close()
+    engine.close()
+    backend.close()
+    print_cache_stats(cache.stats())
+    print_local_stats(local_classifier.stats())
+    print_journal_stats(journal.stats())
+    print_engine_stats(engine.stats())
+    print_view_stats(view, blobs.stats())
     print("\n--- AI sorting process complete! ---")
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import bisect
+
+# Axis numbers match the positions in a bbox: (x0, y0, x1, y1)
+X_AXIS = 0
+Y_AXIS = 1
+
+
+class IntervalIndex:
+    """
+    Sorted-interval index over page boxes along one axis.
+
+    Boxes are kept sorted by their start coordinate. "Which boxes lie within
+    this band" is a bisect plus a scan of the boxes starting inside it; "which
+    boxes overlap it" walks a tree holding the furthest end of every run of
+    boxes, skipping runs that end before the band, so one tall box does not
+    make every query visit the whole page. Matches come back in index order
+    (by start coordinate), either as the items themselves or as their input
+    positions (rows of a box array); callers that need reading order sort the
+    few rows they keep. Callers still apply their exact test to the
+    candidates, so the results are identical to a full scan.
+    """
+
+    def __init__(self, items, bbox, axis=Y_AXIS):
+        self._items = list(items)
+        entries = sorted((bbox(item)[axis], bbox(item)[axis + 2], position)
+                         for position, item in enumerate(self._items))
+        self._starts = [start for start, _, _ in entries]
+        self._ends = [end for _, end, _ in entries]
+        self._positions = [position for _, _, position in entries]
+        # Max-tree over the ends: node 1 covers every entry, node k's children 2k and 2k + 1 its two halves,
+        # and leaf _size + i is entry i. Each node holds the furthest end in its run.
+        self._size = 1
+        while self._size < len(entries):
+            self._size *= 2
+        self._max_end = [float("-inf")] * (2 * self._size)
+        self._max_end[self._size:self._size + len(entries)] = self._ends
+        for node in range(self._size - 1, 0, -1):
+            self._max_end[node] = max(self._max_end[2 * node], self._max_end[2 * node + 1])
+
+    def __len__(self):
+        return len(self._items)
+
+    def rows_overlapping(self, lo, hi):
+        """Input positions of the items whose interval overlaps the open band (lo, hi)."""
+        # Entries before `last` start before hi; of those, the ones ending after lo overlap
+        last = bisect.bisect_left(self._starts, hi)
+        rows = []
+        stack = [(1, 0, self._size)] if last else []
+        while stack:
+            node, first, stop = stack.pop()
+            if first >= last or self._max_end[node] <= lo:
+                continue
+            if node >= self._size:
+                rows.append(self._positions[first])
+                continue
+            middle = (first + stop) // 2
+            # Left half popped first, so rows come out in index order
+            stack.append((2 * node + 1, middle, stop))
+            stack.append((2 * node, first, middle))
+        return rows
+
+    def rows_within(self, lo, hi):
+        """Input positions of the items whose interval lies inside the closed band [lo, hi]."""
+        first = bisect.bisect_left(self._starts, lo)
+        last = bisect.bisect_right(self._starts, hi)
+        return [self._positions[i] for i in range(first, last) if self._ends[i] <= hi]
+
+    def overlapping(self, lo, hi):
+        """Items whose interval on this axis overlaps the open band (lo, hi)."""
+        return [self._items[position] for position in self.rows_overlapping(lo, hi)]
+
+    def within(self, lo, hi):
+        """Items whose interval on this axis lies inside the closed band [lo, hi]."""
+        return [self._items[position] for position in self.rows_within(lo, hi)]
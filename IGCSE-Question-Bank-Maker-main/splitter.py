@@ -1,72 +1,282 @@
 import fitz
+import json
+import numpy as np
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import geometry
+from catalog import Catalog, parse_name
+from instrumentation import DISABLED, NULL_TIMER, Instrumentation
+from manifest import Manifest
+from memory_budget import UNLIMITED, MemoryBudget
+from page_analysis import PageCache
+from page_classifier import PageClassifier
+from question_store import LAYOUT_SIDECAR_SUFFIX, TEXT_SIDECAR_SUFFIX, QuestionStore, sidecar_path
+
+# Pages containing any of these phrases hold no questions (blank, formula and data sheets)
+BLANK_PAGE_PHRASES = ["BLANK PAGE", "ADDITIONAL PAGE", "Mathematical Formulae", "TURN PAGE FOR QUESTION",
+                      "printed on the next page", "The Periodic Table of Elements", "starts on the next page.",
+                      "Note for use in qualitative analysis", "Important values, constants and standards"]
+BLANK_PAGE_CLASSIFIER = PageClassifier(BLANK_PAGE_PHRASES, title_phrases=["Qualitative analysis notes"])
+
+# Every Q<n>.pdf gets a Q<n>.txt of its reading-order text, so later stages never parse the PDFs again;
+# with QBANK_LAYOUT_SIDECARS=1 also a Q<n>.layout.json of its text spans (boxes, fonts and sizes).
+# Part of the manifest settings, so bumping SIDECAR_VERSION re-splits papers split before the change.
+SIDECAR_VERSION = 1
+LAYOUT_ENV = "QBANK_LAYOUT_SIDECARS"
+
+# Errors that mean the paper itself cannot be split (questions out of order, a damaged PDF). They are
+# kept in the manifest, so the paper is not tried again until it changes or QBANK_RETRY_FAILED=1 is set.
+# Anything else (a worker process killed, a full disk, running out of memory) is retried on the next run.
+PAPER_ERRORS = (ValueError, fitz.FileDataError)
+RETRY_FAILED_ENV = "QBANK_RETRY_FAILED"
 
 class Split:
 
-    def __init__(self, path, crawl=True):
+    def __init__(self, path=None, crawl=True, workers=1, incremental=True, instrumentation=None, memory_budget=None,
+                 store=None, retry_failed=None):
         self.paths = []
+        self.results = []
+        self.errors = []
+        self.skipped = []
+        self.manifest = None
+        self.catalog = None
+        self.border = 50
+        self.padding = 10
+        self.layout = os.environ.get(LAYOUT_ENV, "") not in ("", "0")
+        # Whether papers that could not be split before are tried again even if unchanged
+        if retry_failed is None:
+            retry_failed = os.environ.get(RETRY_FAILED_ENV, "") not in ("", "0")
+        self.retry_failed = retry_failed
+        # Per-stage timings and optional profiling; the default is a no-op
+        self.instrumentation = instrumentation or DISABLED
+        # Flushes MuPDF's store between papers when the process grows past a limit
+        self.memory_budget = memory_budget or UNLIMITED
+        # Question database that split papers are recorded in (see question_store.py)
+        self.store = store
+        self.reader = None
+        self.pages = None
+
+        # A splitter built without a path does no work up front; pool workers
+        # use this to call process_paper() on a single file.
+        if path is None:
+            return
+
+        # Without a store of the caller's, the default database is opened for this run
+        owns_store = store is None
+        if owns_store:
+            self.store = QuestionStore()
+
+        try:
+            self.find_papers(path, crawl, incremental)
+
+            if workers is None:
+                workers = os.cpu_count() or 1
+            try:
+                if workers > 1 and len(self.paths) > 1:
+                    self.run_parallel(workers)
+                else:
+                    self.run_serial()
+            finally:
+                if self.manifest is not None:
+                    self.manifest.save()
+        finally:
+            if owns_store:
+                self.store.close()
+        print("\nFinished processing all papers.")
+
+    def settings(self):
+        return {"border": self.border, "padding": self.padding, "sidecars": SIDECAR_VERSION, "layout": self.layout}
+
+    def find_papers(self, path, crawl=True, incremental=True):
+        """
+        Lists the papers at `path` (a file or folder, or a list of them) that
+        need splitting in self.paths; unchanged ones go to self.skipped.
+        """
+        roots = [path] if isinstance(path, str) else list(path)
         if crawl:
-            self.crawl(path)
+            # Folder listings are cached between runs, like the manifest
+            if incremental:
+                self.catalog = Catalog()
+            for root in roots:
+                self.crawl(root)
+            if self.catalog is not None:
+                self.catalog.save()
         else:
-            self.paths.append(path)
+            self.paths.extend(roots)
+
+        # Papers whose content and settings match the manifest were already split
+        if incremental:
+            self.manifest = Manifest()
+            self.skip_unchanged()
+
+    def skip_unchanged(self):
+        settings = self.settings()
+        changed = []
+        for path in self.paths:
+            if not self.manifest.is_current(path, settings):
+                changed.append(path)
+            elif self.manifest.error(path) is not None:
+                # One that could not be split is not tried again until it changes (unless asked to)
+                (changed if self.retry_failed else self.skipped).append(path)
+            elif self.store is None or self.store.has_paper(parse_name(path).name):
+                self.skipped.append(path)
+            else:
+                # Missing from the database (e.g. after it was deleted): split again
+                changed.append(path)
+        self.paths = changed
+        if self.skipped:
+            failed = sum(self.manifest.error(path) is not None for path in self.skipped)
+            print(f"Skipping {len(self.skipped)} unchanged papers (recorded in '{self.manifest.path}')"
+                  + (f", {failed} of which failed before (set {RETRY_FAILED_ENV}=1 to try them again)."
+                     if failed else "."))
+
+    def record_result(self, result):
+        self.results.append(result)
+        if self.store is not None:
+            self.store.upsert_paper(result["paper"], result["question_files"], source=result["path"])
+        if self.manifest is not None:
+            self.manifest.record(result["path"], self.settings(), result["outputs"])
+
+    def record_error(self, path, error):
+        """
+        Notes a paper that could not be split. If the paper itself is at
+        fault (PAPER_ERRORS), the manifest keeps the error, so the paper is
+        skipped until it changes; other errors are tried again next run.
+        """
+        self.errors.append({"path": path, "error": str(error)})
+        print(f"\nError in '{path}': {error}. Skipping file.")
+        if self.manifest is not None and isinstance(error, PAPER_ERRORS) and os.path.exists(path):
+            self.manifest.record(path, self.settings(), [], error=str(error))
+
+    def run_serial(self):
         path_num = len(self.paths)
         for index, path in enumerate(self.paths):
-            self.reader = fitz.open(path)
-            self.questions = []
-            self.blankPages = []
-            self.info = {}
-            self.border = 50
-            self.padding = 10
-            
-            # Get info (including the new subject code)
-            self.get_info(path)
-            
+            try:
+                result = self.process_paper(path)
+            except Exception as e:
+                self.record_error(path, e)
+                continue
+            self.record_result(result)
+            print(f"\r'{result['name']}' processed: {index + 1}/{path_num}", end=" ")
+
+    def run_parallel(self, workers):
+        # Each paper is sent to its own process, which opens its own fitz document,
+        # so no reader or question state is shared between papers.
+        path_num = len(self.paths)
+        print(f"Splitting {path_num} papers with {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_split_worker, path, self.border, self.padding, self.instrumentation.settings(),
+                                   self.memory_budget.settings(), self.layout): path
+                            for path in self.paths}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.record_error(path, e)
+                    continue
+                self.instrumentation.add(result.get("timings"))
+                self.record_result(result)
+                print(f"\r'{result['name']}' processed: {done}/{path_num}", end=" ")
+
+        # Keep the results in crawl order regardless of which worker finished first
+        order = {path: index for index, path in enumerate(self.paths)}
+        self.results.sort(key=lambda result: order[result["path"]])
+        self.errors.sort(key=lambda error: order[error["path"]])
+
+    def load_paper(self, path, timer=NULL_TIMER):
+        """
+        Opens a paper and works out the (trimmed) areas of every question in it.
+        The paper stays open until close_paper() or the next load_paper() call.
+        """
+        self.close_paper()
+        self.path = path
+        self.reader = fitz.open(path)
+        self.pages = PageCache(self.reader)
+        self.questions = []
+        self.blankPages = []
+        self.blankReasons = {}
+        self.info = {}
+
+        # Get info (including the new subject code)
+        self.get_info(path)
+
+        with timer.stage("extract_questions"):
+            self.extract_questions()
+        with timer.stage("check_order"):
+            in_order = self.check_order()
+        if not in_order:
+            raise ValueError("Could not load all questions in order")
+        with timer.stage("compute_crop"):
+            self.compute_crop()
+        with timer.stage("trim_page"):
+            self.trim_page()
+
+    def close_paper(self):
+        """Closes the current paper and drops its cached pages."""
+        if self.reader is not None:
+            self.reader.close()
+        self.reader = None
+        self.pages = None
+
+    def iter_paper(self, path):
+        """Yields an in-memory record for each question of a paper; nothing is written to disk."""
+        try:
+            self.load_paper(path)
+            yield from self.build_questions()
+        finally:
+            self.close_paper()
+
+    def process_paper(self, path):
+        """Splits a single paper into Q*.pdf files and returns a summary of the outputs."""
+        timer = self.instrumentation.start(os.path.splitext(os.path.basename(path))[0], "question_paper")
+        try:
+            self.load_paper(path, timer)
+
             ### CHANGED: The output path is now hierarchical.
             # It will look like: "extracted_questions/0620/0620_s23_qp_41"
             output_folder_path = os.path.join("extracted_questions", self.info['subject_code'], self.info['name'])
             os.makedirs(output_folder_path, exist_ok=True)
+            # A changed paper may now have fewer questions; its old ones must not linger
+            remove_outputs(output_folder_path)
 
-            self.extract_questions()
-            if not self.check_order():
-                print(f"\nError in '{path}': Could not load all questions in order. Skipping file.")
-                continue
-            self.compute_crop()
-            self.trim_page()
-            
             # Pass the new, specific output folder to the split_questions method
-            self.split_questions(output_folder_path)
+            with timer.stage("split_questions"):
+                question_files = self.split_questions(output_folder_path)
+            page_cache = dict(self.pages.stats)
+        except Exception as e:
+            timer.finish(error=e)
+            raise
+        finally:
+            self.close_paper()
 
-            print(f"\r'{self.info['name']}' processed: {index + 1}/{path_num}", end=" ")
-        print("\nFinished processing all papers.")
+        return {
+            "path": path,
+            "name": self.info['name'],
+            "paper": dict(self.info),
+            "output_dir": output_folder_path,
+            "questions": [question['question_num'] for question in self.questions],
+            "outputs": [path for question in question_files for path in [question["file_path"], *question["sidecars"]]],
+            "question_files": question_files,
+            "blank_pages": dict(self.blankReasons),
+            "page_cache": page_cache,
+            "timings": timer.finish(),
+            "memory": self.memory_budget.check(self.info['name'])
+        }
 
-def crawl(self, path):
-    rootdir = os.fsencode(path)
-
-    # Split all pdfs in the root directory if it exists
-    if rootdir is not None:
-        if os.path.isfile(rootdir):
-            self.paths.append(rootdir.decode('UTF-8'))
-        elif os.path.exists(rootdir):
-            for subdir, dirs, files in os.walk(rootdir):
-                
-                # --- THIS IS THE FIX ---
-                # If the current subdirectory is one of our output folders, skip it entirely.
-                decoded_subdir = subdir.decode('UTF-8')
-                if "extracted_questions" in decoded_subdir or "sorted_questions_by_topic" in decoded_subdir:
-                    continue # This tells the loop to immediately move to the next subdirectory
-                # --- END OF FIX ---
-                
-                for file in files:
-                    filepath = (subdir + os.sep.encode('UTF-8') + file).decode('UTF-8')
-                    if filepath.endswith(".pdf") and "qp" in filepath:
-                        self.paths.append(filepath)
+    def crawl(self, path):
+        # A single file is split whatever its name; folders are searched for question papers
+        # by file name, skipping the pipeline's own output folders
+        if os.path.isfile(path):
+            self.paths.append(path)
+        elif os.path.exists(path):
+            catalog = self.catalog or Catalog(cache_path=None)
+            self.paths.extend(paper.path for paper in catalog.scan(path, kind="qp"))
 
     def _is_new_format(self, page):
-        # No changes needed here
-        phrase = "DO NOT WRITE IN THIS MARGIN"
-        found_rects = page.search_for(phrase,)
-        return len(found_rects) >= 1
+        # The margin phrase is searched for once per page and cached on its PageAnalysis
+        return page.is_new_format
 
     def locate_questions(self, page, page_number):
         # No changes needed here
@@ -74,11 +284,11 @@ def crawl(self, path):
             rect = fitz.Rect(0, 60, 60, 770)
         else:
             rect = fitz.Rect(0, 50, 60, page.rect.y1)
-        page_dict = page.get_text("dict")
-        bold_spans = [span for block in page_dict["blocks"] if block["type"] == 0
-                        for line in block["lines"]
-                        for span in line["spans"]
-                        if fitz.Rect(span["bbox"]).intersects(rect)]
+        # Only spans reaching into the left margin band are tested against the rect
+        rows = np.array(page.span_index.rows_overlapping(rect.x0, rect.x1), dtype=int)
+        # Back into reading order (the index returns them by x)
+        rows = np.sort(rows[geometry.intersects(page.span_boxes[rows], rect)])
+        bold_spans = [page.spans[row] for row in rows]
         questions = []
         valid_question_pattern = re.compile(r"^\s*\d+\.?\s*(\(\s*[a-z]\s*\))?(\(\s*[ivx]+\s*\))?\s*$")
         for a in bold_spans:
@@ -86,51 +296,33 @@ def crawl(self, path):
             text = a["text"].strip()
             if valid_question_pattern.fullmatch(text):
                 current_num_str = match.group()
-                if (len(questions) == 0 
+                if (len(questions) == 0
                         or int(current_num_str) == (int(questions[-1]['question_num']) + 1)):
                     questions.append({
-                        'question_num': current_num_str, 
-                        'bbox': [round(n) for n in a["bbox"]], 
+                        'question_num': current_num_str,
+                        'bbox': [round(n) for n in a["bbox"]],
                         'page': page_number
                     })
         return questions
 
     def flag_blank(self, page):
-        # No changes needed here
-        wordList = ["BLANK PAGE", "ADDITIONAL PAGE", "Mathematical Formulae", "TURN PAGE FOR QUESTION", 
-                    "printed on the next page", "The Periodic Table of Elements", "starts on the next page.",
-                    "Note for use in qualitative analysis", "Important values, constants and standards"]
-        for word in wordList:
-            if page.search_for(word):
-                return True
-        title_version_exists = page.search_for("Qualitative analysis notes")
-        sentence_version_exists = page.search_for("Qualitative analysis notes.")
-        if title_version_exists and not sentence_version_exists:
-            return True
-        return False
-        
+        # Returns the rule that marked the page as blank, or None for a question page.
+        # All phrases are matched in one pass over the page text.
+        return BLANK_PAGE_CLASSIFIER.classify(page.text)
+
     def extract_questions(self):
-        # No changes needed here
-        for page_number, content in enumerate(self.reader):
-            if not (self.flag_blank(content) or page_number == 0):
+        for page_number, content in enumerate(self.pages):
+            reason = "cover page" if page_number == 0 else self.flag_blank(content)
+            if not reason:
                 self.questions += self.locate_questions(content, page_number)
             else:
                 self.blankPages.append(page_number)
+                self.blankReasons[page_number] = reason
 
     def get_info(self, path):
-        ### CHANGED: This method now also extracts the 4-digit subject code.
-        base_name = os.path.basename(path)
-        file_name_without_ext, _ = os.path.splitext(base_name)
-        
-        # Use regex to find the first 4-digit number in the filename
-        match = re.search(r'\d{4}', file_name_without_ext)
-        subject_code = match.group(0) if match else "unknown_subject"
-        
-        self.info = {
-            "name": file_name_without_ext,
-            "subject_code": subject_code
-        }
-        
+        # Name, subject code, year, season, kind, paper and variant from the file name
+        self.info = parse_name(path).info()
+
     def compute_crop(self):
         # No changes needed here
         dimensions = {"height": self.reader[0].rect.y1, "width": self.reader[0].rect.x1}
@@ -145,52 +337,101 @@ def crawl(self, path):
                 y_coord = []
                 if not ((question["page"] + offset) in self.blankPages):
                     y_coord = [question["bbox"][1] - self.padding if offset == 0 else self.border,
-                                next_question["bbox"][1] - self.padding if (question["page"] + offset) == next_question["page"] 
+                                next_question["bbox"][1] - self.padding if (question["page"] + offset) == next_question["page"]
                                     else dimensions["height"] - self.border]
                     if not (next_question["bbox"][1] < 75 and (question["page"] + offset) == next_question["page"]):
                         self.questions[index]["questionArea"].append({"y_coord": y_coord, "page_number": question["page"] + offset})
                 offset += 1
 
     def trim_page(self):
-        # No changes needed here
-        text = [self.reader[page].get_text("dict") for page in range(len(self.reader))]
-        drawings = [self.reader[page].get_drawings() for page in range(len(self.reader))]
+        # Page content is only fetched for pages some questionArea points at, so the
+        # cover, blank pages and data sheets never have their drawings extracted
         for question in self.questions:
             for area in question["questionArea"]:
-                page = self.reader[area["page_number"]]
+                page = self.pages[area["page_number"]]
                 rect = fitz.Rect(0, area["y_coord"][0], page.rect.x1, area["y_coord"][1])
-                regiontext = [block for block in text[area["page_number"]]["blocks"]
-                                                    if fitz.Rect(block["bbox"]).intersects(rect)]
-                regiondrawing = [box["rect"] for box in drawings[area["page_number"]]
-                                    if box["stroke_opacity"] is not None
-                                        and (fitz.Rect(box["rect"]) in rect)]
-                try:
-                    proposedy = [min([x["bbox"][1] for x in regiontext] + [x.y1 for x in regiondrawing]) - self.padding,
-                                    max([x["bbox"][3] for x in regiontext] + [x.y1 for x in regiondrawing]) + self.padding]
-                    area["y_coord"] = [max(area["y_coord"][0], proposedy[0]), min(area["y_coord"][1], proposedy[1])]
-                except ValueError:
+                # The page indexes narrow each lookup to the boxes in this y-band,
+                # then the exact fitz tests run over those rows as array operations
+                regiontext = page.block_boxes[page.block_index.rows_overlapping(rect.y0, rect.y1)]
+                regiontext = regiontext[geometry.intersects(regiontext, rect)]
+                regiondrawing = page.drawing_boxes[page.drawing_index.rows_within(rect.y0, rect.y1)]
+                regiondrawing = regiondrawing[geometry.contained(regiondrawing, rect)]
+                tops = np.concatenate((regiontext[:, 1], regiondrawing[:, 3]))
+                bottoms = np.concatenate((regiontext[:, 3], regiondrawing[:, 3]))
+                if not len(tops):
                     continue
+                proposedy = [float(tops.min()) - self.padding, float(bottoms.max()) + self.padding]
+                area["y_coord"] = [max(area["y_coord"][0], proposedy[0]), min(area["y_coord"][1], proposedy[1])]
+
+    def build_questions(self):
+        """
+        Yields one record per question: paper info, crop areas, reading-order
+        text, span layout (None unless self.layout) and PDF bytes.
+        """
+        for question in self.questions:
+            with fitz.open() as output:
+                pdf, areas, text, layout = self._build_question(output, question)
+
+            yield {
+                "source": self.path,
+                "paper": dict(self.info),
+                "question_num": question['question_num'],
+                "areas": areas,
+                "text": "\n".join(part for part in text if part),
+                "layout": layout,
+                "pdf": pdf
+            }
+
+    def _build_question(self, output, question):
+        """Draws a question's areas onto `output`; returns its PDF bytes, crop areas, text parts and layout."""
+        areas, text = [], []
+        layout = [] if self.layout else None
+        for area in question["questionArea"]:
+            source_page = self.pages[area["page_number"]]
+            if self._is_new_format(source_page):
+                crop_x0, crop_x1 = 25, source_page.rect.width - 25
+                crop_y0, crop_y1 = area["y_coord"][0] + 9, area["y_coord"][1] - 2
+                cropbox = fitz.Rect(crop_x0, crop_y0, crop_x1, crop_y1)
+            else:
+                cropbox = fitz.Rect(0, area["y_coord"][0], source_page.rect.width, area["y_coord"][1])
+            outbox = fitz.Rect(0, 0, cropbox.width, cropbox.height)
+            outPage = output.new_page(-1, width=outbox.width, height=max(outbox.height, 90))
+            outPage.show_pdf_page(outbox, self.reader, area["page_number"], clip=cropbox)
+
+            # The page's words are already cached, so the text costs no extra parsing
+            words = source_page.words
+            in_crop = geometry.intersects(source_page.word_boxes, cropbox)
+            text.append(make_text([word for word, keep in zip(words, in_crop) if keep]))
+            areas.append({"page_number": area["page_number"], "cropbox": tuple(cropbox)})
+            if layout is not None:
+                # Spans come from the same cached page dict that trimming used
+                in_crop = geometry.intersects(source_page.span_boxes, cropbox)
+                layout.append({"page": len(layout), "source_page": area["page_number"],
+                               "width": round(outbox.width, 2), "height": round(outPage.rect.height, 2),
+                               "spans": [span_layout(span, cropbox)
+                                         for span, keep in zip(source_page.spans, in_crop) if keep]})
+        return output.tobytes(garbage=4, deflate=True), areas, text, layout
 
     def split_questions(self, output_dir):
-        # No changes needed here
-        for index, question in enumerate(self.questions):
-            filename = os.path.join(output_dir, f"Q{question['question_num']}.pdf")
-            output = fitz.open()
-            for area in question["questionArea"]:
-                source_page = self.reader[area["page_number"]]
-                if self._is_new_format(source_page):
-                    crop_x0, crop_x1 = 25, source_page.rect.width - 25
-                    crop_y0, crop_y1 = area["y_coord"][0] + 9, area["y_coord"][1] - 2
-                    cropbox = fitz.Rect(crop_x0, crop_y0, crop_x1, crop_y1)
-                else:
-                    cropbox = fitz.Rect(0, area["y_coord"][0], source_page.rect.width, area["y_coord"][1])
-                outbox = fitz.Rect(0, 0, cropbox.width, cropbox.height)
-                outPage = output.new_page(-1, width=outbox.width, height=max(outbox.height, 90))
-                outPage.show_pdf_page(outbox, self.reader, area["page_number"], clip=cropbox)
+        # Returns the question, file, sidecars and text of every file that was written, for the manifest and database
+        outputs = []
+        for record in self.build_questions():
+            filename = os.path.join(output_dir, f"Q{record['question_num']}.pdf")
             try:
-                output.save(filename, garbage=4, deflate=True)
+                with open(filename, "wb") as f:
+                    f.write(record["pdf"])
+                sidecars = [sidecar_path(filename)]
+                with open(sidecars[0], "w", encoding="utf-8") as f:
+                    f.write(record["text"])
+                if record["layout"] is not None:
+                    sidecars.append(sidecar_path(filename, LAYOUT_SIDECAR_SUFFIX))
+                    with open(sidecars[1], "w", encoding="utf-8") as f:
+                        json.dump({"question": record["question_num"], "pages": record["layout"]}, f)
+                outputs.append({"question": record["question_num"], "file_path": filename, "text": record["text"],
+                                "sidecars": sidecars})
             except Exception as e:
                 print(f"Error: Could not write to file {filename}. Reason: {e}")
+        return outputs
 
     def check_order(self):
         # No changes needed here
@@ -200,9 +441,92 @@ def crawl(self, path):
         for question in self.questions[1:]:
             if int(question["question_num"]) != (int(priorQuestion) + 1):
                 return False
-            priorQuestion = question["question_num"] 
+            priorQuestion = question["question_num"]
         return True
 
+
+# The files split_questions() writes: Q<n>.pdf and its sidecars
+OUTPUT_FILE = re.compile(r"^Q\d+(\.pdf|" + re.escape(TEXT_SIDECAR_SUFFIX) + "|" + re.escape(LAYOUT_SIDECAR_SUFFIX) + ")$")
+
+
+def remove_outputs(output_dir):
+    """Deletes the question files and sidecars of an earlier split of the paper in `output_dir`."""
+    for name in os.listdir(output_dir):
+        if OUTPUT_FILE.match(name):
+            os.remove(os.path.join(output_dir, name))
+
+
+def make_text(words):
+    """
+    Returns the text of get_text("words") items in reading order: words are
+    grouped into lines by their rounded bottom coordinate, lines run top to
+    bottom and words left to right.
+    """
+    line_dict = {}
+    for x0, _, _, y1, word, *_ in sorted(words):
+        line_dict.setdefault(round(y1, 1), []).append(word)
+    return "\n".join(" ".join(line) for _, line in sorted(line_dict.items()))
+
+
+def span_layout(span, cropbox):
+    """A text span as the layout sidecar records it, with its box relative to the question's page."""
+    x0, y0, x1, y1 = span["bbox"]
+    return {"text": span["text"], "bbox": [round(x0 - cropbox.x0, 2), round(y0 - cropbox.y0, 2),
+                                           round(x1 - cropbox.x0, 2), round(y1 - cropbox.y0, 2)],
+            "font": span["font"], "size": round(span["size"], 2), "flags": span["flags"]}
+
+
+def iter_questions(paths, border=50, padding=10, memory_budget=None):
+    """
+    Streams the questions of one or more papers (files or folders to crawl) as
+    in-memory records, without writing anything to 'extracted_questions'.
+    Papers that cannot be split (questions not found in order, corrupt or
+    encrypted files...) are reported and skipped, as run_serial() does.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    splitter = Split(memory_budget=memory_budget)
+    splitter.border = border
+    splitter.padding = padding
+    for path in paths:
+        splitter.crawl(path)
+    for path in splitter.paths:
+        try:
+            yield from splitter.iter_paper(path)
+        except Exception as e:
+            print(f"\nError in '{path}': {e}. Skipping file.")
+        splitter.memory_budget.check(os.path.basename(path))
+
+
+def _split_worker(path, border, padding, instrumentation_settings, memory_settings, layout=False):
+    """Process-pool entry point: splits one paper with a splitter (and fitz document) of its own."""
+    splitter = Split()
+    if memory_settings["enabled"]:
+        splitter.memory_budget = _worker_memory_budget(memory_settings)
+    splitter.border = border
+    splitter.padding = padding
+    splitter.layout = layout
+    if instrumentation_settings["enabled"]:
+        splitter.instrumentation = Instrumentation(**instrumentation_settings)
+    return splitter.process_paper(path)
+
+
+_WORKER_MEMORY_BUDGET = None
+
+
+def _worker_memory_budget(settings):
+    # One budget per worker process, so its flush count and tracemalloc state carry across papers
+    global _WORKER_MEMORY_BUDGET
+    if _WORKER_MEMORY_BUDGET is None:
+        _WORKER_MEMORY_BUDGET = MemoryBudget(**settings)
+    return _WORKER_MEMORY_BUDGET
+
+
 if __name__ == '__main__':
     path_to_papers = "."
-    Split(path_to_papers, crawl=True)
\ No newline at end of file
+    # Set QBANK_TIMINGS / QBANK_PROFILE to collect stage timings or profiles
+    instrumentation = Instrumentation.from_environment()
+    # Set QBANK_MEMORY_BUDGET (MB) / QBANK_TRACEMALLOC=1 to bound and report memory per paper
+    Split(path_to_papers, crawl=True, workers=os.cpu_count(), instrumentation=instrumentation,
+          memory_budget=MemoryBudget.from_environment())
+    instrumentation.save()
@@ -1,12 +1,12 @@
 import fitz
 import copy
 import os
-import csv
 import io
 import re
 import itertools
+from question_store import QuestionStore
 
-# Class to split a pdf into individual questions and store them in a csv file
+# Class to split a pdf into individual questions and store them in the question database
 class Split:
 
     def __init__(self, path, crawl=True):
@@ -18,6 +18,8 @@ class Split:
         else:
             self.paths.append(path)
 
+        # Same place the old database.csv was kept
+        self.store = QuestionStore(f"questions{os.sep}database.db")
         path_num = len(self.paths)
         for index, path in enumerate(self.paths):
             self.reader = fitz.open(path)
@@ -34,14 +36,13 @@ class Split:
             self.trim_page()
             self.get_info(path)
             self.split_questions()
-            self.to_csv()
+            self.to_database()
 
             # Print progress
             print(f"\r{self.info['name']} loaded into database: {index + 1}/{path_num}", end=" ")
 
         print("\nFinished loading all papers into database")
-        # Clear duplicates from the csv file
-        clear_duplicates()
+        self.store.close()
 
 
     def crawl(self, path):
@@ -326,17 +327,10 @@ class Split:
             except Exception as e:
                 print(f"Error: Could not write to file {filename}. Reason: {e}")
 
-    # Writes paper info to the database
-    def to_csv(self):
-
-        headers = ["subject_code", "year", "season", "paper", "variant", "question", "filename", "text"]
-
-        isExist = os.path.exists(f"questions{os.sep}database.csv")
-        with open(f"questions{os.sep}database.csv", "a", newline='', encoding="utf-8") as csvfile:
-            cwriter = csv.DictWriter(csvfile, fieldnames=headers)
-            if not isExist:
-                cwriter.writeheader()
-            cwriter.writerows(self.rows)
+    # Writes paper info to the database; re-loading a paper updates its rows instead of duplicating them
+    def to_database(self):
+        self.store.upsert_paper(self.info, [{"question": row["question"], "file_path": row["filename"], "text": row["text"]}
+                                            for row in self.rows])
 
 
     # Function to check if the question numbers are in numerical order, if not throw an error
@@ -354,28 +348,3 @@ class Split:
             priorQuestion = question["question_num"] 
 
         return True
-
-
-# Removes duplicate entries from the csv based on filename column
-def clear_duplicates():
-    if (os.path.exists(f"questions{os.sep}database.csv")):
-        # Open the csv file and read the lines
-        with open(f"questions{os.sep}database.csv", encoding="utf-8") as f:
-            lines = f.readlines()
-        # Get the index of the filename column from the header line
-        filename_index = lines[0].split(",").index("filename")
-        # Create a set to store the filenames that have been seen
-        seen_filenames = set()
-        # Create a list to store the lines that are not duplicates
-        new_lines = []
-        # Loop through the lines and check the filename column
-        for line in lines:
-            # Get the filename from the line
-            filename = line.split(",")[filename_index]
-            # If the filename is not in the seen set, add it to the new lines and the seen set
-            if filename not in seen_filenames:
-                new_lines.append(line)
-                seen_filenames.add(filename)
-        # Write the new lines to the csv file
-        with open(f"questions{os.sep}database.csv", 'w', encoding="utf-8") as t:
-            t.writelines(new_lines)
\ No newline at end of file
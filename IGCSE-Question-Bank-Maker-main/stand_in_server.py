@@ -0,0 +1,183 @@
+"""
+A local stand-in for the classification API, for trying out the sorter's rate
+limiting, retries and concurrency without a Gemini key or quota.
+
+    python stand_in_server.py --port 8765 --rpm 60 --error-rate 0.1 --latency 0.5
+    QBANK_CLASSIFIER_URL=http://127.0.0.1:8765/classify python sorting.py
+
+POST /classify takes {"prompt": "..."} and answers {"text": "Topic_<n>_..."},
+picking one of the syllabus's major topics from a hash of the question, after
+--latency seconds (give or take --jitter). A batch prompt (sorting.build_batch_prompt)
+is answered with a JSON object of topic lists, leaving out --omit-rate of the
+questions. Requests beyond --rpm/--tpm in any
+60 seconds are refused with 429 and a Retry-After header, and a further
+--error-rate of them fail with 503. GET /stats reports what it has seen.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A major topic line of a syllabus, e.g. "1 Information representation" or "Topic 2: Stoichiometry"
+MAJOR_TOPIC = re.compile(r"^\s*(?:Topic\s*)?(\d{1,2})[.:)]?\s+([A-Za-z][^\n.]*?)\s*:?\s*$", re.MULTILINE)
+QUESTION_MARKER = "--- EXAM QUESTION TO ANALYZE ---"
+BATCH_MARKER = "--- EXAM QUESTIONS TO ANALYZE ---"
+BATCH_QUESTION = re.compile(r"^--- QUESTION (Q\d+) ---\n(.*?)(?=^--- )", re.MULTILINE | re.DOTALL)
+
+
+class QuotaWindow:
+    """Counts requests and tokens over the last 60 seconds."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.entries = deque()
+        self.lock = threading.Lock()
+
+    def admit(self, tokens):
+        """Records a request if it fits the quota; otherwise returns the seconds until it would."""
+        with self.lock:
+            now = time.monotonic()
+            while self.entries and now - self.entries[0][0] >= 60:
+                self.entries.popleft()
+            used = sum(entry[1] for entry in self.entries)
+            if ((self.requests_per_minute and len(self.entries) >= self.requests_per_minute)
+                    or (self.tokens_per_minute and self.entries and used + tokens > self.tokens_per_minute)):
+                return 60 - (now - self.entries[0][0])
+            self.entries.append((now, tokens))
+            return 0
+
+
+def choose_topic(topics, question):
+    """A plausible, repeatable classification: one of the major topics, chosen by the question's text."""
+    if not topics:
+        return None
+    number, name = topics[zlib.crc32(question.strip().encode("utf-8")) % len(topics)]
+    return f"Topic_{number}_{re.sub(r'[^A-Za-z0-9 ]+', '', name).strip()}"
+
+
+def answer(prompt, omit=lambda: False):
+    """The answer to a prompt; `omit()` decides whether a batch answer leaves a question out."""
+    if BATCH_MARKER in prompt:
+        syllabus, _, questions = prompt.partition(BATCH_MARKER)
+        topics = MAJOR_TOPIC.findall(syllabus)
+        answers = {label: [topic] if (topic := choose_topic(topics, question)) else []
+                   for label, question in BATCH_QUESTION.findall(questions) if not omit()}
+        return json.dumps(answers)
+    syllabus, _, question = prompt.partition(QUESTION_MARKER)
+    question = question.partition("--- END EXAM QUESTION ---")[0]
+    return choose_topic(MAJOR_TOPIC.findall(syllabus), question) or "None"
+
+
+class StandIn:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, error_rate=0.0, latency=0.0, jitter=0.0,
+                 seed=None, omit_rate=0.0):
+        self.quota = QuotaWindow(requests_per_minute, tokens_per_minute)
+        self.error_rate = error_rate
+        self.omit_rate = omit_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.counts = {"requests": 0, "answered": 0, "quota_errors": 0, "server_errors": 0, "prompt_tokens": 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def handle(self, prompt):
+        """Returns (status, body, headers) for one classification request."""
+        with self.lock:
+            self.counts["requests"] += 1
+            fail = self.random.random() < self.error_rate
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        wait = self.quota.admit(len(prompt) // 4)
+        if wait:
+            with self.lock:
+                self.counts["quota_errors"] += 1
+            return 429, {"error": "Resource has been exhausted (e.g. check quota)."}, {"Retry-After": f"{wait:.1f}"}
+        if fail:
+            with self.lock:
+                self.counts["server_errors"] += 1
+            return 503, {"error": "The service is currently unavailable."}, {}
+
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(delay)
+        with self.lock:
+            self.in_flight -= 1
+            self.counts["answered"] += 1
+            self.counts["prompt_tokens"] += len(prompt) // 4
+            text = answer(prompt, lambda: self.random.random() < self.omit_rate)
+        return 200, {"text": text}, {}
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, max_in_flight=self.max_in_flight)
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/classify":
+            return self.reply(404, {"error": "Not found."})
+        try:
+            prompt = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))["prompt"]
+        except (ValueError, KeyError, TypeError):
+            return self.reply(400, {"error": "Expected a JSON body with a 'prompt'."})
+        self.reply(*self.server.stand_in.handle(prompt))
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self.reply(404, {"error": "Not found."})
+        self.reply(200, self.server.stand_in.stats())
+
+    def reply(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # one line per request would drown everything else
+
+
+def start(port=0, **settings):
+    """Starts a stand-in on a background thread; returns the server (see server.server_address)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.stand_in = StandIn(**settings)
+    threading.Thread(target=server.serve_forever, name="stand-in", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rpm", type=int, help="requests allowed in any 60 seconds")
+    parser.add_argument("--tpm", type=int, help="prompt tokens allowed in any 60 seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random variation of the latency")
+    parser.add_argument("--omit-rate", type=float, default=0.0, help="share of batched questions left unanswered")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    server.stand_in = StandIn(args.rpm, args.tpm, args.error_rate, args.latency, args.jitter,
+                               omit_rate=args.omit_rate)
+    print(f"Stand-in classification API on http://127.0.0.1:{args.port}/classify (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(server.stand_in.stats()))
+
+
+if __name__ == "__main__":
+    main()
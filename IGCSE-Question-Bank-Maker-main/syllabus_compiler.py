@@ -0,0 +1,192 @@
+"""
+Compiles a syllabus (syllabi/<code>/*_syllabus.txt) into a topic tree, so
+that classification prompts can carry the list of major topics instead of
+the whole syllabus.
+
+    1 Information representation :        <- major topic
+    1.1 Data Representation               <- subtopic
+    Candidates should be able to: ...     <- detail of the subtopic above
+
+A major topic is a line starting with the next number in sequence (or one
+already seen, when a syllabus lists its contents before the details), and a
+subtopic a line starting with "<major>.<n>". Everything else is detail of
+the latest topic. Compiled trees are kept in
+extracted_questions/syllabus_index/<code>.json and rebuilt when the
+syllabus changes.
+
+    python syllabus_compiler.py [syllabi]    # prompt tokens per syllabus, before and after
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import Counter
+
+EXTRACTION_ROOT_DIR = "extracted_questions"
+INDEX_DIR = os.path.join(EXTRACTION_ROOT_DIR, "syllabus_index")
+# Bump when the tree's format or the parsing changes, so cached trees are rebuilt
+COMPILER_VERSION = 1
+
+MAJOR_TOPIC = re.compile(r"^\s*(?:Topic\s*)?(\d{1,2})[.:)]?\s+([A-Za-z][^\n]*?)\s*:?\s*$")
+SUBTOPIC = re.compile(r"^\s*(\d{1,2})\.(\d{1,2})\.?\s+(\S[^\n]*?)\s*:?\s*$")
+WORD = re.compile(r"[a-z][a-z\-]{3,}")
+# Words that say nothing about a topic
+STOPWORDS = set("""
+    able about above after also although among another answer based been being below between both candidates
+    calculate change changes could define describe different during each example explain following form forms
+    from given have including into know knowledge level more most must other over question questions same
+    should show simple some state such than that their them then there these they this those through types
+    under understand understanding using used uses what when where which while with within would
+""".split())
+KEYWORDS_PER_TOPIC = 20
+SNIPPETS_PER_QUESTION = 2
+SNIPPET_CHARACTERS = 160
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def keywords(text, count=KEYWORDS_PER_TOPIC):
+    """The words that best describe a piece of syllabus text: its most frequent uncommon ones."""
+    words = Counter(word for word in WORD.findall(text.lower()) if word not in STOPWORDS)
+    return [word for word, _ in words.most_common(count)]
+
+
+def parse_syllabus(syllabus_text):
+    """Returns the syllabus's major topics, each {"number", "name", "subtopics", "text"}, in order."""
+    topics = {}
+    current = None       # the topic or subtopic that detail lines belong to
+    for line in syllabus_text.splitlines():
+        subtopic = SUBTOPIC.match(line)
+        if subtopic and subtopic.group(1) in topics:
+            major = topics[subtopic.group(1)]
+            number = f"{subtopic.group(1)}.{subtopic.group(2)}"
+            current = next((existing for existing in major["subtopics"] if existing["number"] == number), None)
+            if current is None:
+                current = {"number": number, "name": subtopic.group(3), "text": ""}
+                major["subtopics"].append(current)
+            continue
+
+        major = MAJOR_TOPIC.match(line)
+        if major and not subtopic:
+            number, name = major.group(1), major.group(2).strip()
+            # Only the next number in sequence starts a topic; a number seen before is the same topic again
+            if int(number) == len(topics) + 1:
+                current = topics[number] = {"number": number, "name": name, "subtopics": [], "text": ""}
+                continue
+            if number in topics and topics[number]["name"].lower() == name.lower():
+                current = topics[number]
+                continue
+
+        if current is not None and line.strip():
+            current["text"] += line.strip() + "\n"
+    return list(topics.values())
+
+
+def topic_list(topics):
+    """The compact context for a prompt: one line per major topic."""
+    return "".join(f"{topic['number']} {topic['name']} :\n" for topic in topics)
+
+
+def compile_syllabus(subject_code, syllabus_text):
+    """
+    Compiles a syllabus into a dict with its major topics (each with its
+    subtopics and their keywords), the prompt context to use ("context") and
+    the estimated tokens of the full syllabus and of the context. A syllabus
+    without numbered major topics is used as it is.
+    """
+    topics = parse_syllabus(syllabus_text)
+    for topic in topics:
+        for subtopic in topic["subtopics"]:
+            subtopic["keywords"] = keywords(f"{subtopic['name']}\n{subtopic['text']}")
+        topic["keywords"] = keywords(f"{topic['name']}\n{topic['text']}" + "".join(
+            f"{subtopic['name']}\n{subtopic['text']}" for subtopic in topic["subtopics"]))
+
+    context = topic_list(topics) if topics else syllabus_text
+    # About four characters per token, as classification_engine.estimate_tokens() counts them
+    return {"subject_code": subject_code, "syllabus_hash": text_hash(syllabus_text), "version": COMPILER_VERSION,
+            "topics": topics, "context": context,
+            "full_tokens": len(syllabus_text) // 4, "context_tokens": len(context) // 4}
+
+
+# Trees already loaded in this process, by subject code
+_loaded = {}
+
+
+def load_compiled_syllabus(subject_code, syllabus_text, index_dir=INDEX_DIR):
+    """The compiled syllabus for a subject, from the index if it is up to date, compiled (and saved) otherwise."""
+    syllabus_hash = text_hash(syllabus_text)
+    compiled = _loaded.get(subject_code)
+    if compiled is not None and compiled["syllabus_hash"] == syllabus_hash:
+        return compiled
+
+    path = os.path.join(index_dir, f"{subject_code}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            compiled = json.load(f)
+    except (ValueError, OSError):
+        compiled = None
+    if compiled is None or compiled.get("syllabus_hash") != syllabus_hash or compiled.get("version") != COMPILER_VERSION:
+        compiled = compile_syllabus(subject_code, syllabus_text)
+        os.makedirs(index_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(compiled, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        print(f"  - Compiled the syllabus for {subject_code}: {len(compiled['topics'])} major topics, "
+              f"{compiled['full_tokens']} -> {compiled['context_tokens']} prompt tokens.")
+    _loaded[subject_code] = compiled
+    return compiled
+
+
+def relevant_snippets(compiled, question_text, count=SNIPPETS_PER_QUESTION):
+    """
+    The subtopics whose keywords a question uses most (at least two of them),
+    as short lines of syllabus text to show alongside the question.
+    """
+    words = set(WORD.findall(question_text.lower()))
+    scored = []
+    for topic in compiled["topics"]:
+        for subtopic in topic["subtopics"]:
+            score = len(words.intersection(subtopic["keywords"]))
+            if score >= 2:
+                scored.append((score, subtopic))
+    scored.sort(key=lambda item: -item[0])
+
+    snippets = []
+    for _, subtopic in scored[:count]:
+        detail = " ".join(subtopic["text"].split())
+        if len(detail) > SNIPPET_CHARACTERS:
+            detail = detail[:SNIPPET_CHARACTERS].rsplit(" ", 1)[0] + " ..."
+        snippets.append(f"{subtopic['number']} {subtopic['name']}" + (f": {detail}" if detail else ""))
+    return snippets
+
+
+def question_with_snippets(compiled, question_text):
+    """The question text as a prompt shows it: followed by the syllabus sections it seems to touch, if any."""
+    snippets = relevant_snippets(compiled, question_text)
+    if not snippets:
+        return question_text
+    return question_text + "\n(Possibly relevant syllabus sections: " + "; ".join(snippets) + ")"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    syllabus_root = argv[0] if argv else "syllabi"
+    print(f"{'subject':<8} | {'major topics':>12} | {'subtopics':>9} | tokens: {'full syllabus':>13} | {'topic list':>10}")
+    for subject_code in sorted(os.listdir(syllabus_root)):
+        folder = os.path.join(syllabus_root, subject_code)
+        names = [name for name in sorted(os.listdir(folder)) if name.endswith("_syllabus.txt")] if os.path.isdir(folder) else []
+        if not names:
+            continue
+        with open(os.path.join(folder, names[0]), "r", encoding="utf-8") as f:
+            compiled = compile_syllabus(subject_code, f.read())
+        subtopics = sum(len(topic["subtopics"]) for topic in compiled["topics"])
+        print(f"{subject_code:<8} | {len(compiled['topics']):>12} | {subtopics:>9} | {compiled['full_tokens']:>21} | "
+              f"{compiled['context_tokens']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Batch classification: reading a batch prompt's answer, and asking again one
+at a time about the questions an answer leaves out or garbles.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import sorting
+from classification_engine import ClassificationEngine
+from sorting import parse_batch_answer
+
+SUBJECT = "9701"
+
+
+class ParseBatchAnswerTest(unittest.TestCase):
+
+    def test_well_formed_answer(self):
+        answer = '{"Q1": ["Topic_1_Atoms", "Topic_3_Bonding"], "Q2": []}'
+        self.assertEqual(parse_batch_answer(answer, 2), {0: "Topic_1_Atoms, Topic_3_Bonding", 1: "None"})
+
+    def test_answer_wrapped_in_fence_and_prose(self):
+        answer = 'Here you go:\n```json\n{"Q1": ["Topic_2_Moles"]}\n```\nHope that helps.'
+        self.assertEqual(parse_batch_answer(answer, 1), {0: "Topic_2_Moles"})
+
+    def test_label_forms_and_string_values(self):
+        answer = '{"q1": "Topic_1_Atoms", " 2 ": "None", "Q3": ["  ", ""]}'
+        self.assertEqual(parse_batch_answer(answer, 3), {0: "Topic_1_Atoms", 1: "None", 2: "None"})
+
+    def test_missing_and_invalid_entries_are_left_out(self):
+        answer = json.dumps({"Q1": ["Topic_1_Atoms"], "Q3": 42, "Q4": [1, 2], "Q5": "  ", "Q6": None,
+                             "Q7": ["Topic_7_Equilibria"], "Q9": ["Topic_9_Out of range"], "Q0": ["Topic_0_X"],
+                             "Question 8": ["Topic_8_Bad label"]})
+        self.assertEqual(parse_batch_answer(answer, 8), {0: "Topic_1_Atoms", 6: "Topic_7_Equilibria"})
+
+    def test_unreadable_answers(self):
+        for answer in (None, "", "None", "Topic_1_Atoms", '{"Q1": ["Topic_1_Atoms"]', '["Q1"]', "{not json}"):
+            with self.subTest(answer=answer):
+                self.assertEqual(parse_batch_answer(answer, 2), {})
+
+
+class ClassifyQuestionsFallbackTest(unittest.TestCase):
+    """classify_questions() against a fake API that answers batch prompts only in part."""
+
+    def setUp(self):
+        with open(self.syllabus_path(), "r", encoding="utf-8") as f:
+            self.syllabus = f.read()
+        # The compiled syllabus index is written under the working directory
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        self.questions = [f"Question MARKER{number}: describe the bonding in water." for number in range(4)]
+        self.prompts = []
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def syllabus_path(self):
+        folder = os.path.join(ROOT, sorting.SYLLABUS_ROOT_DIR, SUBJECT)
+        return os.path.join(folder, next(name for name in os.listdir(folder) if name.endswith("_syllabus.txt")))
+
+    def classify(self, batch_answer):
+        def function(prompt):
+            self.prompts.append(prompt)
+            markers = re.findall(r"MARKER(\d)", prompt)
+            if len(markers) > 1:
+                if batch_answer is None:
+                    raise ValueError("bad request")
+                return batch_answer
+            return f"Topic_9_Single {markers[0]}"
+
+        with redirect_stdout(StringIO()), ClassificationEngine(function, requests_per_minute=None,
+                                                               tokens_per_minute=None) as engine:
+            topics = list(sorting.classify_questions(self.syllabus, self.questions, SUBJECT, engine,
+                                                     batch_size=len(self.questions), batch_tokens=10 ** 6))
+            return topics, engine.stats()
+
+    def test_left_out_and_garbled_questions_are_asked_again(self):
+        topics, stats = self.classify('{"Q1": ["Topic_1_Atoms"], "Q3": 42, "Q4": []}')
+        self.assertEqual(topics, ["Topic_1_Atoms", "Topic_9_Single 1", "Topic_9_Single 2", "None"])
+        self.assertEqual(len(self.prompts), 3)
+        self.assertEqual((stats["batches"], stats["batched_questions"], stats["batch_fallbacks"]), (1, 4, 2))
+
+    def test_complete_answer_needs_no_more_requests(self):
+        topics, stats = self.classify('{"Q1": [], "Q2": ["Topic_2_A"], "Q3": ["Topic_3_B"], "Q4": ["Topic_4_C"]}')
+        self.assertEqual(topics, ["None", "Topic_2_A", "Topic_3_B", "Topic_4_C"])
+        self.assertEqual(len(self.prompts), 1)
+        self.assertEqual(stats["batch_fallbacks"], 0)
+
+    def test_failed_batch_request_falls_back_for_every_question(self):
+        topics, stats = self.classify(None)
+        self.assertEqual(topics, [f"Topic_9_Single {number}" for number in range(4)])
+        self.assertEqual(len(self.prompts), 5)
+        self.assertEqual((stats["failed"], stats["batch_fallbacks"]), (1, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+The blob store and the view of it in sorted_questions_by_topic/: storing
+and linking PDFs, rebuilding and swapping in the view (or leaving it be),
+recovering from a swap that stopped halfway, and filings from before the
+blob store.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import blob_store
+from blob_store import BlobStore, materialise_view, recover_view
+from question_store import QuestionStore
+
+PAPER = {"name": "0620_s23_qp_41", "subject_code": "0620", "year": 2023, "season": "s", "paper": "4", "variant": "1"}
+
+
+class BlobStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.blobs = BlobStore(self.path("blobs"))
+
+    def path(self, *parts):
+        return os.path.join(self.directory.name, *parts)
+
+    def write(self, relative_path, data):
+        path = self.path(relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def stored_keys(self):
+        return sorted(name[:-len(blob_store.BLOB_SUFFIX)] for folder in os.listdir(self.blobs.root)
+                      for name in os.listdir(os.path.join(self.blobs.root, folder)))
+
+
+class BlobStoreTest(BlobStoreTestCase):
+
+    def test_same_bytes_are_stored_once(self):
+        key = self.blobs.put(self.write("a/Q1.pdf", b"%PDF-1 one"))
+        self.assertEqual(self.blobs.put(self.write("b/Q1.pdf", b"%PDF-1 one")), key)
+        other = self.blobs.put(self.write("a/Q2.pdf", b"%PDF-1 two"))
+        self.assertNotEqual(other, key)
+        self.assertEqual(self.blobs.path(key), self.path("blobs", key[:2], key + ".pdf"))
+        self.assertEqual(self.stored_keys(), sorted([key, other]))
+        self.assertEqual((self.blobs.stored, self.blobs.reused), (2, 1))
+
+    def test_blob_is_a_copy_of_the_splitters_file(self):
+        source = self.write("a/Q1.pdf", b"%PDF-1 one")
+        key = self.blobs.put(source)
+        # The splitter rewrites its files in place
+        self.write("a/Q1.pdf", b"%PDF-1 rewritten")
+        with open(self.blobs.path(key), "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1 one")
+
+    def test_link_replaces_the_destination_once(self):
+        key = self.blobs.put(self.write("a/Q1.pdf", b"%PDF-1 one"))
+        destination = self.write("view/Topic_1/Q1.pdf", b"an old copy")
+        self.assertTrue(self.blobs.link(key, destination))
+        self.assertTrue(os.path.samefile(destination, self.blobs.path(key)))
+        self.assertFalse(self.blobs.link(key, destination))
+        self.assertEqual(sum(self.blobs.links.values()), 1)
+        self.assertFalse(os.path.exists(destination + ".tmp"))
+
+    def test_prune_keeps_only_the_given_keys(self):
+        keep = self.blobs.put(self.write("a/Q1.pdf", b"%PDF-1 one"))
+        self.blobs.put(self.write("a/Q2.pdf", b"%PDF-1 two"))
+        self.assertEqual(self.blobs.prune({keep}), 1)
+        self.assertEqual(self.stored_keys(), [keep])
+        self.assertEqual(BlobStore(self.path("missing")).prune(set()), 0)
+
+
+class ViewTest(BlobStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.root = self.path("view")
+        self.store = QuestionStore(":memory:")
+        self.addCleanup(self.store.close)
+        files = [self.write(f"extracted/Q{number}.pdf", f"%PDF-1 question {number}".encode()) for number in (1, 2)]
+        self.store.upsert_paper(PAPER, [{"question": number, "file_path": path, "text": f"Question {number}"}
+                                        for number, path in zip((1, 2), files)])
+        self.ids = {row["question"]: row["id"] for row in self.store.questions()}
+        self.file_paths = dict(zip((1, 2), files))
+
+    def file(self, number, topics):
+        """Files question `number` under `topics` the way the sorter does."""
+        key = self.blobs.put(self.file_paths[number])
+        self.store.set_topics(self.ids[number], [(topic, f"sorted/0620/{topic}/{PAPER['name']}_Q{number}.pdf")
+                                                 for topic in topics], key)
+        return key
+
+    def view_files(self):
+        return sorted(os.path.relpath(os.path.join(folder, name), self.root)
+                      for folder, _, names in os.walk(self.root) for name in names
+                      if name != blob_store.VIEW_STATE_NAME)
+
+    def materialise(self):
+        return materialise_view(self.store, self.blobs, self.root)
+
+    def test_view_links_every_filing_to_one_blob(self):
+        key = self.file(1, ["Topic_1_Atoms", "Topic_2_Bonding"])
+        self.file(2, ["Topic_2_Bonding"])
+        self.assertEqual(self.materialise(), {"files": 3, "blobs": 2, "pruned": 0, "rebuilt": True})
+        self.assertEqual(self.view_files(), [os.path.join("0620", "Topic_1_Atoms", "0620_s23_qp_41_Q1.pdf"),
+                                             os.path.join("0620", "Topic_2_Bonding", "0620_s23_qp_41_Q1.pdf"),
+                                             os.path.join("0620", "Topic_2_Bonding", "0620_s23_qp_41_Q2.pdf")])
+        for topic in ("Topic_1_Atoms", "Topic_2_Bonding"):
+            self.assertTrue(os.path.samefile(os.path.join(self.root, "0620", topic, "0620_s23_qp_41_Q1.pdf"),
+                                             self.blobs.path(key)))
+        self.assertFalse(os.path.exists(self.root + blob_store.NEW_VIEW_SUFFIX))
+        self.assertFalse(os.path.exists(self.root + blob_store.OLD_VIEW_SUFFIX))
+
+    def test_unchanged_filings_leave_the_view_alone(self):
+        self.file(1, ["Topic_1_Atoms"])
+        self.materialise()
+        self.assertEqual(self.materialise(), {"files": 1, "blobs": 1, "pruned": 0, "rebuilt": False})
+        # A file deleted from the view by hand is put back
+        os.remove(os.path.join(self.root, "0620", "Topic_1_Atoms", "0620_s23_qp_41_Q1.pdf"))
+        self.assertTrue(self.materialise()["rebuilt"])
+        self.assertEqual(len(self.view_files()), 1)
+
+    def test_refiled_question_moves_and_unused_blobs_are_pruned(self):
+        self.file(1, ["Topic_1_Atoms"])
+        self.file(2, ["Topic_1_Atoms"])
+        self.materialise()
+        # Q1 is regrouped and Q2 is no longer filed anywhere
+        key = self.file(1, ["Topic_3_Stoichiometry"])
+        self.store.set_topics(self.ids[2], [])
+        self.assertEqual(self.materialise(), {"files": 1, "blobs": 1, "pruned": 1, "rebuilt": True})
+        self.assertEqual(self.view_files(), [os.path.join("0620", "Topic_3_Stoichiometry", "0620_s23_qp_41_Q1.pdf")])
+        self.assertEqual(self.stored_keys(), [key])
+
+    def test_filings_from_before_the_blob_store_are_stored(self):
+        # An older sorter copied each PDF into its topic folder and recorded no blob
+        sorted_path = self.write("sorted/0620/Topic_1_Atoms/0620_s23_qp_41_Q1.pdf", b"%PDF-1 sorted copy")
+        self.store.set_topics(self.ids[1], [("Topic_1_Atoms", sorted_path)])
+        # Neither its sorted copy nor the splitter's file is left
+        self.store.set_topics(self.ids[2], [("Topic_1_Atoms", self.path("sorted", "gone.pdf"))])
+        os.remove(self.file_paths[2])
+        self.assertEqual(self.materialise(), {"files": 1, "blobs": 1, "pruned": 0, "rebuilt": True})
+        blob = self.store.filings(self.ids[1])[0][2]
+        with open(self.blobs.path(blob), "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1 sorted copy")
+        self.assertIsNone(self.store.filings(self.ids[2])[0][2])
+
+    def test_missing_blob_is_stored_again(self):
+        key = self.file(1, ["Topic_1_Atoms"])
+        self.materialise()
+        os.remove(self.blobs.path(key))
+        os.remove(os.path.join(self.root, "0620", "Topic_1_Atoms", "0620_s23_qp_41_Q1.pdf"))
+        self.assertTrue(self.materialise()["rebuilt"])
+        self.assertTrue(os.path.exists(self.blobs.path(key)))
+
+
+class RecoverViewTest(BlobStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.root = self.path("view")
+        self.old_root = self.root + blob_store.OLD_VIEW_SUFFIX
+
+    def test_previous_view_is_put_back(self):
+        # Stopped between moving the old view aside and moving the new one in
+        self.write(os.path.join("view.old", "0620", "Q1.pdf"), b"%PDF-1 one")
+        recover_view(self.root)
+        self.assertTrue(os.path.isfile(os.path.join(self.root, "0620", "Q1.pdf")))
+        self.assertFalse(os.path.exists(self.old_root))
+
+    def test_swapped_in_view_is_kept(self):
+        # Stopped before removing the old view
+        self.write(os.path.join("view", "0620", "Q1.pdf"), b"%PDF-1 new")
+        self.write(os.path.join("view.old", "0620", "Q1.pdf"), b"%PDF-1 old")
+        recover_view(self.root)
+        with open(os.path.join(self.root, "0620", "Q1.pdf"), "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1 new")
+        self.assertFalse(os.path.exists(self.old_root))
+
+    def test_half_built_view_is_discarded(self):
+        store = QuestionStore(":memory:")
+        self.addCleanup(store.close)
+        self.write(os.path.join("view.new", "0620", "stale.pdf"), b"%PDF-1 stale")
+        self.assertEqual(materialise_view(store, self.blobs, self.root),
+                         {"files": 0, "blobs": 0, "pruned": 0, "rebuilt": True})
+        self.assertEqual(os.listdir(self.root), [blob_store.VIEW_STATE_NAME])
+        self.assertFalse(os.path.exists(self.root + blob_store.NEW_VIEW_SUFFIX))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+The classification cache: what a question is looked up by, what invalidates
+it, and pruning by age and by least recent use.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import classification_cache
+from classification_cache import ClassificationCache
+
+SYLLABUS = "1 States of matter\n2 Atoms, elements and compounds\n"
+QUESTION = "Describe the arrangement of particles in a solid."
+DAY = 86400
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+class ClassificationCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(classification_cache, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "classifications.db")
+
+    def open(self, model="model-a", prompt_version=1, **limits):
+        cache = ClassificationCache(model, prompt_version, self.path, **limits)
+        self.addCleanup(cache.connection.close)
+        return cache
+
+    def test_hit_after_put_and_across_runs(self):
+        with self.open() as cache:
+            self.assertIsNone(cache.get("0620", SYLLABUS, QUESTION))
+            cache.put("0620", SYLLABUS, QUESTION, "Topic_1_States_of_matter")
+            self.assertEqual(cache.get("0620", SYLLABUS, QUESTION), "Topic_1_States_of_matter")
+            self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5, "stored": 1,
+                                             "invalidated": 0, "evicted": 0})
+        with self.open() as cache:
+            self.assertEqual(cache.get("0620", SYLLABUS, QUESTION), "Topic_1_States_of_matter")
+
+    def test_key_ignores_whitespace_and_unicode_forms(self):
+        cache = self.open()
+        cache.put("0620", SYLLABUS, QUESTION, "Topic_1_States_of_matter")
+        self.assertEqual(cache.get("0620", SYLLABUS, "  Describe the arrangement\nof particles in a   solid. "),
+                         "Topic_1_States_of_matter")
+        # NFKC folds compatibility characters, e.g. the "ﬁ" ligature and full-width letters
+        cache.put("0620", SYLLABUS, "Define the ﬁrst ionisation energy of Ｎａ.", "Topic_2_Atoms")
+        self.assertEqual(cache.get("0620", SYLLABUS, "Define the first ionisation energy of Na."), "Topic_2_Atoms")
+        self.assertIsNone(cache.get("0620", SYLLABUS, QUESTION.lower()))
+
+    def test_subject_syllabus_model_and_prompt_are_part_of_the_key(self):
+        self.open().put("0620", SYLLABUS, QUESTION, "Topic_1_States_of_matter")
+        self.assertIsNone(self.open().get("0971", SYLLABUS, QUESTION))
+        self.assertIsNone(self.open().get("0620", SYLLABUS + "3 Stoichiometry\n", QUESTION))
+        self.assertIsNone(self.open(model="model-b").get("0620", SYLLABUS, QUESTION))
+        self.assertIsNone(self.open(prompt_version=2).get("0620", SYLLABUS, QUESTION))
+
+    def test_changed_syllabus_discards_the_subjects_old_classifications(self):
+        cache = self.open()
+        cache.put("0620", SYLLABUS, QUESTION, "Topic_1_States_of_matter")
+        cache.put("0620", SYLLABUS, "Name an element.", "Topic_2_Atoms")
+        cache.put("0610", SYLLABUS, QUESTION, "Topic_1_Characteristics")
+        self.assertEqual(cache.check_syllabus("0620", SYLLABUS), 0)
+        with redirect_stdout(StringIO()) as output:
+            self.assertEqual(cache.check_syllabus("0620", SYLLABUS + "3 Stoichiometry\n"), 2)
+        self.assertIn("0620 has changed: 2 cached classifications discarded", output.getvalue())
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get("0610", SYLLABUS, QUESTION), "Topic_1_Characteristics")
+        self.assertEqual(cache.stats()["invalidated"], 2)
+
+    def test_old_classifications_expire(self):
+        cache = self.open(max_age_days=30)
+        cache.put("0620", SYLLABUS, QUESTION, "Topic_1_States_of_matter")
+        self.clock.now += 29 * DAY
+        self.assertIsNotNone(cache.get("0620", SYLLABUS, QUESTION))
+        # Age counts from when it was classified, not from when it was last used
+        self.clock.now += 2 * DAY
+        self.assertIsNone(cache.get("0620", SYLLABUS, QUESTION))
+        cache.prune()
+        self.assertEqual((len(cache), cache.stats()["evicted"]), (0, 1))
+
+    def test_least_recently_used_are_evicted_beyond_the_limit(self):
+        cache = self.open(max_entries=2)
+        for number in range(3):
+            self.clock.now += 1
+            cache.put("0620", SYLLABUS, f"Question {number}", f"Topic_{number}")
+        # Question 0 is the oldest, but used since: question 1 goes
+        self.clock.now += 1
+        cache.get("0620", SYLLABUS, "Question 0")
+        cache.close()
+        cache = self.open(max_entries=None)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("0620", SYLLABUS, "Question 1"))
+        self.assertEqual(cache.get("0620", SYLLABUS, "Question 0"), "Topic_0")
+
+    def test_limits_from_the_environment(self):
+        environment = {classification_cache.MAX_ENTRIES_ENV: "5", classification_cache.MAX_AGE_ENV: "1.5"}
+        with mock.patch.dict(os.environ, environment):
+            cache = ClassificationCache.from_environment("model-a", 1, self.path)
+        self.addCleanup(cache.connection.close)
+        self.assertEqual((cache.max_entries, cache.max_age_days), (5, 1.5))
+        with mock.patch.dict(os.environ, {}, clear=True):
+            cache = ClassificationCache.from_environment("model-a", 1, self.path)
+        self.addCleanup(cache.connection.close)
+        self.assertEqual((cache.max_entries, cache.max_age_days), (classification_cache.DEFAULT_MAX_ENTRIES, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
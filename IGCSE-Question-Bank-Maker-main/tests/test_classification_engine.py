@@ -0,0 +1,173 @@
+"""
+Rate limiting, retries and the circuit breaker in classification_engine.py,
+on a fake clock so no test waits.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import classification_engine
+from classification_engine import CircuitBreaker, CircuitOpenError, ClassificationEngine, TokenBucket
+
+OVERSLEEP = 1e-9
+
+
+class FakeClock:
+    """
+    Stands in for the time module: sleep() moves monotonic() on at once, a
+    little past the time asked for, as a real sleep returns (a sleep shorter
+    than the clock's resolution would otherwise leave it where it was).
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds + OVERSLEEP
+
+
+class FakeClockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(classification_engine, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TokenBucketTest(FakeClockTest):
+
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(600)
+        self.assertEqual(bucket.capacity, 60)
+        self.assertEqual(bucket.acquire(60), 0)
+        # 540 a minute refill the rest of the budget: 9 a second
+        self.assertAlmostEqual(bucket.acquire(9), 1.0)
+        self.clock.now += 3600
+        # Never more than a full bucket, however long it was left
+        self.assertEqual(bucket.acquire(60), 0)
+        self.assertGreater(bucket.acquire(1), 0)
+
+    def test_request_bigger_than_burst_is_charged_in_full(self):
+        bucket = TokenBucket(600)
+        self.assertEqual(bucket.acquire(300), 0)
+        # 240 in debt: the next unit waits for 241 to refill
+        self.assertAlmostEqual(bucket.acquire(1), 241 / 9)
+
+    def test_never_more_than_per_minute(self):
+        for amounts in ([1] * 500, [25, 70, 5, 200, 1] * 40, [1000] * 10):
+            with self.subTest(amounts=amounts[:5]):
+                bucket = TokenBucket(600)
+                start = self.clock.now
+                taken = []
+                for amount in amounts:
+                    bucket.acquire(amount)
+                    taken.append((self.clock.now, amount))
+                # Every 60-second window, wherever it starts
+                for first, (at, _) in enumerate(taken):
+                    in_window = sum(amount for when, amount in taken[first:] if when < at + 60)
+                    # A request bigger than the burst can overshoot the window it starts in by its excess
+                    allowance = 600 + max(0, max(amounts) - bucket.capacity)
+                    self.assertLessEqual(in_window, allowance)
+                total = sum(amounts)
+                self.assertGreaterEqual(self.clock.now - start, (total - 600 - max(amounts)) / 600 * 60)
+
+
+class CircuitBreakerTest(FakeClockTest):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        breaker.record_success()
+        # A success in between starts the count again
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.trips, 1)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_half_open_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+        breaker.record_failure()
+        self.clock.now += 9.9
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        self.clock.now += 0.1
+        breaker.before_call()
+        # Only one trial at a time
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        # A failed trial opens the circuit for another reset_seconds
+        breaker.record_failure()
+        self.assertEqual(breaker.trips, 2)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        self.clock.now += 10
+        breaker.before_call()
+        breaker.record_success()
+        breaker.before_call()
+        breaker.before_call()
+
+
+class EngineRetryTest(FakeClockTest):
+
+    def engine(self, answers, **options):
+        answers = list(answers)
+        self.calls = 0
+
+        def function(prompt):
+            self.calls += 1
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        engine = ClassificationEngine(function, requests_per_minute=None, tokens_per_minute=None, **options)
+        self.addCleanup(engine.close)
+        return engine
+
+    def test_retryable_errors_are_retried(self):
+        engine = self.engine([ConnectionError(), TimeoutError(), "Topic_1_Atoms"])
+        self.assertEqual(engine.call("prompt"), "Topic_1_Atoms")
+        self.assertEqual(self.calls, 3)
+        stats = engine.stats()
+        self.assertEqual((stats["requests"], stats["retries"], stats["succeeded"]), (3, 2, 1))
+
+    def test_other_errors_are_not_retried_or_counted_against_the_api(self):
+        engine = self.engine([ValueError("bad request"), "Topic_1_Atoms"],
+                             breaker=CircuitBreaker(failure_threshold=1))
+        with redirect_stdout(StringIO()):
+            self.assertIsNone(engine.classify("prompt"))
+        self.assertEqual(engine.stats()["failed"], 1)
+        self.assertEqual(engine.call("prompt"), "Topic_1_Atoms")
+
+    def test_open_circuit_rejects_without_calling(self):
+        engine = self.engine([ConnectionError()] * 2, max_retries=1,
+                             breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+        with self.assertRaises(ConnectionError):
+            engine.call("prompt")
+        with self.assertRaises(CircuitOpenError):
+            engine.call("prompt")
+        self.assertEqual(self.calls, 2)
+        stats = engine.stats()
+        self.assertEqual((stats["rejected"], stats["breaker_trips"]), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+The NumPy box masks in geometry.py against fitz.Rect's own tests.
+
+    python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import geometry
+
+
+def random_rect(rng):
+    # Coarse coordinates, so edges often coincide; some rects inverted or empty
+    x0, y0, x1, y1 = (rng.randrange(-2, 12) * 10.0 for _ in range(4))
+    return x0, y0, x1, y1
+
+
+class GeometryTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(6)
+        self.rects = [random_rect(rng) for _ in range(400)] + [tuple(fitz.INFINITE_RECT()), (0, 0, 0, 0)]
+        self.boxes = geometry.as_boxes(self.rects)
+        self.queries = [random_rect(rng) for _ in range(200)] + [tuple(fitz.INFINITE_RECT()), (10, 10, 10, 50)]
+
+    def test_as_boxes(self):
+        self.assertEqual(self.boxes.shape, (len(self.rects), 4))
+        self.assertEqual(geometry.as_boxes([]).shape, (0, 4))
+        spans = [{"bbox": (1, 2, 3, 4)}, {"bbox": (5, 6, 7, 8)}]
+        self.assertEqual(geometry.as_boxes(spans, lambda span: span["bbox"]).tolist(), [[1, 2, 3, 4], [5, 6, 7, 8]])
+
+    def test_intersects_matches_fitz(self):
+        for query in self.queries:
+            expected = [fitz.Rect(rect).intersects(query) for rect in self.rects]
+            self.assertEqual(geometry.intersects(self.boxes, query).tolist(), expected, query)
+
+    def test_contained_matches_fitz(self):
+        for query in self.queries:
+            expected = [fitz.Rect(rect) in fitz.Rect(query) for rect in self.rects]
+            self.assertEqual(geometry.contained(self.boxes, query).tolist(), expected, query)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+The local classifier: TF-IDF scores and margins of TopicModel.predict, the
+thresholds that decide what is assigned locally, and switching it off.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import local_classifier
+from local_classifier import LocalClassifier, TopicModel, stem, topic_label, topic_numbers
+from syllabus_compiler import compile_syllabus
+
+SYLLABUS = """\
+1 Cells :
+1.1 Cell structure
+Describe the nucleus, cytoplasm, cell membrane, mitochondria and ribosomes of animal cells.
+2 Enzymes :
+2.1 Enzyme action
+Enzymes are proteins that catalyse reactions; explain the effect of temperature and pH on enzymes.
+3 Transport in plants :
+3.1 Xylem and phloem
+Describe the transport of water through xylem and of sucrose through phloem in plants.
+"""
+CELLS = "Name the part of an animal cell that contains the nucleus and the mitochondria."
+ENZYMES = "Explain the effect of temperature on enzymes."
+UNRELATED = "Calculate the speed of the trolley."
+
+
+class TopicModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model = TopicModel(compile_syllabus("0610", SYLLABUS))
+
+    def test_labels_match_the_api(self):
+        self.assertEqual(self.model.labels, ["Topic_1_Cells", "Topic_2_Enzymes", "Topic_3_Transport in plants"])
+        self.assertEqual(topic_label({"number": "6", "name": "Security, privacy & data integrity"}),
+                         "Topic_6_Security privacy data integrity")
+        self.assertEqual(topic_numbers("Topic_1_Cells, Topic_3_Transport in plants"), {"1", "3"})
+        self.assertEqual(topic_numbers(None), set())
+
+    def test_stems(self):
+        self.assertEqual(stem("reactions"), stem("reaction"))
+        self.assertEqual(stem("heating"), "heat")
+        # Too short to stem, or a double s
+        self.assertEqual(stem("uses"), "uses")
+        self.assertEqual(stem("mass"), "mass")
+
+    def test_best_topic_scores_and_margins(self):
+        best, scores, margins = self.model.predict([CELLS, ENZYMES, UNRELATED])
+        self.assertEqual(best[:2].tolist(), [0, 1])
+        all_scores = self.model.scores([CELLS, ENZYMES, UNRELATED])
+        for row in range(2):
+            ranked = np.sort(all_scores[row])[::-1]
+            self.assertAlmostEqual(scores[row], ranked[0])
+            self.assertAlmostEqual(margins[row], (ranked[0] - ranked[1]) / ranked[0])
+            self.assertGreater(margins[row], 0)
+        # No words in common with any topic: no score and no margin
+        self.assertEqual((scores[2], margins[2]), (0, 0))
+
+    def test_question_matching_one_topic_only_has_full_margin(self):
+        best, scores, margins = self.model.predict(["xylem phloem"])
+        self.assertEqual(best.tolist(), [2])
+        self.assertAlmostEqual(margins[0], 1.0)
+
+    def test_tied_topics_have_no_margin(self):
+        # "describe" appears in topics 1 and 3 alone and equally often
+        scores = self.model.scores(["describe"])[0]
+        self.assertAlmostEqual(scores[0], scores[2])
+        self.assertAlmostEqual(self.model.predict(["describe"])[2][0], 0.0)
+
+    def test_scores_are_the_same_in_chunks(self):
+        texts = [CELLS, ENZYMES, UNRELATED, "pH", "sucrose in phloem"]
+        whole = self.model.scores(texts)
+        with mock.patch.object(local_classifier, "CHUNK_SIZE", 2):
+            np.testing.assert_allclose(self.model.scores(texts), whole)
+        self.assertEqual(self.model.scores([]).shape, (0, 3))
+
+    def test_syllabus_with_one_or_no_topics(self):
+        single = TopicModel(compile_syllabus("0610", "1 Cells :\nThe nucleus and cytoplasm.\n"))
+        best, scores, margins = single.predict(["Describe the nucleus.", UNRELATED])
+        self.assertEqual(best.tolist(), [0, 0])
+        self.assertEqual(margins.tolist(), [1.0, 0.0])
+
+        empty = TopicModel(compile_syllabus("0610", "Biology\n"))
+        best, scores, margins = empty.predict([CELLS, ENZYMES])
+        self.assertEqual((best.tolist(), scores.tolist(), margins.tolist()), ([0, 0], [0, 0], [0, 0]))
+
+
+class LocalClassifierTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(local_classifier, "load_compiled_syllabus", side_effect=compile_syllabus)
+        self.load = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_confident_questions_are_assigned_and_the_rest_escalated(self):
+        classifier = LocalClassifier(min_confidence=0.5)
+        self.assertEqual(classifier.classify("0610", SYLLABUS, ["xylem phloem", "describe", UNRELATED]),
+                         ["Topic_3_Transport in plants", None, None])
+        self.assertEqual(classifier.stats(), {"assigned": 1, "escalated": 2, "assigned_share": 0.333})
+
+    def test_thresholds(self):
+        margin = TopicModel(compile_syllabus("0610", SYLLABUS)).predict([ENZYMES])[2][0]
+        self.assertEqual(LocalClassifier(min_confidence=margin).classify("0610", SYLLABUS, [ENZYMES]),
+                         ["Topic_2_Enzymes"])
+        self.assertEqual(LocalClassifier(min_confidence=margin + 0.01).classify("0610", SYLLABUS, [ENZYMES]),
+                         [None])
+        self.assertEqual(LocalClassifier(min_confidence=0.0, min_score=1.01).classify("0610", SYLLABUS, [ENZYMES]),
+                         [None])
+
+    def test_switched_off(self):
+        classifier = LocalClassifier(min_confidence=None)
+        self.assertEqual(classifier.classify("0610", SYLLABUS, ["xylem phloem", ENZYMES]), [None, None])
+        self.load.assert_not_called()
+        self.assertEqual(classifier.stats(), {"assigned": 0, "escalated": 0, "assigned_share": None})
+
+    def test_from_environment(self):
+        for value, expected in (("off", None), ("OFF", None), ("0.8", 0.8),
+                                ("", local_classifier.DEFAULT_MIN_CONFIDENCE)):
+            with self.subTest(value=value), mock.patch.dict(os.environ, {local_classifier.CONFIDENCE_ENV: value}):
+                self.assertEqual(LocalClassifier.from_environment().min_confidence, expected)
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(LocalClassifier.from_environment().min_confidence, local_classifier.DEFAULT_MIN_CONFIDENCE)
+
+    def test_model_is_rebuilt_when_the_syllabus_changes(self):
+        classifier = LocalClassifier()
+        model = classifier.model("0610", SYLLABUS)
+        self.assertIs(classifier.model("0610", SYLLABUS), model)
+        changed = classifier.model("0610", SYLLABUS + "4 Nutrition :\nStarch and glucose.\n")
+        self.assertEqual(len(changed.topics), 4)
+        self.assertEqual(self.load.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
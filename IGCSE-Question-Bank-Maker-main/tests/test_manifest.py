@@ -0,0 +1,201 @@
+"""
+The manifest that lets re-runs skip unchanged papers, and the splitter's use
+of it: which papers are skipped, which are split again, and which failures
+are remembered.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout
+from io import StringIO
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import splitter
+from manifest import Manifest
+from question_store import QuestionStore
+
+SETTINGS = {"border": 50, "padding": 10, "sidecars": 1, "layout": False}
+
+
+class TempFolderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        # The manifest lives under the working directory
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class ManifestTest(TempFolderTest):
+
+    def setUp(self):
+        super().setUp()
+        self.paper = self.write("papers/0620_s23_qp_41.pdf", b"%PDF-1.7 paper")
+        self.output = self.write("extracted_questions/0620/0620_s23_qp_41/Q1.pdf", b"%PDF-1.7 Q1")
+
+    def test_recorded_paper_is_current(self):
+        manifest = Manifest()
+        self.assertFalse(manifest.is_current(self.paper, SETTINGS))
+        manifest.record(self.paper, SETTINGS, [self.output])
+        self.assertTrue(manifest.is_current(self.paper, SETTINGS))
+        self.assertIsNone(manifest.error(self.paper))
+
+    def test_changed_settings_or_missing_outputs_invalidate(self):
+        manifest = Manifest()
+        manifest.record(self.paper, SETTINGS, [self.output])
+        self.assertFalse(manifest.is_current(self.paper, dict(SETTINGS, padding=20)))
+        os.remove(self.output)
+        self.assertFalse(manifest.is_current(self.paper, SETTINGS))
+
+    def test_changed_content_invalidates(self):
+        manifest = Manifest()
+        manifest.record(self.paper, SETTINGS, [self.output])
+        stat = os.stat(self.paper)
+        # Same size, new bytes
+        self.write(self.paper, b"%PDF-1.7 PAPER")
+        os.utime(self.paper, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertFalse(self.fresh(manifest).is_current(self.paper, SETTINGS))
+
+    def test_same_bytes_under_a_new_timestamp_are_current(self):
+        manifest = Manifest()
+        manifest.record(self.paper, SETTINGS, [self.output])
+        stat = os.stat(self.paper)
+        os.utime(self.paper, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        manifest = self.fresh(manifest)
+        self.assertTrue(manifest.is_current(self.paper, SETTINGS))
+        # The new timestamp is remembered, so the file is not hashed again next time
+        self.assertEqual(manifest.entries[os.path.normpath(self.paper)]["mtime_ns"], stat.st_mtime_ns + 10 ** 9)
+
+    def test_saved_manifest_reads_back(self):
+        manifest = Manifest()
+        manifest.record(self.paper, SETTINGS, [self.output])
+        other = self.write("papers/0620_s23_qp_42.pdf", b"%PDF-1.7 broken")
+        manifest.record(other, SETTINGS, [], error="Could not load all questions in order")
+        manifest.save()
+        manifest = Manifest()
+        self.assertTrue(manifest.is_current(self.paper, SETTINGS))
+        self.assertTrue(manifest.is_current(other, SETTINGS))
+        self.assertEqual(manifest.error(other), "Could not load all questions in order")
+
+    def test_unreadable_manifest_starts_afresh(self):
+        self.write(os.path.join("extracted_questions", "manifest.json"), b'{"papers": {')
+        with redirect_stdout(StringIO()) as output:
+            manifest = Manifest()
+        self.assertEqual(manifest.entries, {})
+        self.assertIn("starting a new one", output.getvalue())
+
+    @staticmethod
+    def fresh(manifest):
+        """The manifest as the next run reads it (with no hashes remembered from this one)."""
+        manifest.save()
+        return Manifest()
+
+
+class SplitterSkipTest(TempFolderTest):
+    """Split.find_papers() and record_error() against a manifest and an in-memory question database."""
+
+    def setUp(self):
+        super().setUp()
+        self.store = QuestionStore(":memory:")
+        self.papers = [self.write(f"papers/0620_s23_qp_4{variant}.pdf", f"%PDF-1.7 paper {variant}".encode("ascii"))
+                       for variant in (1, 2, 3)]
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def split(self, retry_failed=False):
+        split = splitter.Split(store=self.store, retry_failed=retry_failed)
+        with redirect_stdout(StringIO()):
+            split.find_papers(self.papers, crawl=False)
+        return split
+
+    def record_split(self, split, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        output = self.write(f"extracted_questions/0620/{name}/Q1.pdf", b"%PDF-1.7 Q1")
+        split.record_result({"path": path, "outputs": [output],
+                             "paper": {"name": name, "subject_code": "0620", "year": 2023},
+                             "question_files": [{"question": 1, "file_path": output, "text": "Question 1"}]})
+
+    def record_error(self, split, path, error):
+        with redirect_stdout(StringIO()):
+            split.record_error(path, error)
+        split.manifest.save()
+
+    def test_split_papers_are_skipped(self):
+        split = self.split()
+        self.assertEqual(split.paths, self.papers)
+        self.record_split(split, self.papers[0])
+        split.manifest.save()
+        split = self.split()
+        self.assertEqual((split.paths, split.skipped), (self.papers[1:], self.papers[:1]))
+
+    def test_paper_missing_from_the_database_is_split_again(self):
+        split = self.split()
+        self.record_split(split, self.papers[0])
+        split.manifest.save()
+        self.store.connection.execute("DELETE FROM questions")
+        self.assertEqual(self.split().paths, self.papers)
+
+    def test_broken_papers_are_remembered(self):
+        split = self.split()
+        self.record_error(split, self.papers[0], ValueError("Could not load all questions in order"))
+        self.record_error(split, self.papers[1], fitz.FileDataError("Failed to open file"))
+        split = self.split()
+        self.assertEqual((split.paths, split.skipped), (self.papers[2:], self.papers[:2]))
+        self.assertEqual(split.manifest.error(self.papers[0]), "Could not load all questions in order")
+
+    def test_retry_failed_tries_broken_papers_again(self):
+        split = self.split()
+        self.record_error(split, self.papers[0], ValueError("Could not load all questions in order"))
+        self.assertEqual(self.split(retry_failed=True).paths, self.papers)
+        os.environ[splitter.RETRY_FAILED_ENV] = "1"
+        try:
+            self.assertEqual(self.split(retry_failed=None).paths, self.papers)
+        finally:
+            del os.environ[splitter.RETRY_FAILED_ENV]
+
+    def test_changed_broken_paper_is_tried_again(self):
+        split = self.split()
+        self.record_error(split, self.papers[0], ValueError("Could not load all questions in order"))
+        self.write(self.papers[0], b"%PDF-1.7 paper 1, fixed")
+        self.assertEqual(self.split().paths, self.papers)
+
+    def test_transient_errors_are_not_remembered(self):
+        split = self.split()
+        for path, error in zip(self.papers, (BrokenProcessPool("A worker was killed"),
+                                             OSError(28, "No space left on device"), MemoryError())):
+            self.record_error(split, path, error)
+        self.assertEqual(len(split.errors), 3)
+        self.assertEqual(self.split().paths, self.papers)
+
+
+class RemoveOutputsTest(TempFolderTest):
+
+    def test_only_question_files_and_sidecars_go(self):
+        folder = "extracted_questions/0620/0620_s23_qp_41"
+        names = ["Q1.pdf", "Q1.txt", "Q1.layout.json", "Q12.pdf", "notes.txt", "Q1.pdf.bak", "QA.pdf"]
+        for name in names:
+            self.write(os.path.join(folder, name), b"")
+        splitter.remove_outputs(folder)
+        self.assertEqual(sorted(os.listdir(folder)), ["Q1.pdf.bak", "QA.pdf", "notes.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+AhoCorasick and PageClassifier against a brute-force substring search for
+every phrase, plus normalisation and the title rule.
+
+    python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from page_classifier import AhoCorasick, PageClassifier, normalise
+from splitter import BLANK_PAGE_CLASSIFIER
+
+# A small alphabet, so phrases overlap, share prefixes and are suffixes of one another
+ALPHABET = "ab. "
+
+
+def random_text(rng, longest):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, longest)))
+
+
+def random_phrases(rng, count):
+    return list(dict.fromkeys(text for text in (random_text(rng, 5) for _ in range(count)) if text))
+
+
+def brute_force_classify(phrases, title_phrases, text):
+    text = normalise(text)
+    for phrase in phrases:
+        if normalise(phrase) in text:
+            return f"phrase: {phrase}"
+    for phrase in title_phrases:
+        if normalise(phrase) in text and normalise(phrase) + "." not in text:
+            return f"title: {phrase}"
+    return None
+
+
+class AhoCorasickTest(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(8)
+        for count in (1, 2, 5, 20, 60):
+            for _ in range(20):
+                phrases = random_phrases(rng, count)
+                automaton = AhoCorasick(phrases)
+                for text in (random_text(rng, 40) for _ in range(20)):
+                    with self.subTest(phrases=phrases, text=text):
+                        self.assertEqual(automaton.find(text), {phrase for phrase in phrases if phrase in text})
+
+    def test_overlapping_and_suffix_phrases(self):
+        automaton = AhoCorasick(["he", "she", "his", "hers"])
+        self.assertEqual(automaton.find("ushers"), {"he", "she", "hers"})
+        self.assertEqual(automaton.find("ahishe"), {"his", "he", "she"})
+        automaton = AhoCorasick(["a", "aa", "aaa", "ab"])
+        self.assertEqual(automaton.find("aaab"), {"a", "aa", "aaa", "ab"})
+        self.assertEqual(automaton.find("ba"), {"a"})
+        # A phrase that is a prefix of another found only when the text ends early
+        self.assertEqual(AhoCorasick(["page", "pages"]).find("blank pag"), set())
+
+    def test_no_phrases(self):
+        self.assertEqual(AhoCorasick([]).find("anything"), set())
+
+
+class PageClassifierTest(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(80)
+        for _ in range(300):
+            phrases, title_phrases = random_phrases(rng, rng.randint(0, 6)), random_phrases(rng, rng.randint(0, 4))
+            classifier = PageClassifier(phrases, title_phrases=title_phrases)
+            for text in (random_text(rng, 30) for _ in range(10)):
+                with self.subTest(phrases=phrases, titles=title_phrases, text=text):
+                    self.assertEqual(classifier.classify(text), brute_force_classify(phrases, title_phrases, text))
+
+    def test_normalisation(self):
+        classifier = PageClassifier(["Mathematical Formulae", "BLANK PAGE"])
+        # Case, line breaks and runs of spaces
+        self.assertEqual(classifier.classify("LIST OF\nmathematical   formulae\n"), "phrase: Mathematical Formulae")
+        self.assertEqual(classifier.classify("blank\npage"), "phrase: BLANK PAGE")
+        # NFKC: the "fi" ligature, full-width letters and a no-break space
+        self.assertEqual(PageClassifier(["Specific guidance"]).classify("Speciﬁc\u00a0ＧＵＩＤＡＮＣＥ"),
+                         "phrase: Specific guidance")
+        self.assertIsNone(classifier.classify("Mathematical Formula"))
+
+    def test_first_phrase_in_list_order_is_reported(self):
+        classifier = PageClassifier(["next page", "BLANK PAGE"])
+        self.assertEqual(classifier.classify("BLANK PAGE ... continued on the next page"), "phrase: next page")
+        self.assertEqual(PageClassifier(["BLANK PAGE", "next page"]).classify("BLANK PAGE ... next page"),
+                         "phrase: BLANK PAGE")
+
+    def test_title_rule(self):
+        classify = BLANK_PAGE_CLASSIFIER.classify
+        self.assertEqual(classify("Qualitative analysis notes\nKey: [ppt. = precipitate]"),
+                         "title: Qualitative analysis notes")
+        self.assertIsNone(classify("1 Use the Qualitative analysis notes. Identify the cation."))
+        # The sentence anywhere on the page outweighs the title
+        self.assertIsNone(classify("Qualitative analysis notes\n... see the qualitative analysis\nnotes."))
+        # A phrase flags the page whatever follows it
+        self.assertEqual(classify("BLANK PAGE."), "phrase: BLANK PAGE")
+        self.assertIsNone(classify("Describe the reaction of zinc with acid."))
+
+
+if __name__ == "__main__":
+    unittest.main()
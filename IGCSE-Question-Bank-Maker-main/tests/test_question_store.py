@@ -0,0 +1,156 @@
+"""
+The question database: per-paper upserts, filters and topics, and opening
+databases written by earlier versions or without FTS5 (search itself is in
+test_search.py).
+
+    python -m unittest discover tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import question_store
+from question_store import SCHEMA_VERSION, QuestionStore
+
+PAPER = {"name": "0620_s23_qp_41", "subject_code": "0620", "year": 2023, "season": "s", "paper": "4", "variant": "1"}
+OTHER_PAPER = {"name": "0610_w22_qp_32", "subject_code": "0610", "year": 2022, "season": "w", "paper": "3", "variant": "2"}
+TEXTS = {1: "Describe the structure of an atom of carbon.",
+         2: "Calculate the relative formula mass of calcium carbonate.",
+         3: "Explain how enzymes are affected by temperature."}
+
+
+def questions(paper, texts):
+    return [{"question": number, "file_path": f"extracted_questions/{paper['subject_code']}/{paper['name']}/Q{number}.pdf",
+             "text": text} for number, text in texts.items()]
+
+
+def fts5_available():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5 (x)")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+class QuestionStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = QuestionStore(":memory:")
+        self.store.upsert_paper(PAPER, questions(PAPER, TEXTS), source="papers/0620_s23_qp_41.pdf")
+
+    def tearDown(self):
+        self.store.close()
+
+    def numbers(self, **filters):
+        return [row["question"] for row in self.store.questions(**filters)]
+
+    def test_upsert_records_paper_metadata(self):
+        row = self.store.questions(question=2)[0]
+        self.assertEqual((row["paper_name"], row["subject_code"], row["year"], row["season"], row["paper"],
+                          row["variant"], row["source"], row["text"]),
+                         ("0620_s23_qp_41", "0620", 2023, "s", "4", "1", "papers/0620_s23_qp_41.pdf", TEXTS[2]))
+        self.assertEqual(self.store.papers(), ["0620_s23_qp_41"])
+        self.assertTrue(self.store.has_paper("0620_s23_qp_41"))
+        self.assertFalse(self.store.has_paper("0620_s23_qp_42"))
+
+    def test_re_split_updates_in_place_and_removes_missing_questions(self):
+        self.store.set_topics(self.store.questions(question=3)[0]["id"], [("Topic_1_Enzymes", "sorted/Q3.pdf")])
+        ids = {row["question"]: row["id"] for row in self.store.questions()}
+        self.store.upsert_paper(PAPER, questions(PAPER, {1: "Describe an atom.", 2: TEXTS[2]}))
+        rows = {row["question"]: row for row in self.store.questions()}
+        self.assertEqual(sorted(rows), [1, 2])
+        # Rows are updated, not replaced, so their ids (and topics) survive
+        self.assertEqual(rows[1]["id"], ids[1])
+        self.assertEqual(rows[1]["text"], "Describe an atom.")
+        # A removed question's topics go with it
+        self.assertEqual(self.store.filed_questions(), [])
+
+    def test_paper_with_no_questions_left_is_emptied(self):
+        self.store.upsert_paper(OTHER_PAPER, questions(OTHER_PAPER, {1: "Name the organ."}))
+        self.store.upsert_paper(PAPER, [])
+        self.assertEqual(self.store.papers(), ["0610_w22_qp_32"])
+
+    def test_filters(self):
+        self.store.upsert_paper(OTHER_PAPER, questions(OTHER_PAPER, {1: "Name the organ."}))
+        self.assertEqual(self.store.subjects(), ["0610", "0620"])
+        self.assertEqual(self.numbers(subject_code="0620", year=2023), [1, 2, 3])
+        self.assertEqual(self.numbers(subject_code="0610", paper="3", season=None), [1])
+        with self.assertRaises(ValueError):
+            self.store.questions(colour="red")
+
+    def test_topics_and_filings(self):
+        question_id = self.store.questions(question=1)[0]["id"]
+        self.store.set_topics(question_id, [("Topic_2_Atoms", "sorted/a.pdf"), ("Topic_1_States", "sorted/b.pdf")],
+                              blob="ab" * 32)
+        self.assertEqual(self.store.topics("0620"), ["Topic_1_States", "Topic_2_Atoms"])
+        self.assertEqual(self.store.filings(question_id),
+                         [("Topic_1_States", "sorted/b.pdf", "ab" * 32), ("Topic_2_Atoms", "sorted/a.pdf", "ab" * 32)])
+        self.assertEqual([row["question"] for row in self.store.questions(topic="Topic_2_Atoms")], [1])
+        # Topics are replaced, not added to
+        self.store.set_topics(question_id, [("Topic_2_Atoms", "sorted/a.pdf")])
+        self.store.set_blob(question_id, "cd" * 32)
+        self.assertEqual(self.store.filings(question_id), [("Topic_2_Atoms", "sorted/a.pdf", "cd" * 32)])
+
+
+@unittest.skipUnless(fts5_available(), "this SQLite library has no FTS5")
+class SchemaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "questions.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def version(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_database_written_without_fts5_is_indexed_later(self):
+        broken = "CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING no_such_module (text);"
+        with mock.patch.object(question_store, "SEARCH_SCHEMA", broken), redirect_stdout(StringIO()) as output:
+            with QuestionStore(self.path) as store:
+                self.assertFalse(store.searchable)
+                store.upsert_paper(PAPER, questions(PAPER, TEXTS))
+                with self.assertRaises(RuntimeError):
+                    store.search("enzymes")
+        self.assertIn("Full-text search is unavailable", output.getvalue())
+        self.assertNotEqual(self.version(), SCHEMA_VERSION)
+
+        with QuestionStore(self.path) as store:
+            self.assertTrue(store.searchable)
+            self.assertEqual([row["question"] for row in store.search("enzymes")], [3])
+        self.assertEqual(self.version(), SCHEMA_VERSION)
+
+    def test_current_database_is_not_indexed_twice(self):
+        with QuestionStore(self.path) as store:
+            store.upsert_paper(PAPER, questions(PAPER, TEXTS))
+        with QuestionStore(self.path) as store:
+            count = store.connection.execute("SELECT count(*) FROM questions_fts").fetchone()[0]
+            self.assertEqual(count, len(TEXTS))
+            self.assertEqual([row["question"] for row in store.search("atom")], [1])
+
+    def test_database_from_before_the_blob_store_gains_its_column(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript("""
+            CREATE TABLE question_topics (question_id INTEGER NOT NULL, topic TEXT NOT NULL, sorted_path TEXT,
+                                          PRIMARY KEY (question_id, topic));
+            PRAGMA user_version=2;""")
+        connection.close()
+        with QuestionStore(self.path) as store:
+            columns = [row[1] for row in store.connection.execute("PRAGMA table_info(question_topics)")]
+        self.assertIn("blob", columns)
+        self.assertEqual(self.version(), SCHEMA_VERSION)
+
+
+if __name__ == "__main__":
+    unittest.main()
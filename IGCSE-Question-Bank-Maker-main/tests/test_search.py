@@ -0,0 +1,142 @@
+"""
+Full-text search over question text: the FTS5 index the triggers keep in
+step with the questions table, query syntax, filters, ranking and search.py.
+
+    python -m unittest discover tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import search
+from question_store import QuestionStore, match_expression
+
+PAPER = {"name": "0620_s23_qp_41", "subject_code": "0620", "year": 2023, "season": "s", "paper": "4", "variant": "1"}
+OTHER_PAPER = {"name": "0610_w22_qp_32", "subject_code": "0610", "year": 2022, "season": "w", "paper": "3", "variant": "2"}
+TEXTS = {1: "Describe the structure of an atom of carbon.",
+         2: "Calculate the relative formula mass of calcium carbonate.",
+         3: "Explain how enzymes are affected by temperature."}
+
+
+def questions(paper, texts):
+    return [{"question": number, "file_path": f"extracted_questions/{paper['subject_code']}/{paper['name']}/Q{number}.pdf",
+             "text": text} for number, text in texts.items()]
+
+
+def fts5_available():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5 (x)")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+class MatchExpressionTest(unittest.TestCase):
+
+    def test_terms_are_quoted(self):
+        self.assertEqual(match_expression('rate "of reac"* enzym* AND-OR'), '"rate" "of reac"* "enzym"* "AND-OR"')
+        self.assertEqual(match_expression('say "hi'), '"say" "hi"')
+        self.assertEqual(match_expression('NEAR(a b) col:x'), '"NEAR(a" "b)" "col:x"')
+
+    def test_empty_queries(self):
+        for query in ("", "   ", '""', "*"):
+            with self.subTest(query=query), self.assertRaises(ValueError):
+                match_expression(query)
+
+
+@unittest.skipUnless(fts5_available(), "this SQLite library has no FTS5")
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = QuestionStore(":memory:")
+        self.store.upsert_paper(PAPER, questions(PAPER, TEXTS))
+
+    def tearDown(self):
+        self.store.close()
+
+    def search(self, query, **filters):
+        return [(row["paper_name"], row["question"]) for row in self.store.search(query, **filters)]
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        self.assertEqual(self.search("enzymes"), [("0620_s23_qp_41", 3)])
+        # Q2's text changes and Q3 is gone
+        self.store.upsert_paper(PAPER, questions(PAPER, {1: TEXTS[1], 2: "Enzymes speed up reactions."}))
+        self.assertEqual(self.search("enzymes"), [("0620_s23_qp_41", 2)])
+        self.assertEqual(self.search("carbonate"), [])
+        self.store.upsert_paper(OTHER_PAPER, questions(OTHER_PAPER, {4: "How do enzymes work?"}))
+        self.assertEqual(sorted(self.search("enzymes")), [("0610_w22_qp_32", 4), ("0620_s23_qp_41", 2)])
+        count = self.store.connection.execute("SELECT count(*) FROM questions_fts").fetchone()[0]
+        self.assertEqual(count, 3)
+
+    def test_prefixes_and_phrases(self):
+        self.assertEqual(self.search("enzym*"), [("0620_s23_qp_41", 3)])
+        self.assertEqual(self.search('"formula mass"'), [("0620_s23_qp_41", 2)])
+        self.assertEqual(self.search('"mass formula"'), [])
+        self.assertEqual(self.search('"relative form"*'), [("0620_s23_qp_41", 2)])
+        # Every term must match
+        self.assertEqual(self.search("carbon atom"), [("0620_s23_qp_41", 1)])
+        self.assertEqual(self.search("carbon enzymes"), [])
+
+    def test_filters(self):
+        self.store.upsert_paper(OTHER_PAPER, questions(OTHER_PAPER, {1: "Enzymes are proteins."}))
+        self.assertEqual(self.search("enzym*", subject_code="0620"), [("0620_s23_qp_41", 3)])
+        self.assertEqual(self.search("enzym*", year=2022, paper="3"), [("0610_w22_qp_32", 1)])
+        self.assertEqual(self.search("enzym*", year=2022, paper="4"), [])
+        self.assertEqual(self.search("enzymes", question=3), [("0620_s23_qp_41", 3)])
+        self.assertEqual(self.search("enzymes", season="w"), [("0610_w22_qp_32", 1)])
+        # Tag words are not matched as question text
+        self.assertEqual(self.search("subject0620"), [])
+
+    def test_ranking_and_limit(self):
+        self.store.upsert_paper(OTHER_PAPER, questions(OTHER_PAPER, {
+            1: "Enzymes. Enzymes are proteins; enzymes are catalysts.",
+            2: "This long question mentions enzymes once among many other words about digestion and absorption."}))
+        self.assertEqual(self.search("enzymes")[0], ("0610_w22_qp_32", 1))
+        self.assertEqual(len(self.store.search("enzymes", limit=2)), 2)
+
+    def test_snippets_mark_matches_on_one_line(self):
+        self.store.upsert_paper(PAPER, questions(PAPER, {1: "Describe the\nstructure of an\n\natom of carbon."}))
+        snippet = self.store.search("carbon")[0]["snippet"]
+        self.assertIn("[carbon]", snippet)
+        self.assertNotIn("\n", snippet)
+
+
+@unittest.skipUnless(fts5_available(), "this SQLite library has no FTS5")
+class SearchScriptTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, "questions.db")
+        with QuestionStore(self.database) as store:
+            store.upsert_paper(PAPER, questions(PAPER, TEXTS))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_search(self, *argv):
+        with redirect_stdout(StringIO()) as output:
+            code = search.main([*argv, "--database", self.database])
+        return code, output.getvalue()
+
+    def test_results(self):
+        code, output = self.run_search("enzym*", "--subject", "0620", "--year", "2023")
+        self.assertEqual(code, 0)
+        self.assertIn("0620_s23_qp_41 Q3: Explain how [enzymes] are affected", output)
+        self.assertIn("extracted_questions/0620/0620_s23_qp_41/Q3.pdf", output)
+
+    def test_no_results_and_errors(self):
+        self.assertEqual(self.run_search("photosynthesis"), (0, "No matching questions.\n"))
+        self.assertEqual(self.run_search('""')[0], 1)
+        with redirect_stdout(StringIO()) as output:
+            code = search.main(["atom", "--database", os.path.join(self.directory.name, "missing.db")])
+        self.assertEqual(code, 1)
+        self.assertIn("was not found", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+"""
+The sort journal that lets an interrupted sort resume: torn last lines,
+what a reopened journal remembers, compaction, and resuming a sort into a
+rebuilt question database or after a re-split.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import blob_store
+import manifest
+import sort_journal
+import sorting
+from blob_store import BlobStore
+from question_store import QuestionStore
+from sort_journal import SortJournal
+
+MODEL = "test-model"
+SYLLABUS = "1 States of matter\n2 Atoms, elements and compounds\n"
+
+
+def question(number):
+    return {"file_path": f"extracted_questions/0620/paper/Q{number}.pdf"}
+
+
+class SortJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "sort_journal.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self, prompt_version=1):
+        with redirect_stdout(StringIO()):
+            return SortJournal(MODEL, prompt_version, self.path)
+
+    def record(self, journal, number, topic="Topic_1_States_of_matter"):
+        journal.record_question(question(number), f"Question {number}", SYLLABUS, topic,
+                                [(topic, f"0620_Q{number}.pdf")])
+
+    def test_reopened_journal_resumes_recorded_questions(self):
+        with self.open() as journal:
+            journal.record_topic("0620", "topic1statesofmatter", "Topic_1_States_of_matter")
+            self.record(journal, 1)
+            self.record(journal, 2)
+
+        with self.open() as journal:
+            self.assertEqual(journal.topic_map("0620"), {"topic1statesofmatter": "Topic_1_States_of_matter"})
+            self.assertEqual(journal.sorted_topics(question(1), "Question 1", SYLLABUS),
+                             [("Topic_1_States_of_matter", "0620_Q1.pdf")])
+            self.assertIsNone(journal.sorted_topics(question(3), "Question 3", SYLLABUS))
+            self.assertEqual(journal.stats(), {"resumed": 1, "recorded": 0})
+
+    def test_changed_text_syllabus_or_prompt_needs_sorting_again(self):
+        with self.open() as journal:
+            self.record(journal, 1)
+
+        with self.open() as journal:
+            self.assertIsNone(journal.sorted_topics(question(1), "Question 1, reworded", SYLLABUS))
+            self.assertIsNone(journal.sorted_topics(question(1), "Question 1", SYLLABUS + "3 Stoichiometry\n"))
+            # Whitespace is normalised away before fingerprinting
+            self.assertIsNotNone(journal.sorted_topics(question(1), "  Question   1\n", SYLLABUS))
+        with self.open(prompt_version=2) as journal:
+            self.assertIsNone(journal.sorted_topics(question(1), "Question 1", SYLLABUS))
+
+    def test_torn_last_line_is_dropped_and_truncated(self):
+        with self.open() as journal:
+            self.record(journal, 1)
+        committed = os.path.getsize(self.path)
+        # A crash halfway through writing the second entry
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"type": "question", "file_path": "extracted_questions/0620/pa')
+
+        with self.open() as journal:
+            self.assertEqual(os.path.getsize(self.path), committed)
+            self.assertIsNotNone(journal.sorted_topics(question(1), "Question 1", SYLLABUS))
+            self.record(journal, 2)
+
+        # Entries appended after the truncation read back whole
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual([entry["file_path"] for entry in entries], [question(1)["file_path"], question(2)["file_path"]])
+
+    def test_complete_entry_without_newline_is_dropped(self):
+        with self.open() as journal:
+            self.record(journal, 1)
+        committed = os.path.getsize(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "topic", "subject": "0620", "key": "k", "folder": "Topic_9_X"}))
+
+        with self.open() as journal:
+            self.assertEqual(os.path.getsize(self.path), committed)
+            self.assertEqual(journal.topic_map("0620"), {})
+
+    def test_close_compacts_superseded_entries(self):
+        slack = sort_journal.COMPACT_SLACK
+        sort_journal.COMPACT_SLACK = 3
+        try:
+            with self.open() as journal:
+                for topic in ("Topic_1_A", "Topic_2_B", "Topic_3_C", "Topic_4_D", "Topic_5_E"):
+                    self.record(journal, 1, topic)
+                self.record(journal, 2)
+        finally:
+            sort_journal.COMPACT_SLACK = slack
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 2)
+        with self.open() as journal:
+            self.assertEqual(journal.sorted_topics(question(1), "Question 1", SYLLABUS),
+                             [("Topic_5_E", "0620_Q1.pdf")])
+
+    def test_few_superseded_entries_are_left_alone(self):
+        with self.open() as journal:
+            self.record(journal, 1, "Topic_1_A")
+            self.record(journal, 1, "Topic_2_B")
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+
+class FakeCache:
+    """Answers every question from a fixed classification, as a warm ClassificationCache would."""
+
+    def __init__(self, topics_string):
+        self.topics_string = topics_string
+
+    def get(self, subject_code, syllabus_text, question_text):
+        return self.topics_string
+
+    def put(self, subject_code, syllabus_text, question_text, topics_string):
+        pass
+
+
+class ResumeTest(unittest.TestCase):
+    """sorting.sort_questions() resuming from the journal; no question reaches the (absent) API."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        # The view and the blob store live under the working directory
+        os.chdir(self.directory.name)
+        self.database = os.path.join("extracted_questions", "questions.db")
+        self.blobs_root = os.path.join("extracted_questions", "blobs")
+        os.makedirs(os.path.join("extracted_questions", "0620_s23_qp_41"))
+        self.questions = []
+        for number in (1, 2):
+            path = os.path.join("extracted_questions", "0620_s23_qp_41", f"Q{number}.pdf")
+            with open(path, "wb") as f:
+                f.write(f"%PDF-1.7 question {number}".encode("ascii"))
+            self.questions.append({"question": number, "file_path": path, "text": f"Question {number}"})
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def sort(self, cache=None):
+        with redirect_stdout(StringIO()):
+            with QuestionStore(self.database) as store:
+                store.upsert_paper({"name": "0620_s23_qp_41", "subject_code": "0620", "year": 2023},
+                                   self.questions)
+                journal = SortJournal(MODEL, 1, os.path.join("extracted_questions", "sort_journal.jsonl"))
+                blobs = BlobStore(self.blobs_root)
+                with journal:
+                    results = sorting.sort_questions(store, store.questions(subject_code="0620"), SYLLABUS,
+                                                     journal.topic_map("0620"), None, cache, journal=journal,
+                                                     blobs=blobs)
+                view = blob_store.materialise_view(store, blobs, sorting.SORTED_OUTPUT_DIR)
+                return results, store.filed_questions(), view, journal.stats()
+
+    def test_resume_refiles_into_a_rebuilt_database(self):
+        _, filed, view, stats = self.sort(FakeCache("Topic_1_States of matter, Topic_2_Atoms"))
+        self.assertEqual((len(filed), view["files"], stats["recorded"]), (4, 4, 2))
+
+        os.remove(self.database)
+        # No cache and no API: only the journal can file the questions now
+        results, refiled, view, stats = self.sort()
+        self.assertEqual(stats, {"resumed": 2, "recorded": 0})
+        self.assertEqual([(row["topic"], row["sorted_path"], row["blob"]) for row in refiled],
+                         [(row["topic"], row["sorted_path"], row["blob"]) for row in filed])
+        self.assertEqual((view["files"], view["blobs"], view["pruned"]), (4, 2, 0))
+        self.assertEqual(len(results), 2)
+        with QuestionStore(self.database) as store:
+            self.assertEqual(store.topics("0620"), ["Topic_1_States_of_matter", "Topic_2_Atoms"])
+
+    def test_resume_follows_a_re_split_pdf(self):
+        self.sort(FakeCache("Topic_1_States of matter"))
+        # Re-split with a new border: the bytes change, the text does not
+        path = self.questions[0]["file_path"]
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.7 question 1, re-split")
+
+        _, filed, view, stats = self.sort()
+        self.assertEqual(stats["resumed"], 2)
+        row = next(row for row in filed if row["file_path"] == path)
+        self.assertEqual(row["blob"], manifest.file_hash(path))
+        self.assertTrue(view["rebuilt"])
+        self.assertEqual(view["pruned"], 1)
+        with open(row["sorted_path"], "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1.7 question 1, re-split")
+
+    def test_resume_leaves_an_intact_database_alone(self):
+        self.sort(FakeCache("Topic_1_States of matter"))
+        with mock.patch.object(QuestionStore, "set_topics") as set_topics:
+            _, filed, _, stats = self.sort()
+        set_topics.assert_not_called()
+        self.assertEqual((len(filed), stats["resumed"]), (2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+IntervalIndex against a brute-force scan of the same boxes.
+
+    python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from spatial_index import X_AXIS, Y_AXIS, IntervalIndex
+
+
+def random_boxes(rng, count):
+    boxes = []
+    for _ in range(count):
+        x0, y0 = rng.choice([rng.uniform(0, 600), float(rng.randrange(0, 600, 50))]), rng.uniform(0, 800)
+        # Mostly short lines, some tall boxes, some empty ones
+        height = rng.choice([0.0, rng.uniform(0, 15), rng.uniform(0, 15), rng.uniform(0, 800)])
+        boxes.append((x0, y0, x0 + rng.uniform(0, 300), y0 + height))
+    return boxes
+
+
+def bands(rng, count):
+    for _ in range(count):
+        lo = rng.choice([rng.uniform(-50, 850), float(rng.randrange(0, 800, 50))])
+        yield lo, lo + rng.choice([0.0, rng.uniform(0, 40), rng.uniform(0, 900)])
+
+
+class IntervalIndexTest(unittest.TestCase):
+
+    def check(self, boxes, axis, queries):
+        index = IntervalIndex(boxes, lambda box: box, axis)
+        by_start = sorted(range(len(boxes)), key=lambda row: (boxes[row][axis], boxes[row][axis + 2], row))
+        for lo, hi in queries:
+            overlapping = [row for row in by_start if boxes[row][axis] < hi and lo < boxes[row][axis + 2]]
+            within = [row for row in by_start if lo <= boxes[row][axis] and boxes[row][axis + 2] <= hi]
+            self.assertEqual(index.rows_overlapping(lo, hi), overlapping, (lo, hi))
+            self.assertEqual(index.rows_within(lo, hi), within, (lo, hi))
+            self.assertEqual(index.overlapping(lo, hi), [boxes[row] for row in overlapping])
+            self.assertEqual(index.within(lo, hi), [boxes[row] for row in within])
+
+    def test_matches_brute_force(self):
+        rng = random.Random(5)
+        for count in (1, 2, 3, 7, 8, 9, 64, 300):
+            boxes = random_boxes(rng, count)
+            for axis in (X_AXIS, Y_AXIS):
+                with self.subTest(count=count, axis=axis):
+                    self.check(boxes, axis, list(bands(rng, 200)))
+
+    def test_band_edges(self):
+        boxes = [(0, 10, 5, 20), (0, 20, 5, 30), (0, 15, 5, 15), (0, 0, 5, 100)]
+        index = IntervalIndex(boxes, lambda box: box)
+        # Open band for overlaps: touching at an edge is not overlapping
+        self.assertEqual(index.rows_overlapping(20, 30), [3, 1])
+        self.assertEqual(index.rows_overlapping(15, 15), [3, 0])
+        # Closed band for containment
+        self.assertEqual(index.rows_within(10, 30), [0, 2, 1])
+        self.assertEqual(index.rows_within(15, 15), [2])
+
+    def test_empty_index(self):
+        index = IntervalIndex([], lambda box: box)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.rows_overlapping(-1e9, 1e9), [])
+        self.assertEqual(index.rows_within(-1e9, 1e9), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
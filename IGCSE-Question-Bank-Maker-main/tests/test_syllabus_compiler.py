@@ -0,0 +1,190 @@
+"""
+Syllabus compilation: parsing major topics and subtopics, the compiled
+tree and prompt context, the on-disk index, and the snippets shown next to
+a question.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import syllabus_compiler
+from syllabus_compiler import compile_syllabus, parse_syllabus, question_with_snippets, relevant_snippets
+
+SYLLABUS = """\
+Cambridge International AS & A Level Chemistry 9701
+Syllabus for examination in 2025
+Contents
+1 Atomic structure
+2 Chemical bonding
+3 States of matter
+
+1 Atomic structure :
+1.1 Particles in the atom and atomic radius
+Candidates should be able to understand that atoms are mostly empty space surrounding a very small nucleus
+that contains protons and neutrons; electrons are found in shells in the empty space around the nucleus.
+1.2 Isotopes
+Candidates should be able to define isotopes as atoms of the same element with different numbers of neutrons.
+2 Chemical bonding :
+2.1 Electronegativity and bonding
+Electronegativity of elements increases across a period and decreases down a group.
+2.2 Ionic bonding
+Ionic bonding is the electrostatic attraction between oppositely charged ions.
+5 Chemical energetics
+3 States of matter :
+3.1 The gaseous state: ideal and real gases and pV = nRT
+Candidates should be able to state the basic assumptions of the kinetic theory as applied to an ideal gas.
+4.1 Not a subtopic of anything yet
+"""
+
+
+class ParseSyllabusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.topics = parse_syllabus(SYLLABUS)
+
+    def test_major_topics_in_sequence(self):
+        self.assertEqual([(topic["number"], topic["name"]) for topic in self.topics],
+                         [("1", "Atomic structure"), ("2", "Chemical bonding"), ("3", "States of matter")])
+
+    def test_subtopics_and_their_detail(self):
+        atomic = self.topics[0]
+        self.assertEqual([(subtopic["number"], subtopic["name"]) for subtopic in atomic["subtopics"]],
+                         [("1.1", "Particles in the atom and atomic radius"), ("1.2", "Isotopes")])
+        self.assertTrue(atomic["subtopics"][1]["text"].startswith("Candidates should be able to define isotopes"))
+        self.assertIn("pV = nRT", self.topics[2]["subtopics"][0]["name"])
+
+    def test_lines_out_of_sequence_are_detail(self):
+        # "5 Chemical energetics" is not the next topic, so it belongs to 2.2
+        self.assertIn("5 Chemical energetics", self.topics[1]["subtopics"][1]["text"])
+        # A subtopic of a topic that does not exist is detail too
+        self.assertIn("4.1 Not a subtopic", self.topics[2]["subtopics"][0]["text"])
+        # The title lines come before any topic and are dropped
+        self.assertNotIn("9701", "".join(topic["text"] for topic in self.topics))
+
+    def test_contents_list_then_details(self):
+        # The contents list named each topic once; the detail section reopened the same topics
+        self.assertEqual(len(self.topics), 3)
+        self.assertEqual(len(self.topics[1]["subtopics"]), 2)
+
+    def test_topic_prefixes_and_punctuation(self):
+        topics = parse_syllabus("Topic 1: Cells\n2) Enzymes :\n3. Transport in plants\n")
+        self.assertEqual([(topic["number"], topic["name"]) for topic in topics],
+                         [("1", "Cells"), ("2", "Enzymes"), ("3", "Transport in plants")])
+
+    def test_no_numbered_topics(self):
+        self.assertEqual(parse_syllabus("Chemistry\nAll about atoms and bonds.\n"), [])
+
+
+class CompileSyllabusTest(unittest.TestCase):
+
+    def test_context_is_the_topic_list(self):
+        compiled = compile_syllabus("9701", SYLLABUS)
+        self.assertEqual(compiled["context"], "1 Atomic structure :\n2 Chemical bonding :\n3 States of matter :\n")
+        self.assertEqual((compiled["full_tokens"], compiled["context_tokens"]),
+                         (len(SYLLABUS) // 4, len(compiled["context"]) // 4))
+        self.assertEqual(compiled["version"], syllabus_compiler.COMPILER_VERSION)
+
+    def test_keywords(self):
+        compiled = compile_syllabus("9701", SYLLABUS)
+        isotopes = compiled["topics"][0]["subtopics"][1]["keywords"]
+        self.assertIn("isotopes", isotopes)
+        self.assertIn("neutrons", isotopes)
+        # Stop words and short words never count
+        self.assertNotIn("candidates", isotopes)
+        self.assertNotIn("same", isotopes)
+        # A major topic's keywords cover its subtopics
+        self.assertIn("isotopes", compiled["topics"][0]["keywords"])
+
+    def test_syllabus_without_topics_is_used_whole(self):
+        compiled = compile_syllabus("0000", "Chemistry\nAll about atoms and bonds.\n")
+        self.assertEqual(compiled["topics"], [])
+        self.assertEqual(compiled["context"], "Chemistry\nAll about atoms and bonds.\n")
+
+    def test_repository_syllabus_compiles(self):
+        with open(os.path.join(ROOT, "syllabi", "9618", "_syllabus.txt"), "r", encoding="utf-8") as f:
+            compiled = compile_syllabus("9618", f.read())
+        self.assertEqual([topic["number"] for topic in compiled["topics"]], [str(n) for n in range(1, 13)])
+        self.assertLess(compiled["context_tokens"], compiled["full_tokens"])
+
+
+class SnippetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.compiled = compile_syllabus("9701", SYLLABUS)
+
+    def test_snippets_need_two_keywords(self):
+        question = "Chlorine has two isotopes. How many neutrons are in chlorine-37?"
+        self.assertEqual([snippet.split(":")[0] for snippet in relevant_snippets(self.compiled, question)],
+                         ["1.2 Isotopes"])
+        self.assertEqual(relevant_snippets(self.compiled, "Name one isotope."), [])
+
+    def test_question_with_snippets(self):
+        question = "Explain why the electronegativity difference makes ionic bonding likely."
+        shown = question_with_snippets(self.compiled, question)
+        self.assertTrue(shown.startswith(question + "\n(Possibly relevant syllabus sections: 2.1"))
+        self.assertEqual(question_with_snippets(self.compiled, "Name one isotope."), "Name one isotope.")
+
+    def test_long_detail_is_shortened(self):
+        snippet = relevant_snippets(self.compiled, "Atoms: protons, neutrons and electrons in the nucleus.")[0]
+        self.assertLessEqual(len(snippet.split(": ", 1)[1]), syllabus_compiler.SNIPPET_CHARACTERS + 4)
+        self.assertTrue(snippet.endswith(" ..."))
+
+
+class CompiledIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.index_dir = os.path.join(self.directory.name, "syllabus_index")
+        patcher = mock.patch.dict(syllabus_compiler._loaded, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def load(self, syllabus_text):
+        with redirect_stdout(StringIO()) as output:
+            compiled = syllabus_compiler.load_compiled_syllabus("9701", syllabus_text, self.index_dir)
+        return compiled, output.getvalue()
+
+    def test_compiled_once_then_read_from_the_index(self):
+        compiled, output = self.load(SYLLABUS)
+        self.assertIn("Compiled the syllabus for 9701: 3 major topics", output)
+        with open(os.path.join(self.index_dir, "9701.json"), "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f), compiled)
+        # Another process reads the saved tree
+        syllabus_compiler._loaded.clear()
+        with mock.patch.object(syllabus_compiler, "compile_syllabus") as compile_syllabus_mock:
+            self.assertEqual(self.load(SYLLABUS), (compiled, ""))
+        compile_syllabus_mock.assert_not_called()
+
+    def test_changed_syllabus_or_compiler_recompiles(self):
+        self.load(SYLLABUS)
+        compiled, output = self.load(SYLLABUS + "4 Chemical energetics\n")
+        self.assertEqual(len(compiled["topics"]), 4)
+        self.assertIn("4 major topics", output)
+
+        syllabus_compiler._loaded.clear()
+        with mock.patch.object(syllabus_compiler, "COMPILER_VERSION", syllabus_compiler.COMPILER_VERSION + 1):
+            compiled, output = self.load(SYLLABUS)
+        self.assertIn("Compiled the syllabus", output)
+        self.assertEqual(compiled["version"], syllabus_compiler.COMPILER_VERSION + 1)
+
+    def test_unreadable_index_is_rebuilt(self):
+        os.makedirs(self.index_dir)
+        with open(os.path.join(self.index_dir, "9701.json"), "w", encoding="utf-8") as f:
+            f.write("{")
+        compiled, output = self.load(SYLLABUS)
+        self.assertEqual(len(compiled["topics"]), 3)
+        self.assertIn("Compiled the syllabus", output)
+
+
+if __name__ == "__main__":
+    unittest.main()